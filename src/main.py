@@ -5,6 +5,475 @@
 ###
 import src.step00_utils as step00_utils
 
+import argparse
+import concurrent.futures
+import hashlib
+import importlib
+import importlib.util
+import json
+import os
+import pathlib as pl
+import time
+
 ###
 # Filepaths
-###
\ No newline at end of file
+###
+DIR_PIPELINE_MANIFESTS = step00_utils.DIR_DATA / ".pipeline"
+
+###
+# Stages
+###
+
+# Each stage module exposes ``run_stage(paths, upstream, log, n_jobs) -> dict``
+# returning its output paths; ``log`` receives its progress lines and
+# ``n_jobs`` is the stage's core budget. ``code`` lists the modules whose
+# source is part of the stage's cache key; ``inputs`` names entries of
+# ``paths`` read directly.
+STAGES = {
+    "step01_data": {
+        "module": "src.step01_data",
+        "deps": [],
+        "inputs": ["raw"],
+        "code": ["src.step00_utils", "src.step01_data"],
+    },
+    "step02_eda": {
+        "module": "src.step02_eda",
+        "deps": ["step01_data"],
+        "inputs": [],
+        "code": ["src.step00_utils", "src.step01_data", "src.step03_features",
+                 "src.step02_eda"],
+    },
+    "step03_features": {
+        "module": "src.step03_features",
+        "deps": ["step01_data"],
+        "inputs": [],
+        "code": ["src.step00_utils", "src.step03_features"],
+    },
+    "step04_modeling": {
+        "module": "src.step04_modeling",
+        "deps": ["step01_data", "step03_features"],
+        "inputs": [],
+        "code": ["src.step00_utils", "src.step03_features", "src.model_registry",
+                 "src.trial_store", "src.step04_modeling"],
+    },
+    "step05_interpret": {
+        "module": "src.step05_interpret",
+        "deps": ["step03_features", "step04_modeling"],
+        "inputs": [],
+        "code": ["src.step00_utils", "src.step03_features", "src.step05_interpret"],
+    },
+}
+
+
+def build_paths(root=None):
+    '''
+    Return the locations the pipeline reads from and writes to.
+
+    Parameters
+    ----------
+    root : Path or None
+        Project root; defaults to ``step00_utils.DIR_PROJECT_HOME``.
+
+    Returns
+    -------
+    dict
+    '''
+    if root is None:
+        return {
+            "raw": step00_utils.DIR_DATA_00_RAW / step00_utils.FILE_SPOTIFY_CHURN_DATASET_CSV,
+            "processed": step00_utils.DIR_DATA_01_PROCESSED,
+            "vectorized": step00_utils.DIR_DATA_02_VECTORIZED,
+            "models": step00_utils.DIR_DATA_03_MODELS,
+            "figures": step00_utils.DIR_OUTPUTS_FIG_BUILDS,
+            "manifests": DIR_PIPELINE_MANIFESTS,
+        }
+
+    root = pl.Path(root).resolve()
+    return {
+        "raw": root / "data" / "00_raw" / step00_utils.FILE_SPOTIFY_CHURN_DATASET_CSV,
+        "processed": root / "data" / "01_processed",
+        "vectorized": root / "data" / "02_vectorized",
+        "models": root / "data" / "03_models",
+        "figures": root / "fig_builds",
+        "manifests": root / "data" / ".pipeline",
+    }
+
+
+def resolve_stages(targets=None, stages=STAGES):
+    '''
+    Return the targets and all their dependencies in execution order.
+
+    Parameters
+    ----------
+    targets : sequence of str or None
+        Stages to bring up to date; all stages when None.
+
+    Returns
+    -------
+    list of str
+    '''
+    targets = list(stages) if not targets else list(targets)
+    unknown = sorted(set(targets) - set(stages))
+    if unknown:
+        raise ValueError(f"unknown stages: {', '.join(unknown)}")
+
+    order = []
+
+    def visit(name, seen):
+        if name in order:
+            return
+        if name in seen:
+            raise ValueError(f"dependency cycle through {name}")
+        for dep in stages[name]["deps"]:
+            visit(dep, seen | {name})
+        order.append(name)
+
+    for name in targets:
+        visit(name, set())
+
+    return order
+
+
+def code_hash(modules):
+    '''
+    Return a digest of the source files of the given modules.
+    '''
+    digest = hashlib.sha256()
+    for module in modules:
+        origin = importlib.util.find_spec(module).origin
+        digest.update(module.encode())
+        digest.update(step00_utils.hash_file(origin).encode())
+
+    return digest.hexdigest()
+
+
+def outputs_digest(outputs):
+    '''
+    Return a digest of the contents of a stage's output paths.
+    '''
+    digest = hashlib.sha256()
+    for name in sorted(outputs):
+        digest.update(name.encode())
+        digest.update(step00_utils.hash_path(outputs[name]).encode())
+
+    return digest.hexdigest()
+
+
+def stage_key(name, paths, upstream_digests, stages=STAGES):
+    '''
+    Return the cache key of a stage from its code, direct inputs and the
+    output digests of its dependencies.
+    '''
+    spec = stages[name]
+    payload = {
+        "stage": name,
+        "code": code_hash(spec["code"]),
+        "inputs": {i: step00_utils.hash_path(paths[i]) for i in spec["inputs"]},
+        "upstream": {dep: upstream_digests[dep] for dep in spec["deps"]},
+    }
+    text = json.dumps(payload, sort_keys=True)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def read_manifest(paths, name):
+    '''
+    Return the manifest of the last successful run of a stage, or None.
+    '''
+    path = pl.Path(paths["manifests"]) / f"{name}.json"
+    if not path.exists():
+        return None
+
+    return json.loads(path.read_text())
+
+
+def write_manifest(paths, name, manifest):
+    '''
+    Record a successful stage run.
+    '''
+    path = pl.Path(paths["manifests"]) / f"{name}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(manifest, indent=2, default=str))
+
+
+def check_stage(name, paths, upstream_digests, force=False, stages=STAGES):
+    '''
+    Decide whether a stage is up to date.
+
+    Returns
+    -------
+    key : str
+    reason : str or None
+        Why the stage has to run, or None when it can be skipped.
+    '''
+    key = stage_key(name, paths, upstream_digests, stages)
+    manifest = read_manifest(paths, name)
+
+    if force:
+        return key, "forced"
+    if manifest is None:
+        return key, "never run"
+    if manifest["key"] != key:
+        return key, "inputs or code changed"
+    if not all(pl.Path(p).exists() for p in manifest["outputs"].values()):
+        return key, "outputs missing"
+
+    return key, None
+
+
+def forced_stages(targets=None, force=False, stages=STAGES):
+    '''
+    Return the stages ``force`` applies to: the named targets, or every
+    stage when none are named. Their dependencies are only rerun when
+    they are out of date.
+    '''
+    if not force:
+        return set()
+    return set(targets) if targets else set(stages)
+
+
+def plan_pipeline(paths, targets=None, force=False, stages=STAGES):
+    '''
+    Return what ``run_pipeline`` would do, without running anything.
+
+    Stages downstream of a stage that has to run are reported as pending,
+    since their keys depend on outputs that do not exist yet.
+
+    Returns
+    -------
+    list of dict
+        One ``{"stage", "action", "reason"}`` entry per stage, in order.
+    '''
+    plan = []
+    digests = {}
+    pending = set()
+    forced = forced_stages(targets, force, stages)
+    for name in resolve_stages(targets, stages):
+        deps = stages[name]["deps"]
+        if any(dep in pending for dep in deps):
+            pending.add(name)
+            plan.append({"stage": name, "action": "run", "reason": "upstream runs first"})
+            continue
+
+        _, reason = check_stage(name, paths, digests, name in forced, stages)
+        if reason is None:
+            digests[name] = read_manifest(paths, name)["digest"]
+            plan.append({"stage": name, "action": "skip", "reason": "up to date"})
+        else:
+            pending.add(name)
+            plan.append({"stage": name, "action": "run", "reason": reason})
+
+    return plan
+
+
+def run_stage(name, paths, upstream, stages=STAGES, log=None, n_jobs=-1):
+    '''
+    Import a stage module and run it.
+
+    Parameters
+    ----------
+    log : callable, optional
+        Receives the stage's progress lines as they come. Without it they
+        are returned instead, e.g. to a parent process.
+    n_jobs : int
+        Core budget of the stage, joblib-style.
+
+    Returns
+    -------
+    outputs : dict
+        Output name to path.
+    seconds : float
+        Time spent inside the stage.
+    lines : list of str
+        Progress lines not passed to ``log``.
+    '''
+    lines = []
+    start = time.perf_counter()
+    module = importlib.import_module(stages[name]["module"])
+    outputs = module.run_stage(paths, upstream, log=lines.append if log is None else log,
+                               n_jobs=n_jobs)
+    seconds = time.perf_counter() - start
+    return {key: str(value) for key, value in outputs.items()}, seconds, lines
+
+
+def _submit(pool, log, n_jobs, *args):
+    # Run inline when there is no pool so ``jobs=1`` keeps a single process;
+    # workers hand their progress lines back with the result.
+    if pool is not None:
+        return pool.submit(run_stage, *args, n_jobs=n_jobs)
+
+    future = concurrent.futures.Future()
+    try:
+        future.set_result(run_stage(*args, log=log, n_jobs=n_jobs))
+    except Exception as error:
+        future.set_exception(error)
+    return future
+
+
+def run_pipeline(paths, targets=None, force=False, stages=STAGES, log=print, jobs=1):
+    '''
+    Run the stages needed for ``targets``, skipping up-to-date ones.
+
+    A stage starts as soon as all of its dependencies have finished, so
+    independent stages (e.g. step02 EDA and step03 features) overlap when
+    ``jobs > 1``. Each running stage occupies one worker process and gets
+    an equal share of the available cores as its ``n_jobs`` budget, so
+    overlapping stages do not each plan for the whole machine.
+
+    Parameters
+    ----------
+    jobs : int
+        Maximum number of stages running at once; 1 runs them in-process.
+
+    Returns
+    -------
+    list of dict
+        One ``{"stage", "action", "reason", "seconds", "start", "end"}`` entry
+        per stage in completion order; ``start`` and ``end`` are offsets in
+        seconds from the start of the run.
+    '''
+    if jobs < 1:
+        raise ValueError(f"jobs must be >= 1, got {jobs}")
+
+    order = resolve_stages(targets, stages)
+    forced = forced_stages(targets, force, stages)
+    results = []
+    digests = {}
+    outputs = {}
+    running = {}
+    t0 = time.perf_counter()
+
+    def finish(name, manifest, result):
+        digests[name] = manifest["digest"]
+        outputs[name] = manifest["outputs"]
+        result["end"] = time.perf_counter() - t0
+        results.append(result)
+
+    pool = concurrent.futures.ProcessPoolExecutor(jobs) if jobs > 1 else None
+    try:
+        while order or running:
+            # ``order`` is topological, so one pass finds every ready stage.
+            ready = []
+            for name in list(order):
+                if len(running) + len(ready) >= jobs:
+                    break
+                if not all(dep in digests for dep in stages[name]["deps"]):
+                    continue
+                order.remove(name)
+
+                key, reason = check_stage(name, paths, digests, name in forced, stages)
+                now = time.perf_counter() - t0
+                if reason is None:
+                    log(f"[skip] {name}: up to date")
+                    finish(name, read_manifest(paths, name),
+                           {"stage": name, "action": "skip", "reason": "up to date",
+                            "seconds": 0.0, "start": now})
+                    continue
+
+                ready.append((name, key, reason, now))
+
+            # Budgets are shared out as stages start; one already running
+            # keeps the share it started with.
+            n_jobs = max(1, step00_utils.available_cores() // max(1, len(running) + len(ready)))
+            for name, key, reason, now in ready:
+                log(f"[run]  {name}: {reason}")
+                upstream = {dep: outputs[dep] for dep in stages[name]["deps"]}
+                future = _submit(pool, log, n_jobs, name, paths, upstream, stages)
+                running[future] = (name, key, reason, now)
+
+            if not running:
+                continue
+
+            done, _ = concurrent.futures.wait(
+                running, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                name, key, reason, start = running.pop(future)
+                stage_outputs, seconds, lines = future.result()
+                for line in lines:
+                    log(line)
+                manifest = {
+                    "key": key,
+                    "outputs": stage_outputs,
+                    "digest": outputs_digest(stage_outputs),
+                    "seconds": seconds,
+                    "finished": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                }
+                write_manifest(paths, name, manifest)
+                finish(name, manifest, {"stage": name, "action": "run", "reason": reason,
+                                        "seconds": seconds, "start": start})
+                log(f"[done] {name}: {seconds:.1f}s "
+                    f"({len(results)}/{len(results) + len(order) + len(running)})")
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    return results
+
+
+def format_summary(results):
+    '''
+    Return a per-stage timing table plus wall-clock vs summed stage time.
+    '''
+    lines = [f"{'stage':<18} {'action':<6} {'start':>8} {'end':>8} {'seconds':>8}"]
+    for r in sorted(results, key=lambda r: r["start"]):
+        lines.append(f"{r['stage']:<18} {r['action']:<6} {r['start']:>8.1f} "
+                     f"{r['end']:>8.1f} {r['seconds']:>8.1f}")
+
+    wall = max((r["end"] for r in results), default=0.0)
+    total = sum(r["seconds"] for r in results)
+    lines.append(f"{sum(r['action'] == 'run' for r in results)} run, "
+                 f"{sum(r['action'] == 'skip' for r in results)} skipped, "
+                 f"{wall:.1f}s wall clock, {total:.1f}s of stage time")
+    return "\n".join(lines)
+
+###
+# Command Line
+###
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m src.main",
+        description="Run the churn-analysis pipeline, skipping up-to-date stages.",
+    )
+    parser.add_argument("stages", nargs="*", metavar="STAGE",
+                        help=f"stages to bring up to date (default: all of {', '.join(STAGES)})")
+    parser.add_argument("--root", type=pl.Path, default=None,
+                        help="project root (default: the repository containing src/)")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="print what would run without running it")
+    parser.add_argument("--force", action="store_true",
+                        help="rerun the selected stages even if they are up to date")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="number of independent stages to run in parallel (default: 1)")
+    args = parser.parse_args(argv)
+    if args.jobs < 1:
+        parser.error("--jobs must be >= 1")
+    try:
+        resolve_stages(args.stages)
+    except ValueError as error:
+        parser.error(str(error))
+
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    paths = build_paths(args.root)
+
+    if args.dry_run:
+        for step in plan_pipeline(paths, args.stages, force=args.force):
+            print(f"[{step['action']}] {step['stage']}: {step['reason']}")
+        return 0
+
+    # Stages render figures; worker processes inherit the backend via env.
+    os.environ.setdefault("MPLBACKEND", "Agg")
+    import matplotlib
+    matplotlib.use("Agg")
+
+    results = run_pipeline(paths, args.stages, force=args.force, jobs=args.jobs)
+    print(format_summary(results))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+
+###
+# Imports
+###
+import src.step00_utils as step00_utils
+
+import hashlib
+import json
+import pathlib as pl
+import time
+import typing as typ
+
+import joblib
+
+###
+# Filepaths
+###
+DIR_MODELS = step00_utils.DIR_DATA_03_MODELS
+
+###
+# Registry
+###
+
+def estimator_name(estimator) -> str:
+    '''
+    Return the qualified class name of an estimator instance or class.
+    '''
+    cls = estimator if isinstance(estimator, type) else type(estimator)
+    return f"{cls.__module__}.{cls.__qualname__}"
+
+
+def model_key(data_hash: str, estimator, param_grid: dict, **config) -> str:
+    '''
+    Return the content address of a fitted model.
+
+    Parameters
+    ----------
+    data_hash : str
+        Digest of the training artifact, see ``step00_utils.hash_path``.
+    estimator : estimator instance or class
+        Unfitted base estimator; its class and constructor parameters are
+        part of the key.
+    param_grid : dict
+        Hyperparameter grid searched over.
+    **config
+        Any other setting that changes the fitted model (cv, scoring, ...).
+
+    Returns
+    -------
+    str
+    '''
+    payload = {
+        "data": data_hash,
+        "estimator": estimator_name(estimator),
+        "estimator_params": (
+            {} if isinstance(estimator, type) else estimator.get_params(deep=False)
+        ),
+        "param_grid": param_grid,
+        "config": config,
+    }
+    text = json.dumps(payload, sort_keys=True, default=repr)
+    return hashlib.sha256(text.encode()).hexdigest()[:24]
+
+
+def model_path(key: str, registry_dir: pl.Path = DIR_MODELS) -> pl.Path:
+    '''
+    Return the location of the pickled model stored under ``key``.
+    '''
+    return pl.Path(registry_dir) / f"{key}.joblib"
+
+
+def save_model(
+    key: str,
+    model,
+    metadata: typ.Optional[dict] = None,
+    registry_dir: pl.Path = DIR_MODELS,
+) -> pl.Path:
+    '''
+    Store a fitted model and a JSON metadata sidecar under ``key``.
+
+    Returns
+    -------
+    Path
+    '''
+    path = model_path(key, registry_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    tmp_path = path.with_suffix(".joblib.tmp")
+    joblib.dump(model, tmp_path)
+    tmp_path.replace(path)
+
+    meta = {
+        "key": key,
+        "estimator": estimator_name(model),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        **(metadata or {}),
+    }
+    path.with_suffix(".json").write_text(json.dumps(meta, indent=2, default=repr))
+
+    return path
+
+
+def load_model(key: str, registry_dir: pl.Path = DIR_MODELS):
+    '''
+    Return the model stored under ``key``, or None when there is none.
+    '''
+    path = model_path(key, registry_dir)
+    if not path.exists():
+        return None
+
+    return joblib.load(path)
+
+
+def load_metadata(key: str, registry_dir: pl.Path = DIR_MODELS) -> typ.Optional[dict]:
+    '''
+    Return the metadata stored with ``key``, or None when there is none.
+    '''
+    path = model_path(key, registry_dir).with_suffix(".json")
+    if not path.exists():
+        return None
+
+    return json.loads(path.read_text())
+
+
+def get_or_fit(
+    key: str,
+    fit: typ.Callable[[], typ.Tuple[typ.Any, dict]],
+    registry_dir: pl.Path = DIR_MODELS,
+):
+    '''
+    Load the model stored under ``key``, fitting and storing it on a miss.
+
+    Parameters
+    ----------
+    key : str
+    fit : callable
+        Called without arguments on a miss; returns ``(model, metadata)``.
+    registry_dir : Path
+
+    Returns
+    -------
+    model : fitted estimator
+    hit : bool
+        True when the model was loaded rather than fitted.
+    '''
+    model = load_model(key, registry_dir)
+    if model is not None:
+        return model, True
+
+    model, metadata = fit()
+    save_model(key, model, metadata, registry_dir)
+    return model, False
@@ -3,20 +3,29 @@
 ###
 # Imports
 ###
+import concurrent.futures
+import contextlib
+import hashlib
+import inspect
+import os
 import pathlib as pl
+import time
 from pathlib import Path
 
 ###
 # Filepaths and Files 
 ###
 # DIR_PROJECT_HOME                   = pl.Path("..")
-DIR_PROJECT_HOME                   = pl.Path(".").resolve().parent
+# DIR_PROJECT_HOME                   = pl.Path(".").resolve().parent
+# Anchored on this file so paths are the same from notebooks/ and the CLI.
+DIR_PROJECT_HOME                   = pl.Path(__file__).resolve().parent.parent
 DIR_PROJECT_CURRENT                = pl.Path(".").resolve()
 
 DIR_DATA                           = DIR_PROJECT_HOME / "data"
 DIR_DATA_00_RAW                    = DIR_DATA / "00_raw" 
 DIR_DATA_01_PROCESSED              = DIR_DATA / "01_processed"
 DIR_DATA_02_VECTORIZED             = DIR_DATA / "02_vectorized"
+DIR_DATA_03_MODELS                 = DIR_DATA / "03_models"
 
 DIR_NOTEBOOKS                      = DIR_PROJECT_HOME / "notebooks"
 
@@ -54,6 +63,339 @@ FILE_SPOTIFY_CHURN_DATASET_CSV     = "spotify_churn_dataset.csv"
 ###
 # Figures, Plots, and Visualizations
 ###
+FIG_DPI = 300
+
+
+def save_figure(fig, path, dpi=FIG_DPI):
+    """
+    Save a matplotlib figure the way all stages do, then close it.
+
+    Parameters
+    ----------
+    fig : matplotlib.figure.Figure
+    path : Path or str
+    dpi : int
+
+    Returns
+    -------
+    Path
+    """
+    import matplotlib.pyplot as plt
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fig.savefig(path, dpi=dpi, bbox_inches="tight")
+    plt.close(fig)
+
+    return path
+
+
+# Suffix of the sidecar file holding the key a figure was rendered from.
+FIG_KEY_SUFFIX = ".key"
+
+
+def figure_spec(func, *args, **kwargs):
+    """
+    Describe a figure for ``render_figures``: ``func(*args, **kwargs)`` must
+    return a matplotlib figure. ``func`` and its arguments must be picklable.
+    """
+    return {"func": func, "args": args, "kwargs": kwargs}
+
+
+def _plotting_code(func):
+    """
+    Collect the source of ``func`` and of the functions and classes of its
+    module that it references, transitively, plus the module-level
+    constants they read.
+
+    Returns
+    -------
+    sources : dict
+        Qualified name to source.
+    constants : dict
+        Global name to value.
+    """
+    sources, constants = {}, {}
+    pending = [func]
+    while pending:
+        obj = pending.pop()
+        if obj.__qualname__ in sources:
+            continue
+        try:
+            sources[obj.__qualname__] = inspect.getsource(obj)
+        except (OSError, TypeError):
+            sources[obj.__qualname__] = ""
+        if not inspect.isfunction(obj):
+            continue
+
+        # nested functions and comprehensions keep their names in their own
+        # code objects
+        codes = [obj.__code__]
+        while codes:
+            code = codes.pop()
+            codes.extend(const for const in code.co_consts if inspect.iscode(const))
+            for name in code.co_names:
+                if name not in obj.__globals__:
+                    continue
+                value = obj.__globals__[name]
+                if inspect.isfunction(value) or inspect.isclass(value):
+                    if value.__module__ == func.__module__:
+                        pending.append(value)
+                elif not inspect.ismodule(value) and not callable(value):
+                    constants[name] = value
+    return sources, constants
+
+
+def figure_key(spec, dpi=FIG_DPI):
+    """
+    Return a hash of a figure's plotting code, inputs and dpi.
+
+    The code is the source of the plotting function plus the helpers and
+    constants of its module that it uses, so editing those redraws the
+    figure while edits elsewhere in the module do not.
+
+    Parameters
+    ----------
+    spec : dict
+        See ``figure_spec``.
+    dpi : int
+
+    Returns
+    -------
+    str
+    """
+    import joblib
+
+    func = spec["func"]
+    sources, constants = _plotting_code(func)
+    return joblib.hash((
+        func.__module__, func.__qualname__, sources, constants,
+        spec["args"], spec["kwargs"], dpi,
+    ))
+
+
+def _use_agg():
+    import matplotlib
+    matplotlib.use("Agg")
+
+
+def _init_figure_worker(threads):
+    from threadpoolctl import threadpool_limits
+
+    _use_agg()
+    threadpool_limits(limits=threads)
+
+
+def _render_figure(spec, path, key, dpi):
+    start = time.perf_counter()
+    fig = spec["func"](*spec["args"], **spec["kwargs"])
+    save_figure(fig, path, dpi=dpi)
+    Path(f"{path}{FIG_KEY_SUFFIX}").write_text(key)
+    return time.perf_counter() - start
+
+
+def render_figures(specs, fig_dir, dpi=FIG_DPI, jobs=None, force=False, log=None):
+    """
+    Render figures to ``fig_dir/<name>.png``, skipping unchanged ones.
+
+    Each PNG gets a sidecar holding its ``figure_key``; a figure is only
+    redrawn when the key changed, the PNG is missing or ``force`` is set.
+    Stale figures are drawn with the Agg backend, in a process pool when
+    the core budget allows more than one worker.
+
+    Parameters
+    ----------
+    specs : dict
+        Figure name to ``figure_spec``.
+    fig_dir : Path or str
+    dpi : int
+    jobs : int or None
+        Core budget; defaults to every available core. It is split by
+        ``plan_parallelism`` between worker processes and the BLAS/OpenMP
+        threads of each. With one worker (or one stale figure) figures are
+        drawn in this process.
+    force : bool
+    log : callable or None
+        Called with one progress line per figure.
+
+    Returns
+    -------
+    dict
+        Figure name to PNG path.
+    """
+    fig_dir = Path(fig_dir)
+    paths = {name: fig_dir / f"{name}.png" for name in specs}
+
+    stale = {}
+    for name, spec in specs.items():
+        key = figure_key(spec, dpi)
+        sidecar = Path(f"{paths[name]}{FIG_KEY_SUFFIX}")
+        current = paths[name].exists() and sidecar.exists() and sidecar.read_text() == key
+        if current and not force:
+            if log is not None:
+                log(f"[skip] {paths[name].name}: unchanged")
+            continue
+        stale[name] = key
+
+    plan = plan_parallelism(len(stale), jobs or -1)
+    if plan["outer"] <= 1:
+        _use_agg()
+        seconds = {name: _render_figure(specs[name], paths[name], key, dpi)
+                   for name, key in stale.items()}
+    else:
+        with concurrent.futures.ProcessPoolExecutor(
+            plan["outer"], initializer=_init_figure_worker, initargs=(plan["inner"],)
+        ) as pool:
+            futures = {
+                name: pool.submit(_render_figure, specs[name], paths[name], key, dpi)
+                for name, key in stale.items()
+            }
+            seconds = {name: future.result() for name, future in futures.items()}
+
+    if log is not None:
+        for name, elapsed in seconds.items():
+            log(f"[draw] {paths[name].name}: {elapsed:.2f}s")
+
+    return paths
+
+
+###
+# Statistics
+###
+
+def merge_moments(count_a, mean_a, m2_a, count_b, mean_b, m2_b):
+    """
+    Combine two sets of counts, means and sums of squared deviations.
+
+    This is the pairwise update of Chan et al.; it works elementwise on
+    arrays and is exact for the counts, so partial results from separate
+    chunks or processes can be merged in any order.
+
+    Returns
+    -------
+    count, mean, m2
+    """
+    import numpy as np
+
+    count = count_a + count_b
+    with np.errstate(invalid="ignore", divide="ignore"):
+        delta = mean_b - mean_a
+        weight_b = np.where(count > 0, count_b / count, 0.0)
+        mean = mean_a + delta * weight_b
+        m2 = m2_a + m2_b + delta ** 2 * count_a * weight_b
+    return count, mean, m2
+
+
+def subtract_moments(count, mean, m2, count_b, mean_b, m2_b):
+    """
+    Undo ``merge_moments``: remove part ``b`` from a merged set of moments.
+
+    Returns
+    -------
+    count_a, mean_a, m2_a
+        Zero where nothing is left.
+    """
+    import numpy as np
+
+    count_a = count - count_b
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_a = np.where(count_a > 0, (count * mean - count_b * mean_b) / count_a, 0.0)
+        delta = mean_b - mean_a
+        m2_a = np.where(count_a > 0, m2 - m2_b - delta ** 2 * count_a * count_b / count, 0.0)
+    return count_a, mean_a, np.maximum(m2_a, 0.0)
+
+
+###
+# Parallelism
+###
+
+def available_cores():
+    """
+    Return the number of cores this process may run on.
+    """
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def resolve_cores(cores=-1):
+    """
+    Turn a joblib-style ``n_jobs`` into a core count: None is 1, -1 every
+    available core, -2 all but one, and so on.
+    """
+    if cores is None:
+        return 1
+    if cores < 0:
+        return max(1, available_cores() + 1 + cores)
+    return max(1, cores)
+
+
+def plan_parallelism(n_tasks, cores=-1, max_inner=None):
+    """
+    Split a core budget between outer workers and inner threads.
+
+    Outer workers run independent tasks (candidates x folds, SHAP blocks);
+    inner threads are what each task may use itself (forest trees,
+    BLAS/OpenMP pools). Every layout with ``outer * inner <= cores`` is
+    scored by its makespan in task lengths, ``ceil(n_tasks / outer) /
+    inner``, assuming inner threads scale linearly up to ``max_inner``;
+    ties go to more outer workers, which scale without any sharing.
+
+    Returns
+    -------
+    dict
+        ``cores``, ``tasks``, ``outer`` and ``inner``.
+    """
+    cores = resolve_cores(cores)
+    n_tasks = max(1, n_tasks)
+
+    best = None
+    for outer in range(min(n_tasks, cores), 0, -1):
+        inner = cores // outer
+        if max_inner is not None:
+            inner = min(inner, max_inner)
+        makespan = -(-n_tasks // outer) / inner
+        if best is None or makespan < best[0]:
+            best = (makespan, outer, inner)
+
+    return {"cores": cores, "tasks": n_tasks, "outer": best[1], "inner": best[2]}
+
+
+def format_layout(plan, what="tasks"):
+    """
+    Describe a ``plan_parallelism`` layout in one line.
+    """
+    return (
+        f"[parallel] {plan['tasks']} {what} on {plan['cores']} cores: "
+        f"{plan['outer']} workers x {plan['inner']} threads"
+    )
+
+
+def call_with_thread_limit(inner, func, *args, **kwargs):
+    """
+    Call ``func`` with the BLAS/OpenMP pools of this process capped at
+    ``inner`` threads; used inside workers, where the parent's limits do
+    not reach.
+    """
+    from threadpoolctl import threadpool_limits
+
+    with threadpool_limits(limits=inner):
+        return func(*args, **kwargs)
+
+
+@contextlib.contextmanager
+def thread_limits(inner):
+    """
+    Cap BLAS/OpenMP pools at ``inner`` threads in this process and in the
+    loky workers joblib starts inside the block, e.g. ``GridSearchCV``'s.
+    """
+    import joblib
+    from threadpoolctl import threadpool_limits
+
+    with joblib.parallel_config(backend="loky", inner_max_num_threads=inner), \
+            threadpool_limits(limits=inner):
+        yield
 
 
 ###
@@ -81,3 +423,54 @@ def get_project_root(start_path=None):
 def is_csv_file(path):
     """Return True if path has .csv suffix."""
     return Path(path).suffix == ".csv"
+
+
+def hash_file(path, algorithm="sha256", blocksize=1 << 20):
+    """
+    Return the hex digest of a file's contents, read in fixed-size blocks.
+
+    Parameters
+    ----------
+    path : Path or str
+    algorithm : str
+        Any algorithm name accepted by ``hashlib.new``.
+    blocksize : int
+
+    Returns
+    -------
+    str
+    """
+    digest = hashlib.new(algorithm)
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(blocksize), b""):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+def hash_path(path, algorithm="sha256"):
+    """
+    Return a digest of a file, or of every file below a directory.
+
+    Directory digests cover each file's relative path and content, in
+    sorted order, so they change when any file is added, removed or edited.
+
+    Parameters
+    ----------
+    path : Path or str
+    algorithm : str
+
+    Returns
+    -------
+    str
+    """
+    path = Path(path)
+    if path.is_file():
+        return hash_file(path, algorithm=algorithm)
+
+    digest = hashlib.new(algorithm)
+    for child in sorted(p for p in path.rglob("*") if p.is_file()):
+        digest.update(child.relative_to(path).as_posix().encode())
+        digest.update(hash_file(child, algorithm=algorithm).encode())
+
+    return digest.hexdigest()
@@ -5,19 +5,934 @@
 ###
 import src.step00_utils as step00_utils
 
+import contextlib
+import gzip
+import hashlib
+import json
 import typing as typ
+import zipfile
 
+import numpy as np
 import pandas as pd
 import pandera as pdr
 import pathlib as pl
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 ###
-# ...
+# Schema
 ###
 
-def load_raw_csv_data(filepath: pl.Path):
+# Explicit parse types so every chunk comes out of the parser with the same
+# dtypes, independent of which values happen to land in it.
+RAW_DTYPES = {
+    "user_id": "int64",
+    "gender": "str",
+    "age": "int64",
+    "country": "str",
+    "subscription_type": "str",
+    "listening_time": "int64",
+    "songs_played_per_day": "int64",
+    "skip_rate": "float64",
+    "device_type": "str",
+    "ads_listened_per_week": "int64",
+    "offline_listening": "int64",
+    "is_churned": "int64",
+}
+
+# Inclusive value ranges; listening time is in minutes per day.
+RAW_RANGES = {
+    "user_id": (1, 2**31 - 1),
+    "age": (0, 120),
+    "listening_time": (0, 1440),
+    "songs_played_per_day": (0, 2880),
+    "skip_rate": (0.0, 1.0),
+    "ads_listened_per_week": (0, 10080),
+    "offline_listening": (0, 1),
+    "is_churned": (0, 1),
+}
+
+RAW_CATEGORIES = {
+    "gender": ["Female", "Male", "Other"],
+    "subscription_type": ["Family", "Free", "Premium", "Student"],
+    "device_type": ["Desktop", "Mobile", "Web"],
+}
+
+DEFAULT_CHUNKSIZE = 250_000
+
+# Length of the content-hash prefix used in cache file names.
+CACHE_KEY_LENGTH = 16
+
+
+def build_raw_schema() -> pdr.DataFrameSchema:
+    '''
+    Build the pandera schema of the raw churn dataset.
+
+    Returns
+    -------
+    pandera.DataFrameSchema
+    '''
+    columns = {}
+    for name, dtype in RAW_DTYPES.items():
+        checks = []
+        if name in RAW_RANGES:
+            checks.append(pdr.Check.in_range(*RAW_RANGES[name]))
+        if name in RAW_CATEGORIES:
+            checks.append(pdr.Check.isin(RAW_CATEGORIES[name]))
+        if name == "country":
+            checks.append(pdr.Check.str_length(2, 2))
+        columns[name] = pdr.Column(checks=checks, nullable=False)
+
+    return pdr.DataFrameSchema(columns, strict=True, ordered=True)
+
+
+RAW_SCHEMA = build_raw_schema()
+
+###
+# Compact Representation
+###
+
+# Narrow dtypes that the schema ranges above guarantee to be lossless for
+# the integer columns; skip_rate is rounded to float32.
+COMPACT_DTYPES = {
+    "user_id": "int32",
+    "gender": pd.CategoricalDtype(RAW_CATEGORIES["gender"]),
+    "age": "int16",
+    "country": "category",
+    "subscription_type": pd.CategoricalDtype(RAW_CATEGORIES["subscription_type"]),
+    "listening_time": "int16",
+    "songs_played_per_day": "int16",
+    "skip_rate": "float32",
+    "device_type": pd.CategoricalDtype(RAW_CATEGORIES["device_type"]),
+    "ads_listened_per_week": "int16",
+    "offline_listening": "int8",
+    "is_churned": "int8",
+}
+
+
+def compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    '''
+    Cast a raw churn frame to the narrow dtypes in ``COMPACT_DTYPES``.
+
+    The narrow integer types are only lossless inside ``RAW_RANGES``, so
+    every ranged column is checked before the cast, whether or not the
+    frame went through the schema.
+
+    Parameters
+    ----------
+    df : DataFrame
+
+    Returns
+    -------
+    DataFrame
+
+    Raises
+    ------
+    ValueError
+        If a value lies outside ``RAW_RANGES``.
+    '''
+    for name in df.columns.intersection(list(RAW_RANGES)):
+        low, high = RAW_RANGES[name]
+        values = df[name]
+        if len(values) and (values.min() < low or values.max() > high):
+            raise ValueError(
+                f"cannot compact {name!r}: values [{values.min()}, {values.max()}] "
+                f"outside [{low}, {high}]"
+            )
+
+    dtypes = {name: COMPACT_DTYPES[name] for name in df.columns if name in COMPACT_DTYPES}
+    return df.astype(dtypes)
+
+
+def concat_chunks(chunks: typ.Sequence[pd.DataFrame]) -> pd.DataFrame:
+    '''
+    Concatenate chunks, keeping categorical columns categorical.
+
+    ``pd.concat`` falls back to object dtype when chunks carry different
+    category sets (e.g. ``country``), so those are unified first.
+
+    Parameters
+    ----------
+    chunks : sequence of DataFrame
+
+    Returns
+    -------
+    DataFrame
+    '''
+    chunks = list(chunks)
+    for name, dtype in chunks[0].dtypes.items():
+        if not isinstance(dtype, pd.CategoricalDtype):
+            continue
+        categories = set()
+        for chunk in chunks:
+            categories.update(chunk[name].cat.categories)
+        if all(len(chunk[name].cat.categories) == len(categories) for chunk in chunks):
+            continue
+        categories = sorted(categories)
+        chunks = [
+            chunk.assign(**{name: chunk[name].cat.set_categories(categories)})
+            for chunk in chunks
+        ]
+
+    return pd.concat(chunks, ignore_index=True)
+
+
+def memory_report(
+    df: pd.DataFrame,
+    reference: typ.Optional[pd.DataFrame] = None,
+) -> pd.DataFrame:
+    '''
+    Report the in-memory footprint of every column.
+
+    Parameters
+    ----------
+    df : DataFrame
+    reference : DataFrame or None
+        Frame to compare against, typically the same data loaded without
+        ``compact``.
+
+    Returns
+    -------
+    DataFrame
+        One row per column with ``dtype`` and ``bytes``, plus
+        ``reference_dtype``, ``reference_bytes`` and ``ratio`` when a
+        reference is given.
+    '''
+    report = pd.DataFrame({
+        "dtype": df.dtypes.astype(str),
+        "bytes": df.memory_usage(index=False, deep=True),
+    })
+    if reference is not None:
+        report["reference_dtype"] = reference.dtypes.astype(str)
+        report["reference_bytes"] = reference.memory_usage(index=False, deep=True)
+        report["ratio"] = report["reference_bytes"] / report["bytes"]
+
+    return report
+
+###
+# Sources
+###
+
+ZIP_SUFFIXES = (".zip",)
+GZIP_SUFFIXES = (".gz", ".gzip")
+ZSTD_SUFFIXES = (".zst", ".zstd")
+
+
+def _default_zip_member(archive: zipfile.ZipFile) -> str:
+    names = [name for name in archive.namelist() if not name.endswith("/")]
+    csv_names = [name for name in names if step00_utils.is_csv_file(name)]
+    if len(csv_names) == 1:
+        return csv_names[0]
+
+    for name in csv_names:
+        if pl.PurePosixPath(name).name == step00_utils.FILE_SPOTIFY_CHURN_DATASET_CSV:
+            return name
+
+    raise ValueError(
+        f"{archive.filename} has {len(csv_names)} CSV members; pass member="
+    )
+
+
+@contextlib.contextmanager
+def open_raw_source(
+    filepath: pl.Path,
+    member: typ.Optional[str] = None,
+) -> typ.Iterator[typ.BinaryIO]:
     '''
-        ...
+    Open a raw data file, decompressing zip/gzip/zstd archives on the fly.
+
+    Nothing is extracted to disk: the returned handle decompresses
+    incrementally as the CSV parser reads from it.
+
+    Parameters
+    ----------
+    filepath : Path
+        Plain CSV, ``.zip``, ``.gz`` or ``.zst`` file.
+    member : str or None
+        Zip member to read. Defaults to the only CSV member, or to the
+        Spotify churn CSV when the archive holds several.
+
+    Yields
+    ------
+    binary file object
+    '''
+    filepath = pl.Path(filepath)
+    suffix = filepath.suffix.lower()
+
+    if suffix in ZIP_SUFFIXES:
+        with zipfile.ZipFile(filepath) as archive:
+            name = member if member is not None else _default_zip_member(archive)
+            with archive.open(name) as handle:
+                yield handle
+    elif suffix in GZIP_SUFFIXES:
+        with gzip.open(filepath, "rb") as handle:
+            yield handle
+    elif suffix in ZSTD_SUFFIXES:
+        try:
+            import zstandard
+        except ImportError as error:
+            raise ImportError(
+                "reading .zst archives requires the 'zstandard' package"
+            ) from error
+        with open(filepath, "rb") as raw:
+            with zstandard.ZstdDecompressor().stream_reader(raw) as handle:
+                yield handle
+    else:
+        with open(filepath, "rb") as handle:
+            yield handle
+
+
+def source_stem(filepath: pl.Path, member: typ.Optional[str] = None) -> str:
+    '''
+    Return a file-name stem for a raw source, without archive suffixes.
+
+    Parameters
+    ----------
+    filepath : Path
+    member : str or None
+
+    Returns
+    -------
+    str
+    '''
+    filepath = pl.Path(filepath)
+    name = filepath.name
+    for suffix in ZIP_SUFFIXES + GZIP_SUFFIXES + ZSTD_SUFFIXES + (".csv",):
+        if name.lower().endswith(suffix):
+            name = name[: -len(suffix)]
+
+    if member is not None:
+        name = f"{name}-{pl.PurePosixPath(member).stem}"
+
+    return name
+
+###
+# Loading
+###
+
+def iter_raw_csv_chunks(
+    filepath: pl.Path,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    usecols: typ.Optional[typ.Sequence[str]] = None,
+    validate: bool = True,
+    member: typ.Optional[str] = None,
+    compact: bool = False,
+) -> typ.Iterator[pd.DataFrame]:
+    '''
+    Stream the raw churn CSV as fixed-size, typed and validated chunks.
+
+    Parameters
+    ----------
+    filepath : Path
+        Plain CSV or a zip/gzip/zstd archive, see ``open_raw_source``.
+    chunksize : int
+        Number of rows per chunk; peak memory scales with this, not with
+        the file size.
+    usecols : sequence of str or None
+        Subset of columns to parse; projections are validated against the
+        matching columns of the schema.
+    validate : bool
+        Run the pandera schema on every chunk.
+    member : str or None
+        Zip member to read.
+    compact : bool
+        Cast each (validated) chunk with ``compact_frame``.
+
+    Yields
+    ------
+    DataFrame
+    '''
+    dtype = RAW_DTYPES
+    schema = RAW_SCHEMA
+    if usecols is not None:
+        unknown = sorted(set(usecols) - set(RAW_DTYPES))
+        if unknown:
+            raise ValueError(f"unknown raw columns: {unknown}")
+        # the parser keeps file order, whatever the order of usecols
+        projected = [name for name in RAW_DTYPES if name in set(usecols)]
+        dtype = {name: RAW_DTYPES[name] for name in projected}
+        schema = RAW_SCHEMA.select_columns(projected)
+
+    with open_raw_source(filepath, member=member) as handle:
+        reader = pd.read_csv(
+            handle,
+            dtype=dtype,
+            usecols=usecols,
+            chunksize=chunksize,
+        )
+        with reader:
+            for chunk in reader:
+                if validate:
+                    chunk = schema.validate(chunk)
+                if compact:
+                    chunk = compact_frame(chunk)
+                yield chunk
+
+
+def load_raw_csv_data(
+    filepath: pl.Path,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    usecols: typ.Optional[typ.Sequence[str]] = None,
+    validate: bool = True,
+    member: typ.Optional[str] = None,
+    compact: bool = False,
+) -> pd.DataFrame:
     '''
-    pass
-    # return pd.read_csv()
+    Load the raw churn CSV into a single frame via the chunked reader.
+
+    Parameters
+    ----------
+    filepath : Path
+    chunksize : int
+    usecols : sequence of str or None
+    validate : bool
+    member : str or None
+    compact : bool
+        Use the narrow dtypes of ``COMPACT_DTYPES``.
+
+    Returns
+    -------
+    DataFrame
+    '''
+    chunks = list(iter_raw_csv_chunks(
+        filepath,
+        chunksize=chunksize,
+        usecols=usecols,
+        validate=validate,
+        member=member,
+        compact=compact,
+    ))
+    if not chunks:
+        columns = list(usecols) if usecols is not None else list(RAW_DTYPES)
+        return pd.DataFrame(columns=columns)
+
+    return concat_chunks(chunks)
+
+###
+# Columnar Cache
+###
+
+def cached_parquet_path(
+    filepath: pl.Path,
+    cache_dir: pl.Path = step00_utils.DIR_DATA_01_PROCESSED,
+    member: typ.Optional[str] = None,
+) -> pl.Path:
+    '''
+    Return the cache location of a raw file, keyed by its content hash.
+
+    Parameters
+    ----------
+    filepath : Path
+    cache_dir : Path
+    member : str or None
+        Zip member; it is part of the key.
+
+    Returns
+    -------
+    Path
+    '''
+    key = step00_utils.hash_file(filepath)
+    if member is not None:
+        key = hashlib.sha256(f"{key}:{member}".encode()).hexdigest()
+
+    stem = source_stem(filepath, member)
+    return pl.Path(cache_dir) / f"{stem}.{key[:CACHE_KEY_LENGTH]}.parquet"
+
+
+def build_columnar_cache(
+    filepath: pl.Path,
+    cache_dir: pl.Path = step00_utils.DIR_DATA_01_PROCESSED,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    member: typ.Optional[str] = None,
+) -> pl.Path:
+    '''
+    Write a validated Parquet copy of a raw file, one row group per chunk.
+
+    Cached copies of older versions of the same file are removed, so the
+    cache directory only ever holds the copy matching the current raw file.
+
+    Parameters
+    ----------
+    filepath : Path
+    cache_dir : Path
+    chunksize : int
+    member : str or None
+
+    Returns
+    -------
+    Path
+        Location of the (possibly pre-existing) cached copy.
+    '''
+    cache_path = cached_parquet_path(filepath, cache_dir, member=member)
+    if cache_path.exists():
+        return cache_path
+
+    chunks = iter_raw_csv_chunks(filepath, chunksize=chunksize, member=member)
+    if not _write_parquet(chunks, _cache_tmp_path(cache_path)):
+        raise ValueError(f"{filepath} contains no rows")
+
+    return _commit_cache(cache_path, filepath, member)
+
+
+def _cache_tmp_path(cache_path: pl.Path) -> pl.Path:
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    return cache_path.with_suffix(".parquet.tmp")
+
+
+def _write_parquet(chunks: typ.Iterable[pd.DataFrame], path: pl.Path) -> int:
+    # One row group per chunk; returns the number of rows written.
+    writer = None
+    rows = 0
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table.cast(writer.schema))
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    return rows
+
+
+def _commit_cache(cache_path: pl.Path, filepath: pl.Path, member: typ.Optional[str]) -> pl.Path:
+    # Move the finished copy into place, then drop copies of older versions.
+    _cache_tmp_path(cache_path).replace(cache_path)
+
+    for stale in cache_path.parent.glob(f"{source_stem(filepath, member)}.*.parquet"):
+        if stale != cache_path:
+            stale.unlink()
+
+    return cache_path
+
+
+def load_cached_data(
+    filepath: pl.Path,
+    columns: typ.Optional[typ.Sequence[str]] = None,
+    cache_dir: pl.Path = step00_utils.DIR_DATA_01_PROCESSED,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    member: typ.Optional[str] = None,
+    compact: bool = False,
+) -> pd.DataFrame:
+    '''
+    Load the raw dataset through its columnar cache.
+
+    The first call (or the first call after the raw file changed) parses the
+    CSV and writes the cache; later calls only read the requested columns
+    from Parquet.
+
+    Parameters
+    ----------
+    filepath : Path
+    columns : sequence of str or None
+        Columns to read; all columns when None.
+    cache_dir : Path
+    chunksize : int
+    member : str or None
+    compact : bool
+        Use the narrow dtypes of ``COMPACT_DTYPES``; row groups are cast one
+        at a time so the wide frame is never materialized.
+
+    Returns
+    -------
+    DataFrame
+    '''
+    cache_path = build_columnar_cache(
+        filepath, cache_dir, chunksize=chunksize, member=member
+    )
+    columns = list(columns) if columns is not None else None
+    if not compact:
+        return pd.read_parquet(cache_path, columns=columns)
+
+    return concat_chunks(list(iter_cached_chunks(cache_path, columns, compact=True)))
+
+
+def iter_cached_chunks(
+    cache_path: pl.Path,
+    columns: typ.Optional[typ.Sequence[str]] = None,
+    compact: bool = False,
+    row_groups: typ.Optional[typ.Iterable[int]] = None,
+) -> typ.Iterator[pd.DataFrame]:
+    '''
+    Stream a columnar cache file one row group (one raw chunk) at a time.
+
+    Parameters
+    ----------
+    cache_path : Path
+        A file written by ``build_columnar_cache``.
+    columns : sequence of str or None
+    compact : bool
+        Cast each row group with ``compact_frame``.
+    row_groups : iterable of int or None
+        Row groups to read; all of them when None. Lets separate processes
+        each stream a disjoint share of the file.
+
+    Yields
+    ------
+    DataFrame
+    '''
+    parquet_file = pq.ParquetFile(cache_path)
+    columns = list(columns) if columns is not None else None
+    if row_groups is None:
+        row_groups = range(parquet_file.num_row_groups)
+
+    for i in row_groups:
+        chunk = parquet_file.read_row_group(i, columns=columns).to_pandas()
+        yield compact_frame(chunk) if compact else chunk
+
+###
+# Data Quality
+###
+
+NUMERIC_COLUMNS = [name for name, dtype in RAW_DTYPES.items() if dtype != "str"]
+STRING_COLUMNS = [name for name, dtype in RAW_DTYPES.items() if dtype == "str"]
+
+# Duplicated user ids listed in the report.
+QUALITY_SAMPLE_SIZE = 10
+
+# Set bits per byte value, to count the ids in the user_id bitmap.
+POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def init_quality_state() -> dict:
+    '''
+    Return an empty state for ``update_quality_state``.
+
+    ``user_id`` values seen so far are kept as a bitmap (one bit per id up
+    to the largest id seen), so duplicate detection costs ``max_id / 8``
+    bytes rather than a hash set of every id.
+
+    Returns
+    -------
+    dict
+        Row count, per-column counters, missing and unexpected columns, the
+        ``user_id`` bitmap and the duplicate counters.
+    '''
+    columns = {}
+    for name in RAW_DTYPES:
+        if name in NUMERIC_COLUMNS:
+            columns[name] = {"nulls": 0, "unparsable": 0, "out_of_range": 0,
+                             "min": None, "max": None}
+        else:
+            columns[name] = {"nulls": 0, "invalid": 0, "levels": {}}
+
+    return {
+        "rows": 0,
+        "columns": columns,
+        "missing_columns": [],
+        "unexpected_columns": [],
+        "user_id_bitmap": np.zeros(0, dtype=np.uint8),
+        "duplicate_user_ids": 0,
+        "duplicate_sample": [],
+    }
+
+
+def _update_user_ids(state: dict, ids: np.ndarray):
+    ids = ids[(ids >= 1) & (ids <= RAW_RANGES["user_id"][1])].astype(np.int64)
+    if not len(ids):
+        return
+
+    bitmap = state["user_id_bitmap"]
+    needed = int(ids.max()) // 8 + 1
+    if needed > len(bitmap):
+        # Grow geometrically so appending increasing ids stays amortised O(1).
+        bitmap = np.concatenate([bitmap, np.zeros(max(needed, 2 * len(bitmap)) - len(bitmap), np.uint8)])
+
+    byte, bit = ids >> 3, (1 << (ids & 7)).astype(np.uint8)
+    seen_before = (bitmap[byte] & bit) != 0
+
+    # Repeats inside the chunk: every occurrence after the first.
+    order = np.argsort(ids, kind="stable")
+    repeat = np.zeros(len(ids), dtype=bool)
+    repeat[order[1:]] = ids[order[1:]] == ids[order[:-1]]
+
+    duplicated = seen_before | repeat
+    state["duplicate_user_ids"] += int(duplicated.sum())
+    room = QUALITY_SAMPLE_SIZE - len(state["duplicate_sample"])
+    if room > 0 and duplicated.any():
+        state["duplicate_sample"].extend(int(i) for i in np.unique(ids[duplicated])[:room])
+
+    np.bitwise_or.at(bitmap, byte, bit)
+    state["user_id_bitmap"] = bitmap
+
+
+def update_quality_state(state: dict, chunk: pd.DataFrame) -> dict:
+    '''
+    Fold one chunk of raw rows into a quality state (in place). Numeric
+    columns may arrive as text when they hold unparsable values.
+
+    Every column is checked once: nulls, values that do not parse as
+    numbers, min/max and ``RAW_RANGES`` violations for numeric columns, and
+    levels outside ``RAW_CATEGORIES`` (or two-letter codes for country)
+    for string columns.
+
+    Parameters
+    ----------
+    state : dict
+        See ``init_quality_state``.
+    chunk : DataFrame
+        Raw rows, string columns parsed as text.
+
+    Returns
+    -------
+    dict
+        ``state``, updated.
+    '''
+    state["rows"] += len(chunk)
+    for name in set(RAW_DTYPES) - set(chunk.columns) - set(state["missing_columns"]):
+        state["missing_columns"].append(name)
+    for name in set(chunk.columns) - set(RAW_DTYPES) - set(state["unexpected_columns"]):
+        state["unexpected_columns"].append(name)
+
+    for name in NUMERIC_COLUMNS:
+        if name not in chunk:
+            continue
+        stats = state["columns"][name]
+        raw = chunk[name]
+        if pd.api.types.is_numeric_dtype(raw.dtype):
+            values = raw.to_numpy(dtype=np.float64, na_value=np.nan)
+        else:
+            # Only chunks where the parser met non-numeric text get here.
+            values = pd.to_numeric(raw, errors="coerce").to_numpy(dtype=np.float64)
+        missing = raw.isna().to_numpy()
+        parsed = ~np.isnan(values)
+        stats["nulls"] += int(missing.sum())
+        stats["unparsable"] += int((~missing & ~parsed).sum())
+
+        values = values[parsed]
+        if len(values):
+            lo, hi = float(values.min()), float(values.max())
+            stats["min"] = lo if stats["min"] is None else min(stats["min"], lo)
+            stats["max"] = hi if stats["max"] is None else max(stats["max"], hi)
+        if name in RAW_RANGES:
+            low, high = RAW_RANGES[name]
+            outside = (values < low) | (values > high)
+            if RAW_DTYPES[name].startswith("int"):
+                outside |= values != np.round(values)
+            stats["out_of_range"] += int(outside.sum())
+        if name == "user_id":
+            _update_user_ids(state, values)
+
+    for name in STRING_COLUMNS:
+        if name not in chunk:
+            continue
+        stats = state["columns"][name]
+        counts = chunk[name].value_counts(dropna=True)
+        stats["nulls"] += int(chunk[name].isna().sum())
+        for level, count in counts.items():
+            stats["levels"][level] = stats["levels"].get(level, 0) + int(count)
+        if name in RAW_CATEGORIES:
+            invalid = ~counts.index.isin(RAW_CATEGORIES[name])
+        else:
+            invalid = counts.index.str.len() != 2
+        stats["invalid"] += int(counts[invalid].sum())
+
+    return state
+
+
+def quality_failures(report: dict) -> list:
+    '''
+    Human-readable reasons a quality report fails the ingest gate; empty
+    when the data is clean.
+    '''
+    failures = []
+    for key in ["missing_columns", "unexpected_columns"]:
+        if report[key]:
+            failures.append(f"{key.replace('_', ' ')}: {', '.join(sorted(report[key]))}")
+    for name, stats in report["columns"].items():
+        for key in ["nulls", "unparsable", "out_of_range", "invalid"]:
+            if stats.get(key):
+                failures.append(f"{name}: {stats[key]} {key.replace('_', ' ')}")
+    if report["user_id"]["duplicates"]:
+        failures.append(f"user_id: {report['user_id']['duplicates']} duplicates "
+                        f"(e.g. {report['user_id']['duplicate_sample']})")
+    return failures
+
+
+def quality_report(state: dict) -> dict:
+    '''
+    JSON-serialisable summary of a quality state.
+    '''
+    columns = {}
+    for name, stats in state["columns"].items():
+        stats = dict(stats)
+        if "levels" in stats:
+            levels = stats.pop("levels")
+            stats["distinct"] = len(levels)
+            stats["levels"] = dict(sorted(levels.items())) if len(levels) <= 50 else None
+        columns[name] = stats
+
+    distinct = int(POPCOUNT[state["user_id_bitmap"]].sum(dtype=np.int64))
+    report = {
+        "rows": state["rows"],
+        "columns": columns,
+        "missing_columns": sorted(state["missing_columns"]),
+        "unexpected_columns": sorted(state["unexpected_columns"]),
+        "user_id": {
+            "distinct": distinct,
+            "duplicates": state["duplicate_user_ids"],
+            "duplicate_sample": state["duplicate_sample"],
+        },
+    }
+    report["failures"] = quality_failures(report)
+    report["passed"] = not report["failures"]
+    return report
+
+
+def profile_raw_data(
+    filepath: pl.Path,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    member: typ.Optional[str] = None,
+) -> dict:
+    '''
+    Profile a raw file in one pass over fixed-size chunks.
+
+    Unlike ``iter_raw_csv_chunks`` numeric dtypes are inferred per chunk and
+    no schema is enforced, so malformed files are reported rather than
+    raised.
+
+    Parameters
+    ----------
+    filepath : Path
+        Plain CSV or a zip/gzip/zstd archive, see ``open_raw_source``.
+    chunksize : int
+    member : str or None
+
+    Returns
+    -------
+    dict
+        See ``quality_report``; ``report["passed"]`` is the ingest gate.
+    '''
+    state = init_quality_state()
+    for _ in _iter_profiled_chunks(filepath, state, chunksize, member):
+        pass
+
+    report = quality_report(state)
+    report["source"] = source_stem(filepath, member)
+    return report
+
+
+def _iter_profiled_chunks(filepath, state, chunksize, member):
+    # Numeric dtypes are inferred per chunk, so malformed values reach the
+    # quality state instead of raising in the parser.
+    with open_raw_source(filepath, member=member) as handle:
+        dtype = {name: "str" for name in STRING_COLUMNS}
+        with pd.read_csv(handle, dtype=dtype, chunksize=chunksize) as reader:
+            for chunk in reader:
+                update_quality_state(state, chunk)
+                yield chunk
+
+
+def profile_and_cache(
+    filepath: pl.Path,
+    cache_dir: pl.Path = step00_utils.DIR_DATA_01_PROCESSED,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    member: typ.Optional[str] = None,
+) -> tuple:
+    '''
+    Profile a raw file and build its columnar cache in the same pass.
+
+    Every chunk is profiled as in ``profile_raw_data`` and, while the file
+    is valid so far, cast to ``RAW_DTYPES``, validated and written as in
+    ``build_columnar_cache``. The copy is only kept when the whole file
+    passes the quality gate; an existing copy is reused.
+
+    Parameters
+    ----------
+    filepath : Path
+    cache_dir : Path
+    chunksize : int
+    member : str or None
+
+    Returns
+    -------
+    report : dict
+        See ``quality_report``.
+    cache_path : Path or None
+        The cached copy; None when the gate failed.
+    '''
+    state = init_quality_state()
+    chunks = _iter_profiled_chunks(filepath, state, chunksize, member)
+    cache_path = cached_parquet_path(filepath, cache_dir, member=member)
+    errors = []
+
+    def validated():
+        for chunk in chunks:
+            if errors:
+                continue
+            try:
+                yield RAW_SCHEMA.validate(chunk.astype(RAW_DTYPES))
+            except (KeyError, TypeError, ValueError, pdr.errors.SchemaError) as error:
+                # Keep profiling the rest of the file for the report.
+                errors.append(error)
+
+    cached = cache_path.exists()
+    if cached:
+        for _ in chunks:
+            pass
+    else:
+        tmp_path = _cache_tmp_path(cache_path)
+        rows = _write_parquet(validated(), tmp_path)
+
+    report = quality_report(state)
+    report["source"] = source_stem(filepath, member)
+    if cached:
+        return report, cache_path if report["passed"] else None
+
+    if not report["passed"] or errors or not rows:
+        tmp_path.unlink(missing_ok=True)
+    if not report["passed"]:
+        return report, None
+    if errors:
+        raise errors[0]
+    if not rows:
+        raise ValueError(f"{filepath} contains no rows")
+
+    return report, _commit_cache(cache_path, filepath, member)
+
+
+def save_quality_report(report: dict, path: pl.Path) -> pl.Path:
+    '''
+    Write a quality report as JSON.
+
+    Parameters
+    ----------
+    report : dict
+        See ``quality_report``.
+    path : Path
+
+    Returns
+    -------
+    Path
+        ``path``.
+    '''
+    path = pl.Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, indent=2))
+    return path
+
+###
+# Pipeline Stage
+###
+
+def run_stage(paths: dict, upstream: dict, log=print, n_jobs=-1) -> dict:
+    '''
+    Pipeline stage: profile the raw data and validate it into the columnar
+    cache in one pass. The quality report is written even when the gate
+    fails. The pass is sequential, so the ``n_jobs`` core budget is unused.
+    '''
+    report, dataset = profile_and_cache(paths["raw"], paths["processed"])
+    report_path = save_quality_report(
+        report, pl.Path(paths["processed"]) / f"{report['source']}.quality.json"
+    )
+    if not report["passed"]:
+        raise ValueError(
+            f"data-quality gate failed, see {report_path}:\n" + "\n".join(report["failures"])
+        )
+
+    return {
+        "dataset": dataset,
+        "quality": report_path,
+    }
@@ -4,7 +4,1430 @@
 # Imports
 ###
 import src.step00_utils as step00_utils
+import src.step01_data as step01_data
+import src.step03_features as step03_features
+
+import base64
+import concurrent.futures
+import hashlib
+import json
+import pathlib as pl
+import time
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
 
 ###
 # Filepaths
 ###
+DIR_FIG_BUILDS_02_EDA = step00_utils.DIR_OUTPUTS_FIG_BUILDS_02_EDA
+DIR_EDA_STATE = step00_utils.DIR_DATA_01_PROCESSED / "eda_state"
+FILE_CHURN_CUBE = step00_utils.DIR_DATA_01_PROCESSED / "churn_cube.npz"
+FILE_SKETCHES = step00_utils.DIR_DATA_01_PROCESSED / "sketches.json"
+
+###
+# Aggregation
+###
+TARGET_COL = "is_churned"
+HIST_BINS = 20
+
+# Dimensions and numeric columns summarised for the EDA figures.
+EDA_DIMENSIONS = ["gender", "subscription_type", "offline_listening", "device_type"]
+EDA_NUMERIC = ["age", "listening_time"]
+
+# ``dimension``/``level`` of the row holding the whole-dataset totals.
+OVERALL = "all"
+
+
+def _codes(series: pd.Series):
+    '''
+    Return integer codes (-1 for missing) and the sorted levels of ``series``.
+    '''
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy(), series.cat.categories
+    return pd.factorize(series, sort=True)
+
+
+def histogram_edges(values, bins: int = HIST_BINS) -> np.ndarray:
+    '''
+    Equal-width bin edges over the range of ``values``, as ``np.histogram``.
+    '''
+    values = np.asarray(values, dtype=np.float64)
+    return np.histogram_bin_edges(values[np.isfinite(values)], bins=bins)
+
+
+def bin_index(values, edges: np.ndarray) -> np.ndarray:
+    '''
+    Histogram bin of each value over equal-width ``edges``; the last bin is
+    closed like ``np.histogram``. Missing and out-of-range values get -1.
+    '''
+    values = np.asarray(values, dtype=np.float64)
+    bins = len(edges) - 1
+    lo, hi = edges[0], edges[-1]
+    inside = (values >= lo) & (values <= hi)
+
+    # Arithmetic binning, then the same off-by-one correction against the
+    # edges that ``np.histogram`` applies, so counts match it exactly.
+    scale = bins / (hi - lo) if hi > lo else 0.0
+    idx = ((np.where(inside, values, lo) - lo) * scale).astype(np.intp)
+    np.minimum(idx, bins - 1, out=idx)
+    idx[values < edges[idx]] -= 1
+    idx[(values >= edges[np.minimum(idx + 1, bins)]) & (idx != bins - 1)] += 1
+    idx[~inside] = -1
+    return idx
+
+
+def _bincount_by_class(codes, y, n_levels: int) -> np.ndarray:
+    # Interleave classes so one integer bincount gives [stayed, churned]
+    # per level; rows with a negative code are dropped.
+    keep = codes >= 0
+    if not keep.all():
+        codes, y = codes[keep], y[keep]
+    return np.bincount(codes * 2 + y, minlength=2 * n_levels).reshape(n_levels, 2)
+
+
+# Histograms are accumulated in unit-width bins over the schema range and
+# only re-binned to ``HIST_BINS`` when summarising, so the edges can follow
+# the observed min/max exactly as ``np.histogram`` would on the full data.
+HIST_RANGES = {column: step01_data.RAW_RANGES[column] for column in EDA_NUMERIC}
+
+
+def _unit_bins(values, lo: int, hi: int) -> np.ndarray:
+    # Offset of each integer value from ``lo``; -1 for missing values.
+    values = np.asarray(values)
+    if not np.issubdtype(values.dtype, np.integer):
+        values = values.astype(np.float64)
+        missing = np.isnan(values)
+        if not np.array_equal(values[~missing], np.round(values[~missing])):
+            raise ValueError("histogram columns must hold integer values")
+        values = np.where(missing, lo - 1, values)
+        idx = values.astype(np.intp) - lo
+        if (values[~missing] < lo).any() or (values[~missing] > hi).any():
+            raise ValueError(f"values outside the histogram range [{lo}, {hi}]")
+        return idx
+
+    if len(values) and (values.min() < lo or values.max() > hi):
+        raise ValueError(f"values outside the histogram range [{lo}, {hi}]")
+    return values.astype(np.intp) - lo
+
+
+def init_eda_state(
+    dimensions: list = EDA_DIMENSIONS,
+    numeric: list = EDA_NUMERIC,
+    ranges: dict = HIST_RANGES,
+) -> dict:
+    '''
+    Return an empty state for ``update_eda_state``.
+
+    The state holds churn counters per level of each dimension, unit-width
+    histograms per churn class of each numeric column and their per-class
+    count/mean/M2 moments. It is a plain picklable dict, so states built
+    on separate chunks, shards or processes can be combined with
+    ``merge_eda_states``.
+
+    Parameters
+    ----------
+    dimensions : list of str
+    numeric : list of str
+        Integer columns with an entry in ``ranges``.
+    ranges : dict
+        Column to inclusive ``(lo, hi)`` value range.
+
+    Returns
+    -------
+    dict
+    '''
+    return {
+        "n": 0,
+        "churned": 0,
+        "dimensions": {column: {} for column in dimensions},
+        "ranges": {column: tuple(int(v) for v in ranges[column]) for column in numeric},
+        "histograms": {
+            column: np.zeros((ranges[column][1] - ranges[column][0] + 1, 2), dtype=np.int64)
+            for column in numeric
+        },
+        "moments": {
+            column: {"count": np.zeros(2), "mean": np.zeros(2), "m2": np.zeros(2)}
+            for column in numeric
+        },
+    }
+
+
+def update_eda_state(state: dict, chunk: pd.DataFrame) -> dict:
+    '''
+    Fold one chunk of rows into an EDA state (in place).
+    '''
+    y = chunk[TARGET_COL].to_numpy().astype(np.intp, copy=False)
+    state["n"] += len(y)
+    state["churned"] += int(y.sum())
+
+    for column, counters in state["dimensions"].items():
+        codes, levels = _codes(chunk[column])
+        counts = _bincount_by_class(codes.astype(np.intp, copy=False), y, len(levels))
+        for level, row in zip(levels.tolist(), counts):
+            counters[level] = counters.get(level, 0) + row
+
+    for column, hist in state["histograms"].items():
+        lo, hi = state["ranges"][column]
+        values = chunk[column].to_numpy()
+        hist += _bincount_by_class(_unit_bins(values, lo, hi), y, len(hist))
+
+        # Per-class moments of this chunk, then merged into the running ones.
+        values = values.astype(np.float64)
+        keep = ~np.isnan(values)
+        yk, vk = y[keep], values[keep]
+        count_b = np.bincount(yk, minlength=2).astype(np.float64)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_b = np.where(count_b > 0, np.bincount(yk, vk, minlength=2) / count_b, 0.0)
+        m2_b = np.bincount(yk, (vk - mean_b[yk]) ** 2, minlength=2)
+        moments = state["moments"][column]
+        moments["count"], moments["mean"], moments["m2"] = step00_utils.merge_moments(
+            moments["count"], moments["mean"], moments["m2"], count_b, mean_b, m2_b
+        )
+
+    return state
+
+
+def merge_eda_states(*states: dict) -> dict:
+    '''
+    Combine EDA states built on disjoint rows into a new state.
+    '''
+    first = states[0]
+    merged = init_eda_state(list(first["dimensions"]), list(first["histograms"]),
+                            first["ranges"])
+    for state in states:
+        if state["ranges"] != merged["ranges"] or state["dimensions"].keys() != merged["dimensions"].keys():
+            raise ValueError("cannot merge EDA states over different columns or ranges")
+        merged["n"] += state["n"]
+        merged["churned"] += state["churned"]
+        for column, counters in state["dimensions"].items():
+            target = merged["dimensions"][column]
+            for level, row in counters.items():
+                target[level] = target.get(level, 0) + row
+        for column, hist in state["histograms"].items():
+            merged["histograms"][column] += hist
+            a, b = merged["moments"][column], state["moments"][column]
+            a["count"], a["mean"], a["m2"] = step00_utils.merge_moments(
+                a["count"], a["mean"], a["m2"], b["count"], b["mean"], b["m2"]
+            )
+
+    return merged
+
+
+def summarize_eda_state(state: dict, bins: int = HIST_BINS) -> dict:
+    '''
+    Turn an EDA state into the tidy summary the plots consume.
+
+    Returns
+    -------
+    dict
+        ``"categories"``: one row per (dimension, level) with ``count``,
+        ``churned`` and ``churn_rate``, plus a ``(OVERALL, OVERALL)`` total
+        row. ``"histograms"``: one row per (column, class, bin) with
+        ``bin_left``, ``bin_right`` and ``count``; each class is binned over
+        its own range. ``"moments"``: one row per (column, class) with
+        ``count``, ``mean`` and ``var`` (ddof=1).
+    '''
+    frames = [pd.DataFrame({
+        "dimension": [OVERALL], "level": [OVERALL],
+        "count": [state["n"]], "churned": [state["churned"]],
+    })]
+    for column, counters in state["dimensions"].items():
+        levels = sorted(counters)
+        counts = np.array([counters[level] for level in levels], dtype=np.int64).reshape(-1, 2)
+        frames.append(pd.DataFrame({
+            "dimension": column,
+            "level": levels,
+            "count": counts.sum(axis=1),
+            "churned": counts[:, 1],
+        }))
+    categories = pd.concat(frames, ignore_index=True)
+    categories["churn_rate"] = categories["churned"] / categories["count"]
+
+    frames = []
+    moments = []
+    for column, hist in state["histograms"].items():
+        lo = state["ranges"][column][0]
+        # Each class gets its own edges over its own min/max, as the
+        # notebook's separate ``ax.hist(..., bins=20)`` calls do.
+        for label in (0, 1):
+            observed = np.flatnonzero(hist[:, label])
+            values = lo + observed
+            edges = histogram_edges(values[[0, -1]] if len(values) else values, bins)
+            counts = np.zeros(bins, dtype=np.int64)
+            np.add.at(counts, bin_index(values, edges), hist[observed, label])
+            frames.append(pd.DataFrame({
+                "column": column,
+                TARGET_COL: label,
+                "bin_left": edges[:-1],
+                "bin_right": edges[1:],
+                "count": counts,
+            }))
+
+        m = state["moments"][column]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            var = np.where(m["count"] > 1, m["m2"] / (m["count"] - 1), np.nan)
+        moments.append(pd.DataFrame({
+            "column": column,
+            TARGET_COL: [0, 1],
+            "count": m["count"].astype(np.int64),
+            "mean": np.where(m["count"] > 0, m["mean"], np.nan),
+            "var": var,
+        }))
+
+    histograms = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(
+        columns=["column", TARGET_COL, "bin_left", "bin_right", "count"]
+    )
+    moments = pd.concat(moments, ignore_index=True) if moments else pd.DataFrame(
+        columns=["column", TARGET_COL, "count", "mean", "var"]
+    )
+
+    return {"categories": categories, "histograms": histograms, "moments": moments}
+
+
+def aggregate_churn(
+    df: pd.DataFrame,
+    dimensions: list = EDA_DIMENSIONS,
+    numeric: list = EDA_NUMERIC,
+    bins: int = HIST_BINS,
+    ranges: dict = HIST_RANGES,
+) -> dict:
+    '''
+    Churn counts per level of each dimension and per histogram bin of each
+    numeric column for an in-memory frame.
+
+    This is the single-chunk case of the streaming accumulators: each
+    column costs one integer ``np.bincount`` over its codes.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Must contain ``TARGET_COL`` (0/1) and the requested columns.
+    dimensions : list of str
+        Categorical or discrete columns to break churn down by.
+    numeric : list of str
+        Integer columns to histogram separately for stayed and churned users.
+    bins : int
+        Number of equal-width bins per numeric column.
+    ranges : dict
+        Value range of each numeric column, see ``init_eda_state``.
+
+    Returns
+    -------
+    dict
+        See ``summarize_eda_state``.
+    '''
+    state = update_eda_state(init_eda_state(dimensions, numeric, ranges), df)
+    return summarize_eda_state(state, bins)
+
+
+def _eda_state_for_row_groups(cache_path, row_groups, dimensions, numeric, ranges):
+    state = init_eda_state(dimensions, numeric, ranges)
+    columns = [*dimensions, *numeric, TARGET_COL]
+    for chunk in step01_data.iter_cached_chunks(cache_path, columns, row_groups=row_groups):
+        update_eda_state(state, chunk)
+    return state
+
+
+def stream_eda_state(
+    cache_path: pl.Path,
+    jobs: int = 1,
+    dimensions: list = EDA_DIMENSIONS,
+    numeric: list = EDA_NUMERIC,
+    ranges: dict = HIST_RANGES,
+) -> dict:
+    '''
+    Build the EDA state of a columnar cache file one row group at a time.
+
+    Memory is bounded by one row group per process, not by the file size.
+
+    Parameters
+    ----------
+    cache_path : Path
+        A file written by ``step01_data.build_columnar_cache``.
+    jobs : int
+        Number of processes; each folds every ``jobs``-th row group and the
+        partial states are merged.
+
+    Returns
+    -------
+    dict
+    '''
+    n_groups = pq.ParquetFile(cache_path).num_row_groups
+    shares = [range(i, n_groups, jobs) for i in range(min(jobs, n_groups))]
+    if len(shares) <= 1:
+        return _eda_state_for_row_groups(cache_path, None, dimensions, numeric, ranges)
+
+    with concurrent.futures.ProcessPoolExecutor(len(shares)) as pool:
+        states = pool.map(
+            _eda_state_for_row_groups,
+            *zip(*[(cache_path, share, dimensions, numeric, ranges) for share in shares]),
+        )
+        return merge_eda_states(*states)
+
+
+def category_table(summary: dict, dimension: str) -> pd.DataFrame:
+    '''
+    Rows of ``summary["categories"]`` for one dimension, indexed by level.
+    '''
+    table = summary["categories"]
+    return table[table["dimension"] == dimension].set_index("level")
+
+
+def histogram_table(summary: dict, column: str, label: int) -> pd.DataFrame:
+    '''
+    Rows of ``summary["histograms"]`` for one numeric column and churn class.
+    '''
+    table = summary["histograms"]
+    mask = (table["column"] == column) & (table[TARGET_COL] == label)
+    return table[mask].reset_index(drop=True)
+
+
+def _aggregate_churn_reference(df: pd.DataFrame, dimensions=EDA_DIMENSIONS,
+                               numeric=EDA_NUMERIC, bins=HIST_BINS) -> dict:
+    # The notebook's approach: one groupby/value_counts per dimension and
+    # masked copies per histogram. Kept for benchmarking.
+    out = {}
+    for column in dimensions:
+        out[column] = (df.groupby(column)[TARGET_COL].mean(),
+                       df[column].value_counts())
+    for column in numeric:
+        for label in (0, 1):
+            out[(column, label)] = np.histogram(df[df[TARGET_COL] == label][column], bins=bins)
+    return out
+
+
+def benchmark_aggregate_churn(
+    n_rows: tuple = (1_000_000, 10_000_000),
+    repeat: int = 3,
+    random_state: int = 42,
+) -> pd.DataFrame:
+    '''
+    Time the per-dimension groupby baseline against ``aggregate_churn``.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per (n_rows, mode) with the best-of-``repeat`` time,
+        throughput and speedup over the baseline.
+    '''
+    rng = np.random.default_rng(random_state)
+    rows = []
+    for n in n_rows:
+        df = pd.DataFrame({
+            "gender": rng.choice(["Female", "Male", "Other"], n),
+            "subscription_type": rng.choice(["Free", "Premium", "Family", "Student"], n),
+            "offline_listening": rng.integers(0, 2, n),
+            "device_type": rng.choice(["Desktop", "Mobile", "Web"], n),
+            "age": rng.integers(16, 60, n),
+            "listening_time": rng.integers(10, 300, n),
+            TARGET_COL: rng.integers(0, 2, n),
+        })
+        modes = {"reference": _aggregate_churn_reference, "single_pass": aggregate_churn}
+        timings = {}
+        for mode, func in modes.items():
+            best = np.inf
+            for _ in range(repeat):
+                start = time.perf_counter()
+                func(df)
+                best = min(best, time.perf_counter() - start)
+            timings[mode] = best
+            rows.append({"n_rows": n, "mode": mode, "seconds": best,
+                         "rows_per_second": n / best})
+        for row in rows[-len(modes):]:
+            row["speedup"] = timings["reference"] / row["seconds"]
+
+    return pd.DataFrame(rows)
+
+###
+# Incremental State
+###
+EDA_STATE_FILE = "state.json"
+EDA_BATCH_DIR = "batches"
+BATCH_ID_LENGTH = 16
+
+
+def subtract_eda_state(state: dict, part: dict) -> dict:
+    '''
+    Remove a previously merged state from ``state``; the inverse of
+    ``merge_eda_states`` for ``part``.
+
+    Raises
+    ------
+    ValueError
+        If ``part`` covers other columns or ranges, or was not merged into
+        ``state``.
+    '''
+    if state["ranges"] != part["ranges"] or state["dimensions"].keys() != part["dimensions"].keys():
+        raise ValueError("cannot subtract EDA states over different columns or ranges")
+
+    result = merge_eda_states(state)
+    result["n"] -= part["n"]
+    result["churned"] -= part["churned"]
+    for column, counters in part["dimensions"].items():
+        target = result["dimensions"][column]
+        for level, row in counters.items():
+            if level not in target:
+                raise ValueError("subtracted state was not part of this state")
+            target[level] = target[level] - row
+            if target[level].sum() == 0:
+                del target[level]
+    for column, hist in part["histograms"].items():
+        result["histograms"][column] -= hist
+        a, b = result["moments"][column], part["moments"][column]
+        a["count"], a["mean"], a["m2"] = step00_utils.subtract_moments(
+            a["count"], a["mean"], a["m2"], b["count"], b["mean"], b["m2"]
+        )
+
+    if result["n"] < 0 or any((h < 0).any() for h in result["histograms"].values()):
+        raise ValueError("subtracted state was not part of this state")
+
+    return result
+
+
+def eda_state_to_json(state: dict) -> dict:
+    '''
+    JSON-serialisable form of an EDA state; levels keep their types.
+    '''
+    return {
+        "n": int(state["n"]),
+        "churned": int(state["churned"]),
+        "dimensions": {
+            column: [[level, *map(int, row)] for level, row in counters.items()]
+            for column, counters in state["dimensions"].items()
+        },
+        "ranges": {column: list(r) for column, r in state["ranges"].items()},
+        "histograms": {column: hist.tolist() for column, hist in state["histograms"].items()},
+        "moments": {
+            column: {key: value.tolist() for key, value in moments.items()}
+            for column, moments in state["moments"].items()
+        },
+    }
+
+
+def eda_state_from_json(payload: dict) -> dict:
+    '''
+    Inverse of ``eda_state_to_json``.
+    '''
+    return {
+        "n": payload["n"],
+        "churned": payload["churned"],
+        "dimensions": {
+            column: {level: np.array(row, dtype=np.int64) for level, *row in rows}
+            for column, rows in payload["dimensions"].items()
+        },
+        "ranges": {column: tuple(r) for column, r in payload["ranges"].items()},
+        "histograms": {
+            column: np.array(hist, dtype=np.int64).reshape(-1, 2)
+            for column, hist in payload["histograms"].items()
+        },
+        "moments": {
+            column: {key: np.array(value, dtype=np.float64) for key, value in moments.items()}
+            for column, moments in payload["moments"].items()
+        },
+    }
+
+
+def _write_json(path: pl.Path, payload: dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".json.tmp")
+    tmp_path.write_text(json.dumps(payload))
+    tmp_path.replace(path)
+
+
+def load_eda_state(state_dir: pl.Path = DIR_EDA_STATE) -> dict:
+    '''
+    Return the persisted EDA state, or an empty one if nothing was ingested.
+    '''
+    path = pl.Path(state_dir) / EDA_STATE_FILE
+    if not path.exists():
+        return init_eda_state()
+
+    return eda_state_from_json(json.loads(path.read_text()))
+
+
+def list_eda_batches(state_dir: pl.Path = DIR_EDA_STATE) -> list:
+    '''
+    Ids of the batches folded into the persisted state, oldest first.
+    '''
+    path = pl.Path(state_dir) / EDA_STATE_FILE
+    if not path.exists():
+        return []
+
+    return json.loads(path.read_text())["batches"]
+
+
+def _save_eda_state(state_dir: pl.Path, state: dict, batches: list):
+    _write_json(state_dir / EDA_STATE_FILE, {"batches": batches, **eda_state_to_json(state)})
+
+
+def _update_batch_digest(digest, chunk: pd.DataFrame):
+    # Rows are hashed in a canonical form (sorted columns, numbers as
+    # float64, everything else as text), so the same rows get the same id
+    # whether they come as a DataFrame or parsed from a raw file.
+    canonical = pd.DataFrame({
+        column: (
+            chunk[column].astype(np.float64)
+            if pd.api.types.is_numeric_dtype(chunk[column].dtype)
+            else chunk[column].astype(str)
+        )
+        for column in sorted(chunk.columns)
+    })
+    digest.update(pd.util.hash_pandas_object(canonical, index=False).to_numpy().tobytes())
+
+
+def batch_state(batch) -> tuple:
+    '''
+    Fold one batch into a fresh EDA state.
+
+    Parameters
+    ----------
+    batch : DataFrame or Path
+        Rows in memory, or a raw file streamed (and validated) with
+        ``step01_data.iter_raw_csv_chunks``.
+
+    Returns
+    -------
+    state : dict
+    batch_id : str
+        Content hash of the batch's rows, the same for a DataFrame and a
+        raw file holding the same rows.
+    '''
+    state = init_eda_state()
+    digest = hashlib.sha256()
+    chunks = [batch] if isinstance(batch, pd.DataFrame) else step01_data.iter_raw_csv_chunks(batch)
+    for chunk in chunks:
+        update_eda_state(state, chunk)
+        _update_batch_digest(digest, chunk)
+
+    return state, digest.hexdigest()[:BATCH_ID_LENGTH]
+
+
+def ingest_batch(batch, state_dir: pl.Path = DIR_EDA_STATE, batch_id: str = None) -> str:
+    '''
+    Add a batch of users to the persisted EDA state.
+
+    Only the batch is scanned; the stored state is updated by merging, so
+    the cost does not grow with the history already ingested. The batch's
+    own state is kept so it can later be removed with ``retract_batch``.
+
+    Parameters
+    ----------
+    batch : DataFrame or Path
+        See ``batch_state``.
+    state_dir : Path
+    batch_id : str or None
+        Defaults to the content hash of the batch.
+
+    Returns
+    -------
+    str
+        The batch id.
+
+    Raises
+    ------
+    ValueError
+        If a batch with the same id was already ingested.
+    '''
+    state_dir = pl.Path(state_dir)
+    part, content_id = batch_state(batch)
+    batch_id = batch_id or content_id
+
+    batches = list_eda_batches(state_dir)
+    if batch_id in batches:
+        raise ValueError(f"batch {batch_id} was already ingested")
+
+    # The batch list in state.json is the commit point: a batch file left by
+    # a crash before it is written is simply overwritten on the next try.
+    state = merge_eda_states(load_eda_state(state_dir), part)
+    _write_json(state_dir / EDA_BATCH_DIR / f"{batch_id}.json", eda_state_to_json(part))
+    _save_eda_state(state_dir, state, batches + [batch_id])
+    return batch_id
+
+
+def retract_batch(batch_id: str, state_dir: pl.Path = DIR_EDA_STATE) -> dict:
+    '''
+    Remove a previously ingested batch from the persisted EDA state.
+
+    Counts are restored exactly; moments up to floating-point rounding (use
+    ``rebuild_eda_state`` to recompute them from the remaining batches).
+
+    Returns
+    -------
+    dict
+        The updated state.
+    '''
+    state_dir = pl.Path(state_dir)
+    batches = list_eda_batches(state_dir)
+    if batch_id not in batches:
+        raise KeyError(f"batch {batch_id} was not ingested")
+
+    batch_path = state_dir / EDA_BATCH_DIR / f"{batch_id}.json"
+    part = eda_state_from_json(json.loads(batch_path.read_text()))
+    state = subtract_eda_state(load_eda_state(state_dir), part)
+    _save_eda_state(state_dir, state, [b for b in batches if b != batch_id])
+    batch_path.unlink(missing_ok=True)
+    return state
+
+
+def row_group_ids(cache_path: pl.Path) -> list:
+    '''
+    Content ids of the row groups of a columnar cache file, hashed from
+    their stored bytes without decoding them. Appending rows to the raw file
+    leaves the ids of the row groups that did not change as they were.
+
+    Returns
+    -------
+    list of str
+    '''
+    metadata = pq.ParquetFile(cache_path).metadata
+    ids = []
+    with open(cache_path, "rb") as handle:
+        for i in range(metadata.num_row_groups):
+            group = metadata.row_group(i)
+            digest = hashlib.sha256(f"{i}:{group.num_rows}".encode())
+            for j in range(group.num_columns):
+                column = group.column(j)
+                offset = column.data_page_offset
+                if column.has_dictionary_page:
+                    offset = column.dictionary_page_offset
+                handle.seek(offset)
+                digest.update(handle.read(column.total_compressed_size))
+            ids.append(digest.hexdigest()[:BATCH_ID_LENGTH])
+    return ids
+
+
+def sync_eda_state(cache_path: pl.Path, state_dir: pl.Path = DIR_EDA_STATE) -> dict:
+    '''
+    Bring the persisted EDA state in line with a columnar cache file, one
+    batch per row group.
+
+    Only row groups that are not in the state yet are read and ingested,
+    and batches whose row group is gone (e.g. a partial last chunk that
+    grew) are retracted, so the cost follows the appended rows rather than
+    the history.
+
+    Returns
+    -------
+    dict
+        The updated state.
+    '''
+    state_dir = pl.Path(state_dir)
+    ids = row_group_ids(cache_path)
+    for batch_id in set(list_eda_batches(state_dir)) - set(ids):
+        retract_batch(batch_id, state_dir)
+
+    seen = set(list_eda_batches(state_dir))
+    columns = [*EDA_DIMENSIONS, *EDA_NUMERIC, TARGET_COL]
+    for i, batch_id in enumerate(ids):
+        if batch_id not in seen:
+            chunk = next(step01_data.iter_cached_chunks(cache_path, columns, row_groups=[i]))
+            ingest_batch(chunk, state_dir, batch_id=batch_id)
+
+    return load_eda_state(state_dir)
+
+
+def rebuild_eda_state(state_dir: pl.Path = DIR_EDA_STATE) -> dict:
+    '''
+    Recompute the persisted state by merging every stored batch state.
+    '''
+    state_dir = pl.Path(state_dir)
+    batches = list_eda_batches(state_dir)
+    parts = [
+        eda_state_from_json(json.loads((state_dir / EDA_BATCH_DIR / f"{b}.json").read_text()))
+        for b in batches
+    ]
+    state = merge_eda_states(init_eda_state(), *parts)
+    _save_eda_state(state_dir, state, batches)
+    return state
+
+###
+# Churn Cube
+###
+
+# Every combination of these columns gets a cell in the cube.
+CUBE_DIMENSIONS = step03_features.CATEGORICAL_FEATURES + step03_features.BINARY_FEATURES
+
+
+def build_churn_cube(df: pd.DataFrame, dimensions: list = CUBE_DIMENSIONS) -> dict:
+    '''
+    Count users and churned users for every combination of ``dimensions``.
+
+    Rows with a missing value in any dimension are left out, as in
+    ``groupby``.
+
+    Returns
+    -------
+    dict
+        ``"dimensions"``, ``"levels"`` (dimension to sorted levels) and
+        ``"cells"``, an int64 array of shape ``(*n_levels, 2)`` holding
+        ``[count, churned]`` per combination.
+    '''
+    y = df[TARGET_COL].to_numpy().astype(np.intp, copy=False)
+    codes, levels = [], {}
+    for column in dimensions:
+        c, lv = _codes(df[column])
+        codes.append(c.astype(np.intp, copy=False))
+        levels[column] = lv.tolist()
+
+    shape = tuple(len(levels[column]) for column in dimensions)
+    keep = np.logical_and.reduce([c >= 0 for c in codes]) if codes else np.ones(len(y), bool)
+    flat = np.ravel_multi_index([c[keep] for c in codes], shape) if codes else np.zeros(keep.sum(), np.intp)
+    cells = _bincount_by_class(flat, y[keep], int(np.prod(shape)))
+    cells[:, 0] += cells[:, 1]
+
+    return {
+        "dimensions": list(dimensions),
+        "levels": levels,
+        "cells": cells.reshape(*shape, 2).astype(np.int64, copy=False),
+    }
+
+
+def merge_churn_cubes(*cubes: dict) -> dict:
+    '''
+    Add cubes built on disjoint rows; levels are unioned per dimension.
+    '''
+    dimensions = cubes[0]["dimensions"]
+    if any(cube["dimensions"] != dimensions for cube in cubes):
+        raise ValueError("cannot merge cubes over different dimensions")
+
+    levels = {
+        column: sorted(set().union(*(cube["levels"][column] for cube in cubes)))
+        for column in dimensions
+    }
+    cells = np.zeros((*(len(levels[column]) for column in dimensions), 2), dtype=np.int64)
+    for cube in cubes:
+        positions = [
+            np.searchsorted(levels[column], cube["levels"][column]) for column in dimensions
+        ]
+        cells[np.ix_(*positions, [0, 1])] += cube["cells"]
+
+    return {"dimensions": list(dimensions), "levels": levels, "cells": cells}
+
+
+def stream_churn_cube(cache_path: pl.Path, dimensions: list = CUBE_DIMENSIONS) -> dict:
+    '''
+    Build the cube of a columnar cache file one row group at a time.
+    '''
+    cube = None
+    columns = [*dimensions, TARGET_COL]
+    for chunk in step01_data.iter_cached_chunks(cache_path, columns, compact=True):
+        part = build_churn_cube(chunk, dimensions)
+        cube = part if cube is None else merge_churn_cubes(cube, part)
+
+    return cube if cube is not None else build_churn_cube(
+        pd.DataFrame(columns=columns).astype({TARGET_COL: int}), dimensions
+    )
+
+
+def cube_rollup(cube: dict, by: list = (), where: dict = None) -> np.ndarray:
+    '''
+    Slice and roll up the cube without touching row data.
+
+    Parameters
+    ----------
+    cube : dict
+    by : list of str
+        Dimensions to keep, in the order of the result axes; all other
+        dimensions are summed out.
+    where : dict or None
+        Dimension to a level or list of levels to restrict to.
+
+    Returns
+    -------
+    np.ndarray
+        Shape ``(*n_levels_of_by, 2)`` holding ``[count, churned]``.
+    '''
+    dimensions = cube["dimensions"]
+    cells = cube["cells"]
+    for column, value in (where or {}).items():
+        wanted = value if isinstance(value, (list, tuple)) else [value]
+        index = [cube["levels"][column].index(level) for level in wanted]
+        cells = cells.take(index, axis=dimensions.index(column))
+
+    summed = tuple(i for i, column in enumerate(dimensions) if column not in by)
+    cells = cells.sum(axis=summed)
+
+    kept = [column for column in dimensions if column in by]
+    return cells.transpose([kept.index(column) for column in by] + [len(by)])
+
+
+def cube_table(cube: dict, by: list = (), where: dict = None) -> pd.DataFrame:
+    '''
+    ``cube_rollup`` as a frame of ``count``, ``churned`` and ``churn_rate``
+    indexed by the levels of ``by``; empty combinations are dropped, as in
+    ``groupby``.
+    '''
+    by = list(by)
+    cells = cube_rollup(cube, by, where).reshape(-1, 2)
+    levels = []
+    for column in by:
+        value = (where or {}).get(column, cube["levels"][column])
+        levels.append(value if isinstance(value, (list, tuple)) else [value])
+
+    if len(by) > 1:
+        index = pd.MultiIndex.from_product(levels, names=by)
+    else:
+        index = pd.Index(levels[0] if by else [OVERALL], name=by[0] if by else None)
+    table = pd.DataFrame({"count": cells[:, 0], "churned": cells[:, 1]}, index=index)
+    table = table[table["count"] > 0]
+    table["churn_rate"] = table["churned"] / table["count"]
+    return table
+
+
+def save_churn_cube(cube: dict, path: pl.Path = FILE_CHURN_CUBE) -> pl.Path:
+    '''
+    Write the cube as a compressed ``.npz`` with the narrowest integer dtype
+    that holds its counts.
+    '''
+    path = pl.Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    dtype = np.min_scalar_type(int(cube["cells"].max()) if cube["cells"].size else 0)
+    meta = json.dumps({"dimensions": cube["dimensions"], "levels": cube["levels"]})
+    with open(path, "wb") as handle:
+        np.savez_compressed(handle, cells=cube["cells"].astype(dtype), meta=np.array(meta))
+
+    return path
+
+
+def load_churn_cube(path: pl.Path = FILE_CHURN_CUBE) -> dict:
+    '''
+    Inverse of ``save_churn_cube``.
+    '''
+    with np.load(path) as data:
+        meta = json.loads(str(data["meta"]))
+        cells = data["cells"].astype(np.int64)
+
+    return {"dimensions": meta["dimensions"], "levels": meta["levels"], "cells": cells}
+
+
+def benchmark_churn_cube(df: pd.DataFrame, queries: list, repeat: int = 20) -> pd.DataFrame:
+    '''
+    Time ``groupby`` on the rows against ``cube_rollup`` for each query.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+    queries : list of (by, where)
+    repeat : int
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per query with best-of-``repeat`` seconds for each method.
+    '''
+    cube = build_churn_cube(df)
+    rows = []
+    for by, where in queries:
+        def groupby():
+            frame = df
+            for column, value in (where or {}).items():
+                frame = frame[frame[column] == value]
+            return frame.groupby(list(by))[TARGET_COL].agg(["size", "sum"])
+
+        timings = {}
+        for name, func in {"groupby": groupby, "cube": lambda: cube_rollup(cube, by, where)}.items():
+            best = np.inf
+            for _ in range(repeat):
+                start = time.perf_counter()
+                func()
+                best = min(best, time.perf_counter() - start)
+            timings[name] = best
+        rows.append({"by": " x ".join(by), "where": where or "", **{
+            f"{name}_seconds": seconds for name, seconds in timings.items()
+        }, "speedup": timings["groupby"] / timings["cube"]})
+
+    return pd.DataFrame(rows)
+
+###
+# Sketches
+###
+
+SKETCH_QUANTILE_COLUMNS = [
+    "age",
+    "listening_time",
+    "songs_played_per_day",
+    "skip_rate",
+    "ads_listened_per_week",
+]
+SKETCH_DISTINCT_COLUMNS = ["country", "user_id"]
+
+# KLL: items kept by the top compactor; lower ones shrink by KLL_DECAY.
+KLL_K = 200
+KLL_DECAY = 2 / 3
+
+# HyperLogLog: 2**HLL_PRECISION registers, ~1.04 / sqrt(2**p) relative error.
+HLL_PRECISION = 14
+
+
+def init_kll(k: int = KLL_K, seed: int = 0) -> dict:
+    '''
+    Return an empty KLL quantile sketch.
+
+    Items at level ``h`` stand for ``2**h`` input values. ``compactions[h]``
+    counts how often level ``h`` was halved; it drives the error bounds.
+    '''
+    return {"k": k, "seed": seed, "n": 0, "levels": [np.empty(0)], "compactions": [0]}
+
+
+def _kll_capacity(sketch: dict, level: int) -> int:
+    depth = len(sketch["levels"]) - level - 1
+    return max(2, int(np.ceil(sketch["k"] * KLL_DECAY ** depth)))
+
+
+def _kll_compress(sketch: dict) -> dict:
+    levels, compactions = sketch["levels"], sketch["compactions"]
+    level = 0
+    while level < len(levels):
+        if len(levels[level]) <= _kll_capacity(sketch, level):
+            level += 1
+            continue
+        if level + 1 == len(levels):
+            levels.append(np.empty(0))
+            compactions.append(0)
+
+        # Halve the sorted buffer from a random offset; the odd item out stays.
+        items = np.sort(levels[level])
+        keep = items[:0] if len(items) % 2 == 0 else items[-1:]
+        items = items[:len(items) - len(keep)]
+        rng = np.random.default_rng([sketch["seed"], sum(compactions)])
+        levels[level + 1] = np.concatenate([levels[level + 1], items[rng.integers(2)::2]])
+        levels[level] = keep
+        compactions[level] += 1
+        # Capacities depend on the height, so recheck from the bottom.
+        level = 0
+
+    return sketch
+
+
+def kll_update(sketch: dict, values) -> dict:
+    '''
+    Add values to a KLL sketch (in place); missing values are ignored.
+    '''
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    sketch["n"] += len(values)
+    sketch["levels"][0] = np.concatenate([sketch["levels"][0], values])
+    return _kll_compress(sketch)
+
+
+def kll_merge(*sketches: dict) -> dict:
+    '''
+    Combine KLL sketches of disjoint inputs into a new sketch.
+    '''
+    height = max(len(sketch["levels"]) for sketch in sketches)
+    merged = init_kll(max(sketch["k"] for sketch in sketches), sketches[0]["seed"])
+    merged["levels"] = [np.empty(0) for _ in range(height)]
+    merged["compactions"] = [0] * height
+    for sketch in sketches:
+        merged["n"] += sketch["n"]
+        for h, items in enumerate(sketch["levels"]):
+            merged["levels"][h] = np.concatenate([merged["levels"][h], items])
+            merged["compactions"][h] += sketch["compactions"][h]
+
+    return _kll_compress(merged)
+
+
+def kll_quantile(sketch: dict, q):
+    '''
+    Approximate ``q``-quantile(s) of the values added to the sketch.
+    '''
+    items = np.concatenate(sketch["levels"])
+    if not len(items):
+        return np.full(np.shape(q), np.nan) if np.ndim(q) else np.nan
+    weights = np.concatenate([
+        np.full(len(level), 2.0 ** h) for h, level in enumerate(sketch["levels"])
+    ])
+    order = np.argsort(items, kind="stable")
+    cumulative = np.cumsum(weights[order])
+    rank = np.clip(np.asarray(q, dtype=np.float64) * cumulative[-1], 1, cumulative[-1])
+    return items[order][np.searchsorted(cumulative, rank)]
+
+
+def kll_rank_error(sketch: dict, delta: float = 0.01) -> dict:
+    '''
+    Rank-error bounds of a KLL sketch, as fractions of ``n``.
+
+    Halving level ``h`` moves the rank of any value by at most ``2**h``,
+    so ``sum_h compactions[h] * 2**h`` bounds the error deterministically.
+    With random offsets each of those moves is zero-mean, and Hoeffding's
+    inequality gives a bound that holds with probability ``1 - delta``.
+
+    Returns
+    -------
+    dict
+        ``"deterministic"`` and ``"probabilistic"`` (at ``delta``).
+    '''
+    n = sketch["n"]
+    if n == 0:
+        return {"deterministic": 0.0, "probabilistic": 0.0}
+
+    counts = np.asarray(sketch["compactions"], dtype=np.float64)
+    weights = 2.0 ** np.arange(len(counts))
+    worst = float(np.sum(counts * weights))
+    hoeffding = float(np.sqrt(2 * np.sum(counts * weights ** 2) * np.log(2 / delta)))
+    return {"deterministic": min(worst, n) / n, "probabilistic": min(hoeffding, worst, n) / n}
+
+
+def init_hll(precision: int = HLL_PRECISION) -> dict:
+    '''
+    Return an empty HyperLogLog distinct-count sketch.
+    '''
+    return {"precision": precision, "registers": np.zeros(2 ** precision, dtype=np.uint8)}
+
+
+def hll_update(sketch: dict, values) -> dict:
+    '''
+    Add values to a HyperLogLog sketch (in place).
+
+    Values are hashed with ``pd.util.hash_pandas_object``, whose fixed key
+    makes hashes, and so sketches, comparable across runs and dtypes.
+    '''
+    hashes = pd.util.hash_pandas_object(pd.Series(values), index=False).to_numpy()
+    p = sketch["precision"]
+    index = (hashes >> np.uint64(64 - p)).astype(np.intp)
+    rest = hashes & np.uint64((1 << (64 - p)) - 1)
+    # Position of the leftmost one bit in the remaining 64 - p bits; exact
+    # through frexp since those values fit in a float64 mantissa.
+    _, exponent = np.frexp(rest.astype(np.float64))
+    rank = np.where(rest == 0, 64 - p + 1, 64 - p - exponent + 1).astype(np.uint8)
+    np.maximum.at(sketch["registers"], index, rank)
+    return sketch
+
+
+def hll_merge(*sketches: dict) -> dict:
+    '''
+    Combine HyperLogLog sketches into a new one (union of the inputs).
+    '''
+    if len({sketch["precision"] for sketch in sketches}) != 1:
+        raise ValueError("cannot merge HyperLogLog sketches of different precision")
+
+    registers = np.maximum.reduce([sketch["registers"] for sketch in sketches])
+    return {"precision": sketches[0]["precision"], "registers": registers}
+
+
+def hll_count(sketch: dict) -> float:
+    '''
+    Estimated number of distinct values, with the small-range correction.
+    '''
+    m = len(sketch["registers"])
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = alpha * m * m / np.sum(2.0 ** -sketch["registers"].astype(np.float64))
+    zeros = np.count_nonzero(sketch["registers"] == 0)
+    if estimate <= 2.5 * m and zeros:
+        estimate = m * np.log(m / zeros)
+    return float(estimate)
+
+
+def hll_relative_error(sketch: dict) -> float:
+    '''
+    Standard error of ``hll_count`` relative to the true count.
+    '''
+    return 1.04 / np.sqrt(len(sketch["registers"]))
+
+
+def init_sketches(
+    quantile_columns: list = SKETCH_QUANTILE_COLUMNS,
+    distinct_columns: list = SKETCH_DISTINCT_COLUMNS,
+    k: int = KLL_K,
+    precision: int = HLL_PRECISION,
+) -> dict:
+    '''
+    Return empty quantile and distinct-count sketches for profiling.
+    '''
+    return {
+        "quantiles": {column: init_kll(k) for column in quantile_columns},
+        "distinct": {column: init_hll(precision) for column in distinct_columns},
+    }
+
+
+def update_sketches(sketches: dict, chunk: pd.DataFrame) -> dict:
+    '''
+    Fold one chunk of rows into the profiling sketches (in place).
+    '''
+    for column, sketch in sketches["quantiles"].items():
+        kll_update(sketch, chunk[column].to_numpy())
+    for column, sketch in sketches["distinct"].items():
+        hll_update(sketch, chunk[column])
+    return sketches
+
+
+def merge_sketches(*sketches: dict) -> dict:
+    '''
+    Combine profiling sketches of disjoint chunks, shards or runs.
+    '''
+    return {
+        "quantiles": {
+            column: kll_merge(*(s["quantiles"][column] for s in sketches))
+            for column in sketches[0]["quantiles"]
+        },
+        "distinct": {
+            column: hll_merge(*(s["distinct"][column] for s in sketches))
+            for column in sketches[0]["distinct"]
+        },
+    }
+
+
+def stream_sketches(cache_path: pl.Path, **kwargs) -> dict:
+    '''
+    Build profiling sketches of a columnar cache file one row group at a
+    time; ``kwargs`` go to ``init_sketches``.
+    '''
+    sketches = init_sketches(**kwargs)
+    columns = [*sketches["quantiles"], *sketches["distinct"]]
+    for chunk in step01_data.iter_cached_chunks(cache_path, list(dict.fromkeys(columns))):
+        update_sketches(sketches, chunk)
+    return sketches
+
+
+def sketch_report(sketches: dict, quantiles=(0.01, 0.25, 0.5, 0.75, 0.99),
+                  delta: float = 0.01) -> dict:
+    '''
+    Tidy summaries of the sketches with their error bounds.
+
+    Returns
+    -------
+    dict
+        ``"quantiles"``: one row per (column, q) with the estimate and the
+        rank-error bounds. ``"distinct"``: one row per column with the
+        estimated distinct count and its relative standard error.
+    '''
+    rows = []
+    for column, sketch in sketches["quantiles"].items():
+        bounds = kll_rank_error(sketch, delta)
+        for q, value in zip(quantiles, kll_quantile(sketch, list(quantiles))):
+            rows.append({"column": column, "q": q, "value": value, "n": sketch["n"],
+                         "rank_error": bounds["probabilistic"],
+                         "rank_error_worst": bounds["deterministic"]})
+    distinct = pd.DataFrame([
+        {"column": column, "distinct": hll_count(sketch),
+         "relative_error": hll_relative_error(sketch)}
+        for column, sketch in sketches["distinct"].items()
+    ])
+    return {"quantiles": pd.DataFrame(rows), "distinct": distinct}
+
+
+def sketches_to_json(sketches: dict) -> dict:
+    '''
+    JSON-serialisable form of profiling sketches.
+    '''
+    return {
+        "quantiles": {
+            column: {**sketch, "levels": [level.tolist() for level in sketch["levels"]]}
+            for column, sketch in sketches["quantiles"].items()
+        },
+        "distinct": {
+            column: {"precision": sketch["precision"],
+                     "registers": base64.b64encode(sketch["registers"].tobytes()).decode()}
+            for column, sketch in sketches["distinct"].items()
+        },
+    }
+
+
+def sketches_from_json(payload: dict) -> dict:
+    '''
+    Inverse of ``sketches_to_json``.
+    '''
+    return {
+        "quantiles": {
+            column: {**sketch, "levels": [np.array(level, dtype=np.float64)
+                                          for level in sketch["levels"]]}
+            for column, sketch in payload["quantiles"].items()
+        },
+        "distinct": {
+            column: {"precision": sketch["precision"],
+                     "registers": np.frombuffer(base64.b64decode(sketch["registers"]),
+                                                dtype=np.uint8).copy()}
+            for column, sketch in payload["distinct"].items()
+        },
+    }
+
+
+def save_sketches(sketches: dict, path: pl.Path = FILE_SKETCHES) -> pl.Path:
+    '''
+    Persist profiling sketches as JSON.
+    '''
+    path = pl.Path(path)
+    _write_json(path, sketches_to_json(sketches))
+    return path
+
+
+def load_sketches(path: pl.Path = FILE_SKETCHES) -> dict:
+    '''
+    Inverse of ``save_sketches``.
+    '''
+    return sketches_from_json(json.loads(pl.Path(path).read_text()))
+
+###
+# Figures
+###
+
+def _bar_with_labels(ax, series, xlabel, ylabel, title, value_labels=False):
+    series.plot(kind="bar", ax=ax)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    ax.set_title(title)
+    ax.set_xticks(range(len(series.index)))
+    ax.set_xticklabels(series.index, rotation=0)
+    if value_labels:
+        for i, value in enumerate(series):
+            ax.text(i, value + 0.5, f"{value:.1f}%", ha="center")
+
+
+def plot_churn_distribution(summary: dict):
+    '''
+    Bar chart of stayed vs churned users.
+    '''
+    total = category_table(summary, OVERALL).loc[OVERALL]
+    counts = pd.Series([total["count"] - total["churned"], total["churned"]], index=[0, 1])
+    fig, ax = plt.subplots()
+    counts.plot(kind="bar", ax=ax)
+    ax.set_xlabel("Churned Users vs Stayed (0 = stayed, 1 = churned)")
+    ax.set_ylabel("Number of Users")
+    ax.set_title("Churn Distribution")
+    ax.set_xticks([0, 1])
+    ax.set_xticklabels(["Stayed", "Churned"], rotation=0)
+    return fig
+
+
+def plot_churn_rate(summary: dict, column: str, label: str, value_labels=True):
+    '''
+    Bar chart of the churn rate (%) per level of ``column``.
+    '''
+    churn_rate = category_table(summary, column)["churn_rate"] * 100
+    churn_rate.index.name = column
+    fig, ax = plt.subplots()
+    _bar_with_labels(ax, churn_rate, label, "Churn Rate (%)",
+                     f"Churn Rate by {label}", value_labels=value_labels)
+    return fig
+
+
+def plot_distribution_by_churn(summary: dict, column: str, label: str, density=False):
+    '''
+    Overlaid histograms of ``column`` for stayed and churned users.
+    '''
+    fig, ax = plt.subplots()
+    for churned, name in [(0, "Not churned"), (1, "Churned")]:
+        table = histogram_table(summary, column, churned)
+        edges = np.append(table["bin_left"].to_numpy(), table["bin_right"].iloc[-1])
+        ax.hist(edges[:-1], bins=edges, weights=table["count"], alpha=0.6,
+                label=name, density=density)
+    ax.set_xlabel(label)
+    ax.set_ylabel("Density" if density else "Number of Users")
+    ax.set_title(f"{label} Distribution by Churn Status")
+    ax.legend()
+    return fig
+
+
+def _counts_by_level(summary: dict, column: str) -> pd.Series:
+    # Largest first, like ``value_counts``.
+    counts = category_table(summary, column)["count"]
+    return counts.sort_values(ascending=False, kind="stable")
+
+
+def plot_subscription_type_counts(summary: dict):
+    '''
+    Bar chart of users per subscription type.
+    '''
+    counts = _counts_by_level(summary, "subscription_type")
+    fig, ax = plt.subplots()
+    _bar_with_labels(ax, counts, "Subscription Type", "Number of Users",
+                     "User Count by Subscription Type")
+    return fig
+
+
+def plot_device_type_counts(summary: dict):
+    '''
+    Dot plot of users per device type.
+    '''
+    counts = _counts_by_level(summary, "device_type")
+    fig, ax = plt.subplots()
+    ax.plot(counts.values, counts.index, marker="o")
+    ax.set_xlabel("Number of Users")
+    ax.set_ylabel("Device Type")
+    ax.set_title("User Count by Device Type")
+    return fig
+
+
+def summary_subset(summary: dict, dimensions=(), columns=()) -> dict:
+    '''
+    The parts of an EDA summary for the given dimensions and numeric
+    columns, so each figure is keyed on just the data it draws.
+    '''
+    categories = summary["categories"]
+    histograms = summary["histograms"]
+    return {
+        "categories": categories[categories["dimension"].isin(dimensions)].reset_index(drop=True),
+        "histograms": histograms[histograms["column"].isin(columns)].reset_index(drop=True),
+    }
+
+
+def eda_figure_specs(summary: dict) -> dict:
+    '''
+    The step02 figures as ``step00_utils.figure_spec``s, by file name.
+    '''
+    spec = step00_utils.figure_spec
+    return {
+        "churn_distribution": spec(
+            plot_churn_distribution, summary_subset(summary, [OVERALL])),
+        "churn_rate_by_gender": spec(
+            plot_churn_rate, summary_subset(summary, ["gender"]), "gender", "Gender",
+            value_labels=False),
+        "age_distribution_by_churn": spec(
+            plot_distribution_by_churn, summary_subset(summary, columns=["age"]), "age", "Age"),
+        "subscription_type_user_count": spec(
+            plot_subscription_type_counts, summary_subset(summary, ["subscription_type"])),
+        "churn_rate_by_subscription_type": spec(
+            plot_churn_rate, summary_subset(summary, ["subscription_type"]),
+            "subscription_type", "Subscription Type"),
+        "listening_time_distribution_by_churn": spec(
+            plot_distribution_by_churn, summary_subset(summary, columns=["listening_time"]),
+            "listening_time", "Listening Time", density=True),
+        "churn_rate_by_offline_listening": spec(
+            plot_churn_rate, summary_subset(summary, ["offline_listening"]),
+            "offline_listening", "Offline Listening"),
+        "device_type_user_count_dot": spec(
+            plot_device_type_counts, summary_subset(summary, ["device_type"])),
+    }
+
+
+def render_eda_figures(summary: dict, fig_dir: pl.Path = DIR_FIG_BUILDS_02_EDA,
+                       jobs: int = None, force: bool = False, log=None) -> dict:
+    '''
+    Render the step02 EDA figures into ``fig_dir`` from an EDA summary, see
+    ``aggregate_churn`` and ``summarize_eda_state``. Figures whose inputs
+    did not change are not redrawn, see ``step00_utils.render_figures``.
+
+    Returns
+    -------
+    dict
+        Figure name to saved path.
+    '''
+    return step00_utils.render_figures(
+        eda_figure_specs(summary), fig_dir, jobs=jobs, force=force, log=log
+    )
+
+###
+# Pipeline Stage
+###
+
+def run_stage(paths: dict, upstream: dict, log=print, n_jobs=-1) -> dict:
+    '''
+    Pipeline stage: render the EDA figures from the persisted EDA state,
+    synced with the new row groups of the cached dataset, and build the
+    churn cube and the profiling sketches, streamed one row group at a time.
+    Figures are rendered within the ``n_jobs`` core budget.
+    '''
+    dataset = upstream["step01_data"]["dataset"]
+    state = sync_eda_state(dataset, paths["processed"] / DIR_EDA_STATE.name)
+    outputs = render_eda_figures(summarize_eda_state(state), paths["figures"] / "step02_eda",
+                                 jobs=n_jobs)
+    outputs["churn_cube"] = save_churn_cube(
+        stream_churn_cube(dataset), paths["processed"] / FILE_CHURN_CUBE.name
+    )
+    outputs["sketches"] = save_sketches(
+        stream_sketches(dataset), paths["processed"] / FILE_SKETCHES.name
+    )
+    return outputs
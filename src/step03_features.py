@@ -3,10 +3,20 @@
 # imports
 from __future__ import annotations
 
+import hashlib
+import json
+import shutil
+import time
+from pathlib import Path
+
 import src.step00_utils as step00_utils
+import joblib
+import numpy as np
 import pandas as pd
+import scipy.sparse as sp
 
 from sklearn.compose import ColumnTransformer
+from sklearn.model_selection import StratifiedKFold, train_test_split
 from sklearn.preprocessing import OneHotEncoder, StandardScaler
 
 # filepaths
@@ -23,6 +33,12 @@ VECTORIZED_DATA_DIR = step00_utils.DIR_DATA_02_VECTORIZED
 PROCESSED_DATA_DIR.mkdir(parents=True, exist_ok=True)
 VECTORIZED_DATA_DIR.mkdir(parents=True, exist_ok=True)
 
+VECTORIZED_TRAIN_DIR = VECTORIZED_DATA_DIR / "train"
+VECTORIZED_TEST_DIR = VECTORIZED_DATA_DIR / "test"
+VECTORIZED_META_FILE = "meta.json"
+
+SPLITS_DIR = PROCESSED_DATA_DIR / "splits"
+
 # features
 NUMERIC_FEATURES = [
     "age",
@@ -49,28 +65,144 @@ BINARY_FEATURES = [
 TARGET_COL = "is_churned"
 ID_COL = "user_id"
 
+# train/test split
+TEST_SIZE = 0.2
+RANDOM_STATE = 42
+
+# rows per block of the fused feature kernel; keeps the scratch buffer in cache
+FEATURE_BLOCK_SIZE = 1 << 16
+
+
 # feature engineering
-def engineer_features(df: pd.DataFrame) -> pd.DataFrame:
+def compute_interaction_features(
+    songs_played_per_day: np.ndarray,
+    ads_listened_per_week: np.ndarray,
+    listening_time: np.ndarray,
+    out: tuple[np.ndarray, np.ndarray] | None = None,
+    block_size: int = FEATURE_BLOCK_SIZE,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Compute ``ads_per_song`` and ``avg_song_length`` in one blocked pass.
+
+    Each block of rows is read once and both ratios are written straight
+    into the output buffers; the only temporary is a block-sized scratch
+    array, so no full-length intermediates are allocated.
+    """
+    n_rows = len(songs_played_per_day)
+    if out is None:
+        out = (np.empty(n_rows), np.empty(n_rows))
+    ads_per_song, avg_song_length = out
+
+    scratch = np.empty(min(block_size, n_rows))
+    for start in range(0, n_rows, block_size):
+        stop = min(start + block_size, n_rows)
+        songs = songs_played_per_day[start:stop]
+        denominator = scratch[:stop - start]
+
+        # +1 to denominators to avoid division by zero errors.
+        # ratio: how much ad spam are they tolerating per song?
+        np.multiply(songs, 7, out=denominator)
+        denominator += 1
+        np.divide(ads_listened_per_week[start:stop], denominator,
+                  out=ads_per_song[start:stop])
+
+        # ratio: are they listening to full songs or skipping fast?
+        np.add(songs, 1, out=denominator)
+        np.divide(listening_time[start:stop], denominator,
+                  out=avg_song_length[start:stop])
+
+    return ads_per_song, avg_song_length
+
+
+def engineer_features(
+    df: pd.DataFrame,
+    inplace: bool = False,
+    out: tuple[np.ndarray, np.ndarray] | None = None,
+) -> pd.DataFrame:
     """
     Perform light feature cleaning and create interaction features.
+
+    With ``inplace=True`` the input frame is modified and returned instead
+    of being copied first. ``out`` is passed on to
+    ``compute_interaction_features``: preallocated float64 buffers for
+    ``ads_per_song`` and ``avg_song_length``, one row per row of ``df``.
+    The new columns wrap their buffers without a copy, so buffers given in
+    ``out`` must not be reused while the frame is in use.
     """
-    df = df.copy()
+    if not inplace:
+        df = df.copy()
 
-    # type enforcement
-    df[BINARY_FEATURES] = df[BINARY_FEATURES].astype(int)
-    df[TARGET_COL] = df[TARGET_COL].astype(int)
+    # type enforcement (integer columns, e.g. compact int8, are kept as is)
+    for col in BINARY_FEATURES + [TARGET_COL]:
+        if not pd.api.types.is_integer_dtype(df[col].dtype):
+            df[col] = df[col].astype(int)
 
     # new features
-    # +1 to denominators to avoid division by zero errors.
-    # ratio: how much ad spam are they tolerating per song?
-    # ratio: are they listening to full songs or skipping fast?
+    ads_per_song, avg_song_length = compute_interaction_features(
+        df["songs_played_per_day"].to_numpy(),
+        df["ads_listened_per_week"].to_numpy(),
+        df["listening_time"].to_numpy(),
+        out=out,
+    )
+    df["ads_per_song"] = pd.Series(ads_per_song, index=df.index, copy=False)
+    df["avg_song_length"] = pd.Series(avg_song_length, index=df.index, copy=False)
+
+    return df
+
+
+def _engineer_features_reference(df: pd.DataFrame) -> pd.DataFrame:
+    # column-at-a-time implementation kept as the benchmark baseline
+    df = df.copy()
+    df[BINARY_FEATURES] = df[BINARY_FEATURES].astype(int)
+    df[TARGET_COL] = df[TARGET_COL].astype(int)
     est_songs_per_week = (df["songs_played_per_day"] * 7) + 1
     df["ads_per_song"] = df["ads_listened_per_week"] / est_songs_per_week
     df["avg_song_length"] = df["listening_time"] / (df["songs_played_per_day"] + 1)
-
     return df
 
 
+def benchmark_engineer_features(
+    n_rows: tuple[int, ...] = (1_000_000, 10_000_000),
+    repeat: int = 3,
+    random_state: int = 42,
+) -> pd.DataFrame:
+    """
+    Time the column-at-a-time baseline against the fused in-place path.
+
+    Returns one row per (n_rows, mode) with the best-of-``repeat`` time,
+    throughput in rows per second and speedup over the baseline.
+    """
+    rng = np.random.default_rng(random_state)
+    rows = []
+    for n in n_rows:
+        base = pd.DataFrame({
+            "listening_time": rng.integers(10, 300, n),
+            "songs_played_per_day": rng.integers(1, 100, n),
+            "ads_listened_per_week": rng.integers(0, 50, n),
+            "offline_listening": rng.integers(0, 2, n),
+            "is_churned": rng.integers(0, 2, n),
+        })
+        modes = {
+            "reference": lambda frame: _engineer_features_reference(frame),
+            "fused_inplace": lambda frame: engineer_features(frame, inplace=True),
+        }
+        timings = {}
+        for mode, func in modes.items():
+            best = np.inf
+            for _ in range(repeat):
+                frame = base.copy()
+                start = time.perf_counter()
+                func(frame)
+                best = min(best, time.perf_counter() - start)
+            timings[mode] = best
+            rows.append({"n_rows": n, "mode": mode, "seconds": best,
+                         "rows_per_second": n / best})
+        for row in rows[-len(modes):]:
+            row["speedup"] = timings["reference"] / row["seconds"]
+
+    return pd.DataFrame(rows)
+
+
 # X/y split function
 def make_X_y(df: pd.DataFrame):
     y = df[TARGET_COL]
@@ -78,13 +210,184 @@ def make_X_y(df: pd.DataFrame):
     return X, y
 
 
+# split manager: splits are stored as row indices, never as data copies
+def make_split(
+    y,
+    test_size: float = 0.2,
+    random_state: int = 42,
+    n_splits: int = 5,
+    shuffle_folds: bool = False,
+) -> dict:
+    """
+    Compute a stratified train/test split and k-fold assignment as indices.
+
+    ``train`` and ``test`` are int32 row positions into the full dataset
+    and match ``train_test_split(X, y, stratify=y)`` with the same
+    arguments. ``fold`` gives the validation fold of every training row,
+    matching ``StratifiedKFold`` (unshuffled by default, like
+    ``GridSearchCV(cv=n_splits)``). ``labels`` counts the rows per class,
+    so a cached split can be checked against the ``y`` it is used with.
+    """
+    y = np.asarray(y)
+    rows = np.arange(len(y))
+    train, test = train_test_split(
+        rows, test_size=test_size, random_state=random_state, stratify=y
+    )
+
+    # narrowest signed dtype holding every fold number
+    fold = np.empty(len(train), dtype=np.min_scalar_type(-n_splits))
+    kfold = StratifiedKFold(
+        n_splits=n_splits,
+        shuffle=shuffle_folds,
+        random_state=random_state if shuffle_folds else None,
+    )
+    for k, (_, val) in enumerate(kfold.split(train, y[train])):
+        fold[val] = k
+
+    return {
+        "train": train.astype(np.int32),
+        "test": test.astype(np.int32),
+        "fold": fold,
+        "labels": _label_counts(y),
+        "params": {
+            "test_size": test_size,
+            "random_state": random_state,
+            "n_splits": n_splits,
+            "shuffle_folds": shuffle_folds,
+        },
+    }
+
+
+def _label_counts(y) -> dict:
+    labels, counts = np.unique(np.asarray(y), return_counts=True)
+    return {str(label): int(count) for label, count in zip(labels, counts)}
+
+
+def split_key(data_key: str, **params) -> str:
+    """
+    Return the cache key of a split of the dataset identified by ``data_key``.
+    """
+    payload = json.dumps({"data": data_key, **params}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def split_path(data_key: str, cache_dir: Path = SPLITS_DIR, **params) -> Path:
+    """
+    Return where ``get_split`` caches the split with these arguments.
+    """
+    return Path(cache_dir) / f"split.{split_key(data_key, **params)}.npz"
+
+
+def save_split(split: dict, path: Path) -> Path:
+    """
+    Persist a split as a compressed ``.npz`` of its index arrays.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    np.savez_compressed(
+        path,
+        train=split["train"],
+        test=split["test"],
+        fold=split["fold"],
+        labels=json.dumps(split["labels"]),
+        params=json.dumps(split["params"]),
+    )
+    return path
+
+
+def load_split(path: Path) -> dict:
+    """
+    Load a split written by ``save_split``.
+    """
+    with np.load(path) as data:
+        return {
+            "train": data["train"],
+            "test": data["test"],
+            "fold": data["fold"],
+            # splits saved before class counts were recorded have none
+            "labels": json.loads(str(data["labels"])) if "labels" in data else None,
+            "params": json.loads(str(data["params"])),
+        }
+
+
+def get_split(y, data_key: str, cache_dir: Path = SPLITS_DIR, **params) -> dict:
+    """
+    Load the split of a dataset from ``cache_dir``, computing it on a miss.
+
+    ``data_key`` identifies the dataset version, e.g. the content hash of
+    its cached copy; ``params`` are passed on to ``make_split``. A cached
+    split whose row count or class counts differ from ``y`` was made for
+    other data under the same key and raises ``ValueError``; one cached
+    without class counts is recomputed.
+    """
+    path = split_path(data_key, cache_dir, **params)
+    split = load_split(path) if path.exists() else None
+    if split is not None and split["labels"] is not None:
+        n_rows = len(split["train"]) + len(split["test"])
+        if n_rows != len(y) or split["labels"] != _label_counts(y):
+            raise ValueError(
+                f"cached split {path.name} of {data_key!r} does not match y: "
+                f"cached {n_rows} rows {split['labels']}, "
+                f"got {len(y)} rows {_label_counts(y)}"
+            )
+        return split
+
+    split = make_split(y, **params)
+    save_split(split, path)
+    return split
+
+
+def split_views(X: pd.DataFrame, y: pd.Series, split: dict):
+    """
+    Return ``(X_train, X_test, y_train, y_test)`` selected by a split.
+    """
+    return (
+        X.iloc[split["train"]],
+        X.iloc[split["test"]],
+        y.iloc[split["train"]],
+        y.iloc[split["test"]],
+    )
+
+
+def fold_indices(split: dict) -> list[tuple[np.ndarray, np.ndarray]]:
+    """
+    Return the folds as ``(train, validation)`` positions within the
+    training set, usable as the ``cv`` argument of scikit-learn searches.
+    """
+    rows = np.arange(len(split["fold"]), dtype=np.int32)
+    return [
+        (rows[split["fold"] != k], rows[split["fold"] == k])
+        for k in range(split["params"]["n_splits"])
+    ]
+
+
+# dtype of the vectorized matrices; tree models work in float32 internally
+OUTPUT_DTYPE = np.float32
+
+# write the vectorized splits as CSR instead of dense arrays; step04 and
+# step05 accept both layouts
+SPARSE_OUTPUT = False
+
+# rows transformed at a time when writing vectorized matrices
+TRANSFORM_BLOCK_SIZE = 1 << 16
+
+
 # preprocessor
-def build_preprocessor() -> ColumnTransformer:
+def build_preprocessor(sparse: bool = False, dtype=np.float64) -> ColumnTransformer:
+    """
+    Build the feature preprocessor.
+
+    With ``sparse=True`` the one-hot block stays sparse and the transformer
+    always returns a CSR matrix, however dense the numeric block is.
+    ``dtype`` is the dtype of the one-hot block; use ``transform_features``
+    to get the whole matrix in a narrower dtype.
+    """
     numeric_transformer = StandardScaler()
 
     categorical_transformer = OneHotEncoder(
         handle_unknown="ignore",
-        sparse_output=False
+        sparse_output=sparse,
+        dtype=dtype,
     )
 
     preprocessor = ColumnTransformer(
@@ -92,7 +395,397 @@ def build_preprocessor() -> ColumnTransformer:
             ("num", numeric_transformer, NUMERIC_FEATURES),
             ("cat", categorical_transformer, CATEGORICAL_FEATURES),
             ("bin", "passthrough", BINARY_FEATURES),
-        ]
+        ],
+        sparse_threshold=1.0 if sparse else 0.3,
+    )
+
+    return preprocessor
+
+
+def transform_features(
+    preprocessor: ColumnTransformer,
+    X: pd.DataFrame,
+    dtype=OUTPUT_DTYPE,
+    block_size: int = TRANSFORM_BLOCK_SIZE,
+):
+    """
+    Transform ``X`` with a fitted preprocessor into a matrix of ``dtype``.
+
+    Rows are transformed block by block and written straight into the
+    output, so the full float64 matrix is never materialized next to the
+    narrow one. Sparse preprocessors yield a CSR matrix of ``dtype``.
+    """
+    n_rows = len(X)
+    blocks = (
+        preprocessor.transform(X.iloc[start:start + block_size])
+        for start in range(0, n_rows, block_size)
+    )
+
+    if preprocessor.sparse_output_:
+        parts = [sp.csr_matrix(block, dtype=dtype) for block in blocks]
+        if not parts:
+            return sp.csr_matrix((0, len(preprocessor.get_feature_names_out())), dtype=dtype)
+        return sp.vstack(parts, format="csr", dtype=dtype)
+
+    out = np.empty((n_rows, len(preprocessor.get_feature_names_out())), dtype=dtype)
+    for start, block in zip(range(0, n_rows, block_size), blocks):
+        out[start:start + len(block)] = block
+
+    return out
+
+
+def matrix_nbytes(X) -> int:
+    """
+    Return the bytes held by a dense array or by the buffers of a sparse matrix.
+    """
+    if sp.issparse(X):
+        return X.data.nbytes + X.indices.nbytes + X.indptr.nbytes
+    return np.asarray(X).nbytes
+
+
+def compare_output_memory(X: pd.DataFrame) -> pd.DataFrame:
+    """
+    Compare the vectorized matrix size of the dense and sparse preprocessors.
+    """
+    rows = []
+    for mode, sparse in [("dense", False), ("sparse", True)]:
+        X_processed = build_preprocessor(sparse=sparse).fit_transform(X)
+        n_cells = X_processed.shape[0] * X_processed.shape[1]
+        nnz = X_processed.nnz if sp.issparse(X_processed) else np.count_nonzero(X_processed)
+        rows.append({
+            "mode": mode,
+            "shape": X_processed.shape,
+            "density": nnz / n_cells,
+            "bytes": matrix_nbytes(X_processed),
+        })
+
+    report = pd.DataFrame(rows)
+    report["ratio"] = report["bytes"].iloc[0] / report["bytes"]
+    return report
+
+
+# incremental (out-of-core) preprocessor fitting
+def init_preprocessor_state() -> dict:
+    """
+    Return an empty state for ``update_preprocessor_state``.
+
+    The state holds per-column counts, means and sums of squared deviations
+    for the numeric features and the category vocabulary of every
+    categorical feature. It is a plain picklable dict, so partial states can
+    be computed on separate shards or processes and merged afterwards.
+    """
+    return {
+        "columns": None,
+        "dtypes": {},
+        "count": np.zeros(len(NUMERIC_FEATURES)),
+        "mean": np.zeros(len(NUMERIC_FEATURES)),
+        "m2": np.zeros(len(NUMERIC_FEATURES)),
+        "categories": {col: set() for col in CATEGORICAL_FEATURES},
+    }
+
+
+def _dtype_kind(dtype) -> str:
+    # chunks may carry their own categories, so only the kind of a column is
+    # compared, never the exact CategoricalDtype
+    if isinstance(dtype, pd.CategoricalDtype) or not pd.api.types.is_numeric_dtype(dtype):
+        return "categorical"
+    return "numeric"
+
+
+def update_preprocessor_state(state: dict, X_chunk: pd.DataFrame) -> dict:
+    """
+    Fold one chunk of features into a preprocessor state (in place).
+
+    Raises ``ValueError`` when the columns, or the kind (numeric or
+    categorical) of any column, differ from the chunks seen so far.
+    """
+    kinds = {col: _dtype_kind(dtype) for col, dtype in X_chunk.dtypes.items()}
+    if state["columns"] is None:
+        state["columns"] = list(X_chunk.columns)
+        state["dtypes"] = kinds
+    elif list(X_chunk.columns) != state["columns"]:
+        raise ValueError("chunk columns do not match the columns seen so far")
+    elif kinds != state["dtypes"]:
+        changed = sorted(col for col in kinds if kinds[col] != state["dtypes"][col])
+        raise ValueError(f"chunk column kinds differ from the chunks seen so far: {changed}")
+
+    values = X_chunk[NUMERIC_FEATURES].to_numpy(dtype=float)
+    count_b = np.sum(~np.isnan(values), axis=0).astype(float)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_b = np.where(count_b > 0, np.nansum(values, axis=0) / count_b, 0.0)
+    m2_b = np.nansum((values - mean_b) ** 2, axis=0)
+
+    state["count"], state["mean"], state["m2"] = step00_utils.merge_moments(
+        state["count"], state["mean"], state["m2"], count_b, mean_b, m2_b
+    )
+    for col in CATEGORICAL_FEATURES:
+        state["categories"][col].update(pd.unique(X_chunk[col]))
+
+    return state
+
+
+def merge_preprocessor_states(*states: dict) -> dict:
+    """
+    Merge partial preprocessor states computed on disjoint shards.
+    """
+    merged = init_preprocessor_state()
+    for state in states:
+        if state["columns"] is None:
+            continue
+        if merged["columns"] is None:
+            merged["columns"] = list(state["columns"])
+            merged["dtypes"] = dict(state["dtypes"])
+        elif state["columns"] != merged["columns"]:
+            raise ValueError("cannot merge states fitted on different columns")
+        elif state["dtypes"] != merged["dtypes"]:
+            raise ValueError("cannot merge states fitted on different column kinds")
+
+        merged["count"], merged["mean"], merged["m2"] = step00_utils.merge_moments(
+            merged["count"], merged["mean"], merged["m2"],
+            state["count"], state["mean"], state["m2"],
+        )
+        for col in CATEGORICAL_FEATURES:
+            merged["categories"][col].update(state["categories"][col])
+
+    return merged
+
+
+def _sorted_categories(values) -> list:
+    """
+    Order a category vocabulary as ``OneHotEncoder`` does: present levels
+    sorted, then one ``None`` and one ``NaN`` if either was seen.
+    """
+    present = [value for value in values if not pd.isna(value)]
+    missing = [value for value in values if pd.isna(value)]
+    return (
+        sorted(present)
+        + ([None] if any(value is None for value in missing) else [])
+        + ([np.nan] if any(value is not None for value in missing) else [])
+    )
+
+
+def finalize_preprocessor_state(state: dict, **kwargs) -> ColumnTransformer:
+    """
+    Build a fitted ``build_preprocessor()`` from an accumulated state.
+
+    The transformer is fitted on a tiny frame that contains every observed
+    category, so the encoder learns exactly the accumulated vocabularies,
+    and the scaler statistics are then replaced by the accumulated moments.
+    Categorical columns of the frame are plain object columns: shards read
+    with compact dtypes each carry their own categories, and the merged
+    vocabulary is the only one that covers them all.
+    Keyword arguments are passed on to ``build_preprocessor``.
+    """
+    if state["columns"] is None:
+        raise ValueError("cannot finalize an empty preprocessor state")
+
+    vocab = {col: _sorted_categories(values) for col, values in state["categories"].items()}
+    n_rows = max([len(values) for values in vocab.values()] + [1])
+    stub = pd.DataFrame({
+        col: (
+            np.resize(np.array(vocab[col], dtype=object), n_rows)
+            if col in vocab else np.zeros(n_rows)
+        )
+        for col in state["columns"]
+    })
+
+    preprocessor = build_preprocessor(**kwargs)
+    preprocessor.fit(stub)
+
+    scaler = preprocessor.named_transformers_["num"]
+    count_dtype = np.asarray(scaler.n_samples_seen_).dtype
+    var = np.where(state["count"] > 0, state["m2"] / np.maximum(state["count"], 1), 0.0)
+    scale = np.sqrt(var)
+    scale[scale < 10 * np.finfo(scale.dtype).eps] = 1.0
+
+    counts = state["count"].astype(count_dtype)
+    scaler.n_samples_seen_ = counts[0] if np.all(counts == counts[0]) else counts
+    scaler.mean_ = state["mean"].copy()
+    scaler.var_ = var
+    scaler.scale_ = scale
+
+    return preprocessor
+
+
+def fit_preprocessor_incremental(chunks, **kwargs) -> ColumnTransformer:
+    """
+    Fit ``build_preprocessor()`` chunk by chunk from an iterable of frames.
+    """
+    state = init_preprocessor_state()
+    for chunk in chunks:
+        update_preprocessor_state(state, chunk)
+
+    return finalize_preprocessor_state(state, **kwargs)
+
+
+# vectorized artifacts: raw .npy buffers plus a small metadata file
+def save_vectorized(
+    directory: Path,
+    X,
+    y,
+    feature_names: list[str] | None = None,
+) -> Path:
+    """
+    Write a vectorized split as ``.npy`` buffers that can be memory-mapped.
+
+    Dense matrices are stored as ``X.npy``; CSR matrices as
+    ``X.data.npy``, ``X.indices.npy`` and ``X.indptr.npy``. The directory is
+    written next to the target and swapped in at the end, so readers never
+    see a half-written split.
+    """
+    directory = Path(directory)
+    tmp_dir = directory.with_name(directory.name + ".tmp")
+    if tmp_dir.exists():
+        shutil.rmtree(tmp_dir)
+    tmp_dir.mkdir(parents=True)
+
+    if sp.issparse(X):
+        X = sp.csr_matrix(X)
+        np.save(tmp_dir / "X.data.npy", X.data)
+        np.save(tmp_dir / "X.indices.npy", X.indices)
+        np.save(tmp_dir / "X.indptr.npy", X.indptr)
+        layout = "csr"
+    else:
+        np.save(tmp_dir / "X.npy", np.ascontiguousarray(X))
+        layout = "dense"
+    np.save(tmp_dir / "y.npy", np.asarray(y))
+
+    meta = {
+        "layout": layout,
+        "shape": list(X.shape),
+        "dtype": str(X.dtype),
+        "y_name": getattr(y, "name", None),
+        "feature_names": list(feature_names) if feature_names is not None else None,
+    }
+    (tmp_dir / VECTORIZED_META_FILE).write_text(json.dumps(meta, indent=2))
+
+    if directory.exists():
+        shutil.rmtree(directory)
+    tmp_dir.rename(directory)
+
+    return directory
+
+
+def read_vectorized_meta(directory: Path) -> dict:
+    """
+    Return the metadata of a vectorized split written by ``save_vectorized``.
+    """
+    return json.loads((Path(directory) / VECTORIZED_META_FILE).read_text())
+
+
+def load_vectorized(directory: Path, mmap_mode: str | None = "r"):
+    """
+    Load a vectorized split as ``(X, y)``, memory-mapped read-only by default.
+
+    Several processes mapping the same split share one page-cache copy.
+    Legacy ``train.joblib``/``test.joblib`` pickles are still accepted.
+    """
+    directory = Path(directory)
+    if directory.suffix == ".joblib":
+        data = joblib.load(directory)
+        return data["X"], data["y"]
+
+    meta = read_vectorized_meta(directory)
+    y = np.load(directory / "y.npy", mmap_mode=mmap_mode)
+
+    if meta["layout"] == "csr":
+        X = sp.csr_matrix(
+            (
+                np.load(directory / "X.data.npy", mmap_mode=mmap_mode),
+                np.load(directory / "X.indices.npy", mmap_mode=mmap_mode),
+                np.load(directory / "X.indptr.npy", mmap_mode=mmap_mode),
+            ),
+            shape=tuple(meta["shape"]),
+            copy=False,
+        )
+    else:
+        X = np.load(directory / "X.npy", mmap_mode=mmap_mode)
+
+    return X, y
+
+
+def load_train_test(directory: Path = VECTORIZED_DATA_DIR, mmap_mode: str | None = "r"):
+    """
+    Load ``(X_train, y_train, X_test, y_test)`` from a vectorized directory.
+
+    Falls back to the legacy ``train.joblib``/``test.joblib`` pickles when
+    the ``train``/``test`` split directories have not been written yet.
+    """
+    directory = Path(directory)
+    splits = []
+    for name in ["train", "test"]:
+        path = directory / name
+        if not (path / VECTORIZED_META_FILE).exists():
+            path = directory / f"{name}.joblib"
+        splits.extend(load_vectorized(path, mmap_mode=mmap_mode))
+
+    return tuple(splits)
+
+
+# feature figure
+def plot_feature_boxplot(df: pd.DataFrame, column: str = "avg_song_length"):
+    """
+    Box plot of an engineered feature for stayed vs churned users.
+    """
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(8, 4))
+    groups = [df.loc[df[TARGET_COL] == label, column] for label in (0, 1)]
+    ax.boxplot(groups, tick_labels=["0", "1"])
+    ax.set_title("Does 'Average Song Length' differ by Churn Status?")
+    ax.set_xlabel(TARGET_COL)
+    ax.set_ylabel("Avg Song Length (Seconds)")
+    ax.grid(True, alpha=0.3)
+    return fig
+
+
+# pipeline stage
+def run_stage(paths: dict, upstream: dict, log=print, n_jobs=-1) -> dict:
+    """
+    Pipeline stage: engineer features, split, fit the preprocessor and
+    write the vectorized train/test splits, within the ``n_jobs`` core
+    budget.
+    """
+    dataset = Path(upstream["step01_data"]["dataset"])
+    vectorized_dir = Path(paths["vectorized"])
+
+    df = engineer_features(pd.read_parquet(dataset), inplace=True)
+    X, y = make_X_y(df)
+    split_args = {
+        "data_key": dataset.stem,
+        "cache_dir": Path(paths["processed"]) / "splits",
+        "test_size": TEST_SIZE,
+        "random_state": RANDOM_STATE,
+    }
+    split = get_split(y, **split_args)
+    X_train, X_test, y_train, y_test = split_views(X, y, split)
+
+    preprocessor = build_preprocessor(sparse=SPARSE_OUTPUT).fit(X_train)
+    feature_names = list(preprocessor.get_feature_names_out())
+
+    vectorized_dir.mkdir(parents=True, exist_ok=True)
+    preprocessor_path = vectorized_dir / "preprocessor.joblib"
+    joblib.dump(preprocessor, preprocessor_path)
+
+    figures = step00_utils.render_figures(
+        {"step03_feature_boxplot": step00_utils.figure_spec(
+            plot_feature_boxplot, df[["avg_song_length", TARGET_COL]])},
+        Path(paths["figures"]) / "step03_features",
+        jobs=n_jobs,
     )
 
-    return preprocessor
\ No newline at end of file
+    return {
+        "preprocessor": preprocessor_path,
+        # the split indices, so later stages can select raw training rows
+        # from the cached dataset without a copy of them
+        "split": split_path(**split_args),
+        "train": save_vectorized(
+            vectorized_dir / "train",
+            transform_features(preprocessor, X_train), y_train, feature_names,
+        ),
+        "test": save_vectorized(
+            vectorized_dir / "test",
+            transform_features(preprocessor, X_test), y_test, feature_names,
+        ),
+        **figures,
+    }
@@ -4,7 +4,1141 @@
 # Imports
 ###
 import src.step00_utils as step00_utils
+import src.step03_features as step03_features
+import src.model_registry as model_registry
+import src.trial_store as trial_store
+
+import json
+import math
+import pathlib as pl
+import time
+import warnings
+
+import joblib
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import classification_report, confusion_matrix, get_scorer
+from sklearn.model_selection import GridSearchCV, ParameterGrid, check_cv
+from sklearn.pipeline import Pipeline
+from sklearn.utils import resample
+from threadpoolctl import threadpool_limits
 
 ###
 # Filepaths
 ###
+DIR_DATA_02_VECTORIZED = step00_utils.DIR_DATA_02_VECTORIZED
+DIR_MODELS = model_registry.DIR_MODELS
+
+###
+# Modeling
+###
+RANDOM_STATE = 42
+
+PARAM_GRID = {
+    "n_estimators": [100, 200],
+    "max_depth": [10, None],
+    "min_samples_split": [2, 5],
+}
+
+# Preprocessor the stage's search refits on every training fold
+PREPROCESS = step03_features.build_preprocessor
+
+# Search engine of the stage: grows each forest through the n_estimators
+# axis instead of refitting it per value
+SEARCH = "warm_start"
+
+
+def fit_baseline(X_train, y_train, random_state=RANDOM_STATE, n_jobs=-1):
+    '''
+    Fit the class-balanced logistic regression baseline.
+
+    Dense arrays and CSR matrices are both accepted as is. BLAS threads are
+    capped at the ``n_jobs`` core budget.
+
+    Returns
+    -------
+    LogisticRegression
+    '''
+    baseline = LogisticRegression(
+        max_iter=1000,
+        random_state=random_state,
+        class_weight="balanced",
+    )
+    with threadpool_limits(limits=step00_utils.resolve_cores(n_jobs)):
+        return baseline.fit(X_train, y_train)
+
+
+def build_forest(random_state=RANDOM_STATE):
+    '''
+    Return the unfitted class-balanced random forest searched over.
+
+    Returns
+    -------
+    RandomForestClassifier
+    '''
+    return RandomForestClassifier(
+        random_state=random_state,
+        class_weight="balanced",
+    )
+
+
+def run_grid_search(
+    X_train,
+    y_train,
+    param_grid=PARAM_GRID,
+    cv=5,
+    scoring="f1",
+    n_jobs=-1,
+    random_state=RANDOM_STATE,
+    log=None,
+):
+    '''
+    Grid-search the class-balanced random forest with ``GridSearchCV``.
+
+    Dense arrays and CSR matrices are both accepted as is. ``n_jobs`` is
+    the core budget; ``plan_parallelism`` splits it between search workers
+    and forest/BLAS threads per fit, and ``log`` gets the layout.
+    ``exhaustive_search`` covers the same grid with cached folds and the
+    trial store.
+
+    Returns
+    -------
+    GridSearchCV
+        Fitted search; ``best_estimator_`` is the final model.
+    '''
+    n_fits = len(ParameterGrid(param_grid)) * check_cv(cv).get_n_splits()
+    plan = step00_utils.plan_parallelism(n_fits, n_jobs)
+    if log is not None:
+        log(step00_utils.format_layout(plan, "fits"))
+
+    grid_search = GridSearchCV(
+        build_forest(random_state).set_params(n_jobs=plan["inner"]),
+        param_grid,
+        cv=cv,
+        scoring=scoring,
+        n_jobs=plan["outer"],
+    )
+    with step00_utils.thread_limits(plan["inner"]):
+        grid_search.fit(X_train, y_train)
+    # The layout belongs to this search, not to the stored model.
+    grid_search.best_estimator_.set_params(n_jobs=None)
+    return grid_search
+
+###
+# Cross-Validation
+###
+
+def cv_splits(y, cv=5) -> list:
+    '''
+    Return the ``(train, test)`` index pairs ``GridSearchCV`` uses for ``cv``.
+
+    Returns
+    -------
+    list of (np.ndarray, np.ndarray)
+    '''
+    y = np.asarray(y)
+    return list(check_cv(cv, y, classifier=True).split(np.zeros((len(y), 1)), y))
+
+
+def fold_data(X, y, splits, preprocess=None, dtype=step03_features.OUTPUT_DTYPE) -> list:
+    '''
+    Prepare the cross-validation folds once, for every candidate to share.
+
+    Without ``preprocess`` ``X`` is already vectorized and each fold only
+    keeps its row indices into ``X``; ``fold_rows`` selects them at fit
+    time, so a memory-mapped ``X`` is never copied up front. With
+    ``preprocess``, a factory such as ``step03_features.build_preprocessor``,
+    ``X`` holds the raw feature columns: every fold gets its own
+    preprocessor, fitted on the fold's training rows only, and both sides
+    of the fold are transformed once. No validation-fold statistics leak
+    into the scaling, and no candidate refits the preprocessor.
+
+    Returns
+    -------
+    list of dict
+        ``y_train`` and ``y_test`` per fold, with ``X``, ``train`` and
+        ``test`` (row indices) or, with ``preprocess``, the transformed
+        ``X_train`` and ``X_test``.
+    '''
+    y = np.asarray(y)
+    folds = []
+    for train, test in splits:
+        fold = {"y_train": y[train], "y_test": y[test]}
+        if preprocess is None:
+            fold.update(X=X, train=train, test=test)
+        else:
+            preprocessor = preprocess()
+            fold["X_train"] = preprocessor.fit_transform(X.iloc[train]).astype(dtype)
+            fold["X_test"] = step03_features.transform_features(preprocessor, X.iloc[test], dtype)
+        folds.append(fold)
+    return folds
+
+
+def fold_rows(fold, side, rows=None):
+    '''
+    Return the ``"train"`` or ``"test"`` feature rows of a ``fold_data``
+    fold, optionally only its ``rows``.
+    '''
+    if f"X_{side}" in fold:
+        X = fold[f"X_{side}"]
+        return X if rows is None else X[rows]
+    index = fold[side] if rows is None else fold[side][rows]
+    return fold["X"][index]
+
+
+def refit_best(
+    X_train,
+    y_train,
+    best_params,
+    preprocess=None,
+    random_state=RANDOM_STATE,
+    n_jobs=None,
+):
+    '''
+    Fit the winning forest on all of ``X_train``.
+
+    With ``preprocess`` the forest is wrapped in a ``Pipeline`` behind a
+    fresh preprocessor, so the model takes raw feature columns. The single
+    fit gets all of the ``n_jobs`` core budget as forest threads.
+
+    Returns
+    -------
+    RandomForestClassifier or Pipeline
+    '''
+    threads = step00_utils.plan_parallelism(1, n_jobs)["inner"]
+    forest = build_forest(random_state).set_params(**best_params, n_jobs=threads)
+    model = forest
+    if preprocess is not None:
+        model = Pipeline([("preprocessor", preprocess()), ("model", forest)])
+    with threadpool_limits(limits=threads):
+        model.fit(X_train, y_train)
+    forest.set_params(n_jobs=None)
+    return model
+
+
+def search_study(cv=5, scoring="f1", random_state=RANDOM_STATE, preprocess=None) -> str:
+    '''
+    Return the trial-store study of a search: everything but the data and
+    the searched parameters that a trial's score depends on.
+
+    Returns
+    -------
+    str
+    '''
+    return trial_store.study_key(
+        estimator=model_registry.estimator_name(build_forest(random_state)),
+        estimator_params=build_forest(random_state).get_params(deep=False),
+        cv=cv,
+        scoring=scoring,
+        preprocess=_preprocess_name(preprocess),
+    )
+
+
+def _preprocess_name(preprocess):
+    if preprocess is None:
+        return None
+    return f"{preprocess.__module__}.{preprocess.__qualname__}"
+
+
+def _run_trials(tasks, n_jobs, store=None, data_hash=None, study=None, log=None):
+    '''
+    Run ``(keys, func, args)`` tasks, where ``func(*args, n_jobs=threads)``
+    returns one ``(score, fit_seconds, score_seconds)`` per
+    ``(params_key, fold)`` of ``keys``. The ``n_jobs`` core budget is split
+    by ``plan_parallelism`` and enforced inside every worker. With a
+    ``store`` every task is recorded as soon as it finishes, so an
+    interrupted search keeps all completed fits.
+
+    Returns
+    -------
+    results : dict
+    plan : dict
+    '''
+    plan = step00_utils.plan_parallelism(len(tasks), n_jobs)
+    if log is not None and tasks:
+        log(step00_utils.format_layout(plan, "fits"))
+
+    outputs = joblib.Parallel(n_jobs=plan["outer"], return_as="generator")(
+        joblib.delayed(step00_utils.call_with_thread_limit)(
+            plan["inner"], func, *args, n_jobs=plan["inner"]
+        )
+        for _, func, args in tasks
+    )
+    results = {}
+    for (keys, _, _), output in zip(tasks, outputs):
+        finished = dict(zip(keys, output))
+        if store is not None:
+            trial_store.record_trials(
+                data_hash, study, [(*key, result) for key, result in finished.items()], store
+            )
+        results.update(finished)
+    return results, plan
+
+
+def _stored_trials(X_train, y_train, store, data_hash, study):
+    if store is None:
+        return None, {}
+    if data_hash is None:
+        data_hash = joblib.hash((X_train, y_train), coerce_mmap=True)
+    return data_hash, trial_store.load_trials(data_hash, study, store)
+
+###
+# Successive Halving
+###
+
+SEARCH_RESOURCES = ("n_samples", "n_estimators")
+HALVING_FACTOR = 3
+
+
+def halving_schedule(
+    n_candidates: int,
+    max_resource: int,
+    factor: int = HALVING_FACTOR,
+    min_resource: int | None = None,
+    budget: int | None = None,
+) -> list:
+    '''
+    Return the rounds of a successive-halving search.
+
+    Round ``i`` keeps ``ceil(n_candidates / factor**i)`` candidates, so the
+    last round evaluates a single one. Without ``budget`` each candidate of
+    round ``i`` gets ``min_resource * factor**i`` resource units, capped at
+    ``max_resource``; by default ``min_resource`` is chosen so the last round
+    runs at ``max_resource``. With ``budget`` (resource units per fold for
+    the whole search) every round gets the same share of the budget, split
+    evenly between its candidates and capped at ``max_resource``.
+
+    Parameters
+    ----------
+    n_candidates : int
+    max_resource : int
+    factor : int
+        Elimination rate; one in ``factor`` candidates survives a round.
+    min_resource : int, optional
+        Resource of the first round; with ``budget``, the floor a round may
+        not go below.
+    budget : int, optional
+
+    Returns
+    -------
+    list of dict
+        ``{"round", "n_candidates", "resource"}`` per round.
+
+    Raises
+    ------
+    ValueError
+        If ``budget`` cannot give the first round ``min_resource`` units.
+    '''
+    if factor < 2:
+        raise ValueError(f"factor must be at least 2, got {factor}")
+
+    sizes = [n_candidates]
+    while sizes[-1] > 1:
+        sizes.append(math.ceil(sizes[-1] / factor))
+    n_rounds = len(sizes)
+
+    if budget is not None:
+        resources = [min(max_resource, budget // (n_rounds * size)) for size in sizes]
+        floor = min_resource or 1
+        if resources[0] < floor:
+            raise ValueError(
+                f"budget {budget} gives {resources[0]} resource units to each of "
+                f"{n_candidates} candidates, less than the minimum {floor}"
+            )
+    elif min_resource is None:
+        resources = [max(1, max_resource // factor ** (n_rounds - 1 - i)) for i in range(n_rounds)]
+    else:
+        resources = [min(max_resource, min_resource * factor ** i) for i in range(n_rounds)]
+
+    return [
+        {"round": i, "n_candidates": size, "resource": int(resource)}
+        for i, (size, resource) in enumerate(zip(sizes, resources))
+    ]
+
+
+def _fit_and_score(fold, params, resource, amount, scorer, random_state, n_jobs=None):
+    y_fit = fold["y_train"]
+    rows = None
+    if resource == "n_samples":
+        if amount < len(y_fit):
+            rows = resample(
+                np.arange(len(y_fit)), n_samples=amount, replace=False,
+                stratify=y_fit, random_state=random_state,
+            )
+            y_fit = y_fit[rows]
+    elif resource is not None:
+        params = {**params, resource: amount}
+    X_fit = fold_rows(fold, "train", rows)
+
+    start = time.perf_counter()
+    model = clone(build_forest(random_state)).set_params(**params, n_jobs=n_jobs).fit(X_fit, y_fit)
+    fit_seconds = time.perf_counter() - start
+    score = scorer(model, fold_rows(fold, "test"), fold["y_test"])
+    return [(score, fit_seconds, time.perf_counter() - start - fit_seconds)]
+
+
+def successive_halving_search(
+    X_train,
+    y_train,
+    param_grid=PARAM_GRID,
+    resource="n_samples",
+    max_resource=None,
+    min_resource=None,
+    factor=HALVING_FACTOR,
+    budget=None,
+    cv=5,
+    scoring="f1",
+    n_jobs=-1,
+    random_state=RANDOM_STATE,
+    refit=True,
+    preprocess=None,
+    store=None,
+    data_hash=None,
+    log=None,
+):
+    '''
+    Successive-halving search over the class-balanced random forest.
+
+    Every candidate of ``param_grid`` is cross-validated on a small amount
+    of ``resource``; only the best ``1 / factor`` of them move on to the
+    next round, which gets ``factor`` times the resource. The folds are the
+    ones ``GridSearchCV`` would use, and each fit is scored on the whole
+    validation fold, so scores are comparable across rounds.
+
+    Parameters
+    ----------
+    X_train, y_train : training data, dense or CSR, or raw feature columns
+        with ``preprocess``
+    param_grid : dict
+        Same format as for ``run_grid_search``.
+    resource : {"n_samples", "n_estimators"}
+        ``n_samples`` subsamples each training fold (stratified);
+        ``n_estimators`` grows the forest. An ``n_estimators`` axis in
+        ``param_grid`` is dropped in the latter case and its largest value
+        becomes the default ``max_resource``.
+    max_resource, min_resource, factor, budget
+        See ``halving_schedule``. ``max_resource`` defaults to the smallest
+        training fold for ``n_samples``.
+    cv, scoring, n_jobs, random_state
+        As for ``run_grid_search``; the ``n_jobs`` core budget is split
+        between the fits of a round and their forest threads.
+    refit : bool
+        Refit the winner on all of ``X_train`` with ``max_resource``.
+    preprocess : callable, optional
+        Preprocessor factory for raw ``X_train`` columns, see ``fold_data``.
+    store : Path, optional
+        Trial store (e.g. ``trial_store.FILE_TRIALS``). Stored trials of the
+        same data and study are reused and new ones are recorded as they
+        finish, so an interrupted or extended search only fits what is
+        missing.
+    data_hash : str, optional
+        Key of the training data in the store; hashed from ``X_train`` and
+        ``y_train`` when omitted.
+    log : callable, optional
+        Receives the parallel layout chosen for each batch of fits.
+
+    Returns
+    -------
+    dict
+        ``best_params``, ``best_score`` (mean CV score of the winner in the
+        last round), ``best_estimator`` (None without ``refit``), ``trials``
+        (one row per candidate per round), ``rounds``, ``fits`` and
+        ``cached`` (trials fitted now and taken from the store),
+        ``resource_spent`` and ``exhaustive_resource`` (resource units over
+        all fits, for this search and for the full grid at
+        ``max_resource``) and ``seconds``.
+    '''
+    if resource not in SEARCH_RESOURCES:
+        raise ValueError(f"resource must be one of {SEARCH_RESOURCES}, got {resource!r}")
+
+    start = time.perf_counter()
+    y_train = np.asarray(y_train)
+    splits = cv_splits(y_train, cv)
+    folds = fold_data(X_train, y_train, splits, preprocess)
+    scorer = get_scorer(scoring)
+
+    grid = dict(param_grid)
+    if resource == "n_estimators":
+        sizes = grid.pop("n_estimators", None)
+        if max_resource is None:
+            max_resource = max(sizes) if sizes else build_forest(random_state).n_estimators
+    elif max_resource is None:
+        max_resource = min(len(train) for train, _ in splits)
+
+    candidates = list(ParameterGrid(grid))
+    rounds = halving_schedule(
+        len(candidates), max_resource, factor=factor,
+        min_resource=min_resource, budget=budget,
+    )
+
+    study = search_study(cv, scoring, random_state, preprocess)
+    data_hash, stored = _stored_trials(X_train, y_train, store, data_hash, study)
+
+    def key(params, amount, k):
+        if resource == "n_estimators":
+            params = {**params, "n_estimators": amount}
+        elif amount < len(folds[k]["y_train"]):
+            params = {**params, "n_samples": amount}
+        return trial_store.params_key(params), k
+
+    alive = list(range(len(candidates)))
+    trials = []
+    fits = 0
+    for schedule in rounds:
+        alive = alive[:schedule["n_candidates"]]
+        amount = schedule["resource"]
+        keys, tasks = [], []
+        for index in alive:
+            for k, fold in enumerate(folds):
+                trial = key(candidates[index], amount, k)
+                keys.append(trial)
+                if trial not in stored:
+                    tasks.append(([trial], _fit_and_score, (
+                        fold, candidates[index], resource, amount, scorer, random_state,
+                    )))
+        finished, plan = _run_trials(tasks, n_jobs, store, data_hash, study, log)
+        done = {**stored, **finished}
+        fits += len(tasks)
+        results = np.asarray([done[k] for k in keys]).reshape(len(alive), len(splits), 3)
+        for index, fold_results in zip(alive, results):
+            trials.append({
+                "round": schedule["round"],
+                "candidate": index,
+                "params": candidates[index],
+                "resource": amount,
+                "mean_score": fold_results[:, 0].mean(),
+                "std_score": fold_results[:, 0].std(),
+                "fit_seconds": fold_results[:, 1].sum(),
+                "score_seconds": fold_results[:, 2].sum(),
+            })
+        order = np.argsort(-results[:, :, 0].mean(axis=1), kind="stable")
+        alive = [alive[i] for i in order]
+
+    winner = next(trial for trial in reversed(trials) if trial["candidate"] == alive[0])
+    best_params = dict(winner["params"])
+    if resource == "n_estimators":
+        best_params["n_estimators"] = max_resource
+
+    best_estimator = None
+    if refit:
+        best_estimator = refit_best(
+            X_train, y_train, best_params, preprocess, random_state, n_jobs
+        )
+
+    return {
+        "best_params": best_params,
+        "best_score": winner["mean_score"],
+        "best_estimator": best_estimator,
+        "trials": pd.DataFrame(trials),
+        "rounds": rounds,
+        "fits": fits,
+        "cached": len(trials) * len(splits) - fits,
+        "layout": plan,
+        "resource_spent": sum(r["n_candidates"] * r["resource"] for r in rounds) * len(splits),
+        "exhaustive_resource": len(candidates) * max_resource * len(splits),
+        "seconds": time.perf_counter() - start,
+    }
+
+
+###
+# Warm-Started Forests
+###
+
+def _fit_and_score_path(fold, params, checkpoints, scorer, random_state, n_jobs=None):
+    model = clone(build_forest(random_state)).set_params(**params, warm_start=True, n_jobs=n_jobs)
+    X_fit, y_fit = fold_rows(fold, "train"), fold["y_train"]
+    X_test, y_test = fold_rows(fold, "test"), fold["y_test"]
+
+    results = []
+    for n_estimators in checkpoints:
+        start = time.perf_counter()
+        with warnings.catch_warnings():
+            # Every checkpoint refits on the same rows, so "balanced" weights stay exact.
+            warnings.filterwarnings("ignore", message="class_weight presets", category=UserWarning)
+            model.set_params(n_estimators=n_estimators).fit(X_fit, y_fit)
+        fit_seconds = time.perf_counter() - start
+        score = scorer(model, X_test, y_test)
+        results.append((score, fit_seconds, time.perf_counter() - start - fit_seconds))
+    return results
+
+
+def warm_start_search(
+    X_train,
+    y_train,
+    param_grid=PARAM_GRID,
+    cv=5,
+    scoring="f1",
+    n_jobs=-1,
+    random_state=RANDOM_STATE,
+    refit=True,
+    preprocess=None,
+    store=None,
+    data_hash=None,
+    log=None,
+):
+    '''
+    Exhaustive search that grows each forest through its ``n_estimators``.
+
+    The ``n_estimators`` axis of ``param_grid`` becomes a list of
+    checkpoints: for every other parameter combination and fold one forest
+    is fitted with ``warm_start`` up to the smallest size, scored, grown to
+    the next size, scored again, and so on. A forest grown this way has
+    the same trees as one fitted from scratch with the same random state,
+    so the scores match ``run_grid_search`` while the whole axis costs one
+    fit of the largest size.
+
+    Parameters
+    ----------
+    X_train, y_train, param_grid, cv, scoring, n_jobs, random_state
+        As for ``run_grid_search``; the ``n_jobs`` core budget is split
+        between parameter combinations x folds and their forest threads.
+    refit : bool
+        Refit the winner on all of ``X_train``.
+    preprocess : callable, optional
+        Preprocessor factory for raw ``X_train`` columns, see ``fold_data``.
+    store : Path, optional
+        Trial store (e.g. ``trial_store.FILE_TRIALS``). Stored trials of the
+        same data and study are reused and new ones are recorded as they
+        finish, so an interrupted or extended search only fits what is
+        missing.
+    data_hash : str, optional
+        Key of the training data in the store; hashed from ``X_train`` and
+        ``y_train`` when omitted.
+    log : callable, optional
+        Receives the parallel layout chosen for each batch of fits.
+
+    Returns
+    -------
+    dict
+        ``best_params``, ``best_score``, ``best_estimator`` (None without
+        ``refit``), ``trials`` (one row per grid point, in ``ParameterGrid``
+        order), ``fits`` (forests grown), ``cached`` (forests whose every
+        checkpoint came from the store) and ``seconds``.
+    '''
+    start = time.perf_counter()
+    y_train = np.asarray(y_train)
+    splits = cv_splits(y_train, cv)
+    folds = fold_data(X_train, y_train, splits, preprocess)
+    scorer = get_scorer(scoring)
+
+    grid = dict(param_grid)
+    checkpoints = sorted(set(grid.pop("n_estimators", [build_forest(random_state).n_estimators])))
+    candidates = list(ParameterGrid(grid))
+    study = search_study(cv, scoring, random_state, preprocess)
+    data_hash, stored = _stored_trials(X_train, y_train, store, data_hash, study)
+
+    keys, tasks = [], []
+    for params in candidates:
+        for k, fold in enumerate(folds):
+            path_keys = [
+                (trial_store.params_key({**params, "n_estimators": n}), k) for n in checkpoints
+            ]
+            keys.append(path_keys)
+            # Only the missing checkpoints are grown; warm_start reaches them
+            # with the same trees as the full path.
+            missing = [n for trial, n in zip(path_keys, checkpoints) if trial not in stored]
+            if missing:
+                tasks.append((
+                    [trial for trial in path_keys if trial not in stored], _fit_and_score_path,
+                    (fold, params, missing, scorer, random_state),
+                ))
+    finished, plan = _run_trials(tasks, n_jobs, store, data_hash, study, log)
+    done = {**stored, **finished}
+    results = np.asarray([[done[key] for key in path_keys] for path_keys in keys])
+    results = results.reshape(len(candidates), len(splits), len(checkpoints), 3)
+
+    trials = []
+    for params, path in zip(candidates, results):
+        for i, n_estimators in enumerate(checkpoints):
+            trials.append({
+                "params": {**params, "n_estimators": n_estimators},
+                "mean_score": path[:, i, 0].mean(),
+                "std_score": path[:, i, 0].std(),
+                "fit_seconds": path[:, i, 1].sum(),
+                "score_seconds": path[:, i, 2].sum(),
+            })
+    # Report in ParameterGrid order, so ties break the way GridSearchCV's do.
+    full_grid = {"n_estimators": checkpoints, **param_grid}
+    position = {repr(sorted(p.items())): i for i, p in enumerate(ParameterGrid(full_grid))}
+    trials.sort(key=lambda trial: position[repr(sorted(trial["params"].items()))])
+    trials = pd.DataFrame(trials)
+
+    best = trials.loc[trials["mean_score"].idxmax()]
+    best_params = dict(best["params"])
+    best_estimator = None
+    if refit:
+        best_estimator = refit_best(
+            X_train, y_train, best_params, preprocess, random_state, n_jobs
+        )
+
+    return {
+        "best_params": best_params,
+        "best_score": best["mean_score"],
+        "best_estimator": best_estimator,
+        "trials": trials,
+        "fits": len(tasks),
+        "cached": len(candidates) * len(splits) - len(tasks),
+        "layout": plan,
+        "seconds": time.perf_counter() - start,
+    }
+
+###
+# Exhaustive Search
+###
+
+def exhaustive_search(
+    X_train,
+    y_train,
+    param_grid=PARAM_GRID,
+    cv=5,
+    scoring="f1",
+    n_jobs=-1,
+    random_state=RANDOM_STATE,
+    refit=True,
+    preprocess=None,
+    store=None,
+    data_hash=None,
+    log=None,
+):
+    '''
+    Cross-validate every candidate of ``param_grid`` on the folds
+    ``GridSearchCV`` would use, so the scores match ``run_grid_search``.
+
+    The folds come from ``fold_data``: with ``preprocess`` every fold is
+    preprocessed once and shared by all candidates, instead of once per
+    candidate as in a ``GridSearchCV`` over a ``Pipeline``.
+
+    Parameters
+    ----------
+    X_train, y_train, param_grid, cv, scoring, n_jobs, random_state
+        As for ``run_grid_search``; the ``n_jobs`` core budget is split
+        between candidates x folds and their forest threads.
+    refit : bool
+        Refit the winner on all of ``X_train``.
+    preprocess : callable, optional
+        Preprocessor factory for raw ``X_train`` columns, see ``fold_data``.
+    store : Path, optional
+        Trial store (e.g. ``trial_store.FILE_TRIALS``). Stored trials of the
+        same data and study are reused and new ones are recorded as they
+        finish, so an interrupted or extended search only fits what is
+        missing.
+    data_hash : str, optional
+        Key of the training data in the store; hashed from ``X_train`` and
+        ``y_train`` when omitted.
+    log : callable, optional
+        Receives the parallel layout chosen for the fits.
+
+    Returns
+    -------
+    dict
+        ``best_params``, ``best_score``, ``best_estimator`` (None without
+        ``refit``), ``trials`` (one row per candidate, in ``ParameterGrid``
+        order), ``fits`` and ``cached`` (fits run now and taken from the
+        store) and ``seconds``.
+    '''
+    start = time.perf_counter()
+    y_train = np.asarray(y_train)
+    splits = cv_splits(y_train, cv)
+    folds = fold_data(X_train, y_train, splits, preprocess)
+    scorer = get_scorer(scoring)
+
+    candidates = list(ParameterGrid(param_grid))
+    study = search_study(cv, scoring, random_state, preprocess)
+    data_hash, stored = _stored_trials(X_train, y_train, store, data_hash, study)
+
+    keys, tasks = [], []
+    for params in candidates:
+        for k, fold in enumerate(folds):
+            trial = (trial_store.params_key(params), k)
+            keys.append(trial)
+            if trial not in stored:
+                tasks.append(([trial], _fit_and_score, (
+                    fold, params, None, None, scorer, random_state,
+                )))
+    finished, plan = _run_trials(tasks, n_jobs, store, data_hash, study, log)
+    done = {**stored, **finished}
+    results = np.asarray([done[key] for key in keys]).reshape(len(candidates), len(splits), 3)
+
+    trials = pd.DataFrame([{
+        "params": params,
+        "mean_score": fold_results[:, 0].mean(),
+        "std_score": fold_results[:, 0].std(),
+        "fit_seconds": fold_results[:, 1].sum(),
+        "score_seconds": fold_results[:, 2].sum(),
+    } for params, fold_results in zip(candidates, results)])
+
+    # First maximum, so ties break the way GridSearchCV's do.
+    best = trials.loc[trials["mean_score"].idxmax()]
+    best_params = dict(best["params"])
+    best_estimator = None
+    if refit:
+        best_estimator = refit_best(
+            X_train, y_train, best_params, preprocess, random_state, n_jobs
+        )
+
+    return {
+        "best_params": best_params,
+        "best_score": best["mean_score"],
+        "best_estimator": best_estimator,
+        "trials": trials,
+        "fits": len(tasks),
+        "cached": len(keys) - len(tasks),
+        "layout": plan,
+        "seconds": time.perf_counter() - start,
+    }
+
+SEARCHES = {
+    "grid": exhaustive_search,
+    "halving": successive_halving_search,
+    "warm_start": warm_start_search,
+}
+SEARCH_METADATA = ["best_params", "best_score", "fits", "resource_spent", "exhaustive_resource"]
+
+###
+# Search Benchmark
+###
+
+def benchmark_search(
+    X_train,
+    y_train,
+    param_grid=PARAM_GRID,
+    searches=("halving",),
+    resource="n_samples",
+    cv=5,
+    scoring="f1",
+    n_jobs=-1,
+    **halving_options,
+) -> pd.DataFrame:
+    '''
+    Time the exhaustive ``run_grid_search`` against the other searches on
+    the same grid.
+
+    Parameters
+    ----------
+    searches : sequence of {"grid", "halving", "warm_start"}
+        Engines from ``SEARCHES``; "grid" times ``exhaustive_search``.
+    resource, **halving_options
+        Passed to ``successive_halving_search``.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per search with its fits, wall-clock seconds, best
+        parameters and CV score, and ``time_saved`` as a fraction of the
+        exhaustive search.
+    '''
+    start = time.perf_counter()
+    grid = run_grid_search(X_train, y_train, param_grid=param_grid, cv=cv,
+                           scoring=scoring, n_jobs=n_jobs)
+    grid_seconds = time.perf_counter() - start
+
+    rows = [{
+        "search": "grid",
+        "fits": len(grid.cv_results_["params"]) * grid.n_splits_,
+        "seconds": grid_seconds,
+        "best_params": grid.best_params_,
+        "best_score": grid.best_score_,
+    }]
+    for search in searches:
+        if search == "halving":
+            name = f"halving ({resource})"
+            result = successive_halving_search(
+                X_train, y_train, param_grid=param_grid, resource=resource, cv=cv,
+                scoring=scoring, n_jobs=n_jobs, **halving_options,
+            )
+        else:
+            name = search
+            result = SEARCHES[search](
+                X_train, y_train, param_grid=param_grid, cv=cv,
+                scoring=scoring, n_jobs=n_jobs,
+            )
+        rows.append({
+            "search": name,
+            "fits": result["fits"],
+            "seconds": result["seconds"],
+            "best_params": result["best_params"],
+            "best_score": result["best_score"],
+        })
+
+    report = pd.DataFrame(rows)
+    report["time_saved"] = 1 - report["seconds"] / grid_seconds
+    return report
+
+
+def benchmark_layouts(
+    X_train,
+    y_train,
+    layouts,
+    param_grid=PARAM_GRID,
+    cv=5,
+    scoring="f1",
+    n_jobs=-1,
+    random_state=RANDOM_STATE,
+) -> pd.DataFrame:
+    '''
+    Time ``GridSearchCV`` under fixed ``(outer, inner)`` layouts and under
+    the layout ``plan_parallelism`` picks for the ``n_jobs`` core budget.
+
+    ``outer`` is the number of search workers and ``inner`` the forest and
+    BLAS threads of each fit; ``outer * inner`` above the budget is
+    oversubscribed.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per layout with its thread count, load (threads per core)
+        and seconds.
+    '''
+    cores = step00_utils.resolve_cores(n_jobs)
+    n_fits = len(ParameterGrid(param_grid)) * check_cv(cv).get_n_splits()
+    plan = step00_utils.plan_parallelism(n_fits, cores)
+
+    rows = []
+    for name, (outer, inner) in [
+        *((f"{outer}x{inner}", (outer, inner)) for outer, inner in layouts),
+        ("planned", (plan["outer"], plan["inner"])),
+    ]:
+        search = GridSearchCV(
+            build_forest(random_state).set_params(n_jobs=inner),
+            param_grid, cv=cv, scoring=scoring, n_jobs=outer,
+        )
+        start = time.perf_counter()
+        with step00_utils.thread_limits(inner):
+            search.fit(X_train, y_train)
+        rows.append({
+            "layout": name,
+            "outer": outer,
+            "inner": inner,
+            "threads": outer * inner,
+            "load": outer * inner / cores,
+            "seconds": time.perf_counter() - start,
+        })
+
+    return pd.DataFrame(rows)
+
+
+def final_model_key(
+    data_hash,
+    param_grid=PARAM_GRID,
+    cv=5,
+    scoring="f1",
+    random_state=RANDOM_STATE,
+    search="grid",
+    search_options=None,
+    preprocess=None,
+):
+    '''
+    Return the registry key of the model ``fit_final_model`` would produce.
+
+    Returns
+    -------
+    str
+    '''
+    config = {"cv": cv, "scoring": scoring}
+    if search != "grid":
+        config.update(search=search, search_options=search_options or {})
+    if preprocess is not None:
+        config["preprocess"] = _preprocess_name(preprocess)
+
+    return model_registry.model_key(
+        data_hash,
+        build_forest(random_state),
+        param_grid,
+        **config,
+    )
+
+
+def fit_final_model(
+    X_train,
+    y_train,
+    data_hash,
+    param_grid=PARAM_GRID,
+    cv=5,
+    scoring="f1",
+    n_jobs=-1,
+    random_state=RANDOM_STATE,
+    registry_dir=DIR_MODELS,
+    search="grid",
+    search_options=None,
+    store=None,
+    log=None,
+    X_search=None,
+    preprocess=None,
+):
+    '''
+    Return the searched random forest, from the model registry if possible.
+
+    The registry key covers the training-artifact hash, the estimator and
+    its parameters, the grid and the search settings, so the search only
+    reruns when one of them changed.
+
+    Parameters
+    ----------
+    X_train, y_train : training data
+    data_hash : str
+        Digest of the training artifact, e.g.
+        ``step00_utils.hash_path(VECTORIZED_TRAIN_DIR)``.
+    search : {"grid", "halving", "warm_start"}
+        Search engine from ``SEARCHES``; "grid" is ``exhaustive_search``.
+    search_options : dict, optional
+        Extra arguments of the search engine (resource, budget, factor, ...).
+    store : Path, optional
+        Trial store for the search engines, keyed by ``data_hash``; it does
+        not change the registry key.
+    log : callable, optional
+        Receives the parallel layout of the search.
+    X_search : pd.DataFrame, optional
+        Raw feature columns of the ``X_train`` rows, required with
+        ``preprocess``.
+    preprocess : callable, optional
+        Preprocessor factory, e.g. ``step03_features.build_preprocessor``.
+        The search then cross-validates on ``X_search`` with a preprocessor
+        fitted on each training fold only, so no validation-fold statistics
+        leak into the scores; the winner is still refit on ``X_train``.
+
+    Returns
+    -------
+    model : RandomForestClassifier
+    hit : bool
+        True when the model was loaded from the registry.
+    '''
+    key = final_model_key(
+        data_hash,
+        param_grid=param_grid,
+        cv=cv,
+        scoring=scoring,
+        random_state=random_state,
+        search=search,
+        search_options=search_options,
+        preprocess=preprocess,
+    )
+    if search not in SEARCHES:
+        raise ValueError(f"search must be one of {sorted(SEARCHES)}, got {search!r}")
+    if preprocess is not None and X_search is None:
+        raise ValueError("preprocess needs the raw feature columns as X_search")
+
+    def refit(best_params):
+        return refit_best(X_train, y_train, best_params, random_state=random_state, n_jobs=n_jobs)
+
+    def fit():
+        result = SEARCHES[search](
+            X_train if preprocess is None else X_search,
+            y_train,
+            param_grid=param_grid,
+            cv=cv,
+            scoring=scoring,
+            n_jobs=n_jobs,
+            random_state=random_state,
+            store=store,
+            data_hash=data_hash,
+            log=log,
+            refit=preprocess is None,
+            preprocess=preprocess,
+            **(search_options or {}),
+        )
+        metadata = {
+            "data_hash": data_hash,
+            "search": search,
+            **{name: result[name] for name in SEARCH_METADATA if name in result},
+        }
+        model = result["best_estimator"]
+        if preprocess is not None:
+            model = refit(result["best_params"])
+        return model, metadata
+
+    return model_registry.get_or_fit(key, fit, registry_dir)
+
+###
+# Figures
+###
+
+def plot_confusion_matrix(y_true, y_pred):
+    '''
+    Annotated confusion-matrix heatmap.
+    '''
+    cm = confusion_matrix(y_true, y_pred)
+    fig, ax = plt.subplots(figsize=(6, 5))
+    image = ax.imshow(cm, cmap="Blues")
+    fig.colorbar(image, ax=ax)
+    for (i, j), value in np.ndenumerate(cm):
+        color = "white" if value > cm.max() / 2 else "black"
+        ax.text(j, i, f"{value:d}", ha="center", va="center", color=color)
+    ax.set_xticks(range(cm.shape[1]))
+    ax.set_yticks(range(cm.shape[0]))
+    ax.set_title("Confusion Matrix")
+    ax.set_ylabel("Actual")
+    ax.set_xlabel("Predicted")
+    return fig
+
+
+def plot_feature_importance(model, feature_names, top=10):
+    '''
+    Horizontal bar chart of the ``top`` impurity-based feature importances.
+    '''
+    feat_imp = pd.DataFrame({
+        "feature": feature_names,
+        "importance": model.feature_importances_,
+    }).sort_values("importance", ascending=False).head(top)
+
+    fig, ax = plt.subplots(figsize=(8, 6))
+    ax.barh(feat_imp["feature"][::-1], feat_imp["importance"][::-1])
+    ax.set_title(f"Top {top} Features Driving the Model")
+    ax.set_xlabel("Importance")
+    return fig
+
+###
+# Pipeline Stage
+###
+
+def run_stage(paths: dict, upstream: dict, log=print, n_jobs=-1) -> dict:
+    '''
+    Pipeline stage: fit (or load) the final model and evaluate it within
+    the ``n_jobs`` core budget.
+    '''
+    features = upstream["step03_features"]
+    X_train, y_train = step03_features.load_vectorized(features["train"])
+    X_test, y_test = step03_features.load_vectorized(features["test"])
+    feature_names = step03_features.read_vectorized_meta(features["train"])["feature_names"]
+
+    # Cross-validate on the raw columns with per-fold preprocessing: the
+    # step03 matrix is scaled on all of X_train, validation folds included.
+    # The raw training rows are selected from the cached dataset by the
+    # saved split rather than read from a copy.
+    df = step03_features.engineer_features(
+        pd.read_parquet(upstream["step01_data"]["dataset"]), inplace=True)
+    X, y = step03_features.make_X_y(df)
+    split = step03_features.load_split(features["split"])
+    X_search = step03_features.split_views(X, y, split)[0]
+    data_hash = step00_utils.hash_path(features["train"])
+    model, _ = fit_final_model(
+        X_train, y_train, data_hash, registry_dir=paths["models"], log=log,
+        search=SEARCH, store=pl.Path(paths["models"]) / trial_store.FILE_TRIALS.name,
+        X_search=X_search, preprocess=PREPROCESS, n_jobs=n_jobs,
+    )
+    key = final_model_key(data_hash, search=SEARCH, preprocess=PREPROCESS)
+
+    y_pred = model.predict(X_test)
+    fig_dir = pl.Path(paths["figures"]) / "step04_modeling"
+    metrics_path = pl.Path(paths["models"]) / f"{key}.metrics.json"
+    metrics_path.write_text(json.dumps({
+        "baseline_accuracy": fit_baseline(X_train, y_train, n_jobs=n_jobs).score(X_test, y_test),
+        "classification_report": classification_report(y_test, y_pred, output_dict=True),
+    }, indent=2))
+
+    figures = step00_utils.render_figures({
+        "step04_confusion_matrix": step00_utils.figure_spec(
+            plot_confusion_matrix, np.asarray(y_test), y_pred),
+        "step04_feature_importance": step00_utils.figure_spec(
+            plot_feature_importance, model, feature_names),
+    }, fig_dir, jobs=n_jobs)
+
+    return {
+        "model": model_registry.model_path(key, paths["models"]),
+        "metrics": metrics_path,
+        **figures,
+    }
@@ -4,7 +4,238 @@
 # Imports
 ###
 import src.step00_utils as step00_utils
+import src.step03_features as step03_features
+
+import pathlib as pl
+
+import joblib
+import matplotlib.pyplot as plt
+import numpy as np
+import scipy.sparse as sp
+import shap
+
+from sklearn.inspection import PartialDependenceDisplay
+from threadpoolctl import threadpool_limits
 
 ###
 # Filepaths
 ###
+DIR_DATA_02_VECTORIZED = step00_utils.DIR_DATA_02_VECTORIZED
+
+###
+# Explanations
+###
+
+# Rows densified at a time when explaining a sparse matrix.
+SHAP_BLOCK_SIZE = 2048
+
+# Fewest rows worth handing to a separate SHAP worker process.
+SHAP_TASK_ROWS = 256
+
+
+def dense_rows(X, rows=None):
+    '''
+    Return the given rows of a dense or sparse matrix as a dense array.
+
+    Parameters
+    ----------
+    X : array or sparse matrix
+    rows : int, slice, array of int or None
+        Rows to return; all rows when None.
+
+    Returns
+    -------
+    ndarray
+    '''
+    if rows is not None:
+        X = X[rows]
+    if sp.issparse(X):
+        return X.toarray()
+    return np.asarray(X)
+
+
+def iter_dense_blocks(X, block_size=SHAP_BLOCK_SIZE):
+    '''
+    Yield consecutive row blocks of ``X`` as dense arrays.
+
+    Only one block is densified at a time, so a CSR matrix is never
+    expanded in full.
+
+    Yields
+    ------
+    ndarray
+    '''
+    for start in range(0, X.shape[0], block_size):
+        yield dense_rows(X, slice(start, start + block_size))
+
+
+def _shap_rows(model, X, block_size, explainer=None):
+    if explainer is None:
+        explainer = shap.TreeExplainer(model)
+    return np.concatenate([
+        explainer.shap_values(block)
+        for block in iter_dense_blocks(X, block_size)
+    ])
+
+
+def compute_shap_values(
+    model,
+    X,
+    block_size=SHAP_BLOCK_SIZE,
+    n_jobs=1,
+    task_rows=SHAP_TASK_ROWS,
+    log=None,
+):
+    '''
+    Compute tree SHAP values for ``X`` block by block.
+
+    Tree SHAP is single-threaded and holds the GIL, so rows are spread
+    over worker processes instead: ``plan_parallelism`` picks up to
+    ``n_jobs`` workers, at most one per ``task_rows`` rows, each explaining
+    one contiguous slice with its BLAS/OpenMP pools capped at one thread.
+
+    Parameters
+    ----------
+    model : fitted tree ensemble
+    X : array or sparse matrix
+    block_size : int
+    n_jobs : int
+        Core budget, joblib-style (-1 for every core).
+    task_rows : int
+    log : callable, optional
+        Receives the parallel layout.
+
+    Returns
+    -------
+    values : ndarray of shape (n_samples, n_features, n_classes)
+    expected_value : ndarray of shape (n_classes,)
+    '''
+    n_rows = X.shape[0]
+    plan = step00_utils.plan_parallelism(-(-n_rows // task_rows), n_jobs, max_inner=1)
+    if log is not None:
+        log(step00_utils.format_layout(plan, "SHAP tasks"))
+
+    explainer = shap.TreeExplainer(model)
+    if plan["outer"] == 1:
+        with threadpool_limits(limits=plan["inner"]):
+            values = _shap_rows(model, X, block_size, explainer)
+    else:
+        bounds = np.linspace(0, n_rows, plan["outer"] + 1).astype(int)
+        values = np.concatenate(joblib.Parallel(n_jobs=plan["outer"])(
+            joblib.delayed(step00_utils.call_with_thread_limit)(
+                plan["inner"], _shap_rows, model, X[start:stop], block_size
+            )
+            for start, stop in zip(bounds[:-1], bounds[1:])
+        ))
+    return values, np.asarray(explainer.expected_value)
+
+###
+# Figures
+###
+
+# Rows shown in the beeswarm plot; only these are densified for colouring.
+BEESWARM_MAX_ROWS = 5000
+
+# Rows the partial dependence is averaged over; densified, since sklearn's
+# partial dependence does not accept sparse input.
+PDP_MAX_ROWS = 5000
+
+
+def plot_global_importance(shap_values, feature_names, top=10):
+    '''
+    Bar chart of the ``top`` features by mean absolute SHAP value (churn class).
+    '''
+    mean_abs_shap = np.mean(np.abs(shap_values[:, :, 1]), axis=0)
+    order = np.argsort(mean_abs_shap)[::-1][:top]
+
+    fig, ax = plt.subplots(figsize=(8, 6))
+    ax.barh(np.asarray(feature_names)[order][::-1], mean_abs_shap[order][::-1])
+    ax.set_xlabel("Mean |SHAP value|")
+    ax.set_title("Global SHAP Feature Importance (Churn Prediction)")
+    fig.tight_layout()
+    return fig
+
+
+def plot_beeswarm(shap_values, X, feature_names, max_display=12):
+    '''
+    SHAP summary (beeswarm) plot for the churn class.
+    '''
+    rows = slice(0, min(X.shape[0], BEESWARM_MAX_ROWS))
+    fig = plt.figure(figsize=(10, 8))
+    shap.summary_plot(
+        shap_values[rows, :, 1],
+        dense_rows(X, rows),
+        feature_names=feature_names,
+        show=False,
+        max_display=max_display,
+    )
+    plt.title("SHAP Feature Impact and Direction (Churn)", pad=20)
+    plt.tight_layout()
+    return fig
+
+
+def plot_waterfall(shap_values, expected_value, X, feature_names, idx):
+    '''
+    SHAP waterfall plot explaining the churn prediction of row ``idx``.
+    '''
+    fig = plt.figure()
+    shap.waterfall_plot(
+        shap.Explanation(
+            values=shap_values[idx, :, 1],
+            base_values=expected_value[1],
+            data=dense_rows(X, [idx])[0],
+            feature_names=feature_names,
+        ),
+        show=False,
+    )
+    plt.tight_layout()
+    return fig
+
+
+def plot_partial_dependence(model, X, feature_index, feature_names):
+    '''
+    Partial dependence of the churn prediction on one feature.
+
+    Averaged over the first ``PDP_MAX_ROWS`` rows; only that sample is
+    densified with ``dense_rows``, so a CSR matrix works too.
+    '''
+    fig, ax = plt.subplots()
+    PartialDependenceDisplay.from_estimator(
+        model,
+        dense_rows(X, slice(0, min(X.shape[0], PDP_MAX_ROWS))),
+        features=[feature_index],
+        feature_names=feature_names,
+        ax=ax,
+    )
+    fig.tight_layout()
+    return fig
+
+###
+# Pipeline Stage
+###
+
+def run_stage(paths: dict, upstream: dict, log=print, n_jobs=-1) -> dict:
+    '''
+    Pipeline stage: explain the final model on the test split within the
+    ``n_jobs`` core budget.
+    '''
+    features = upstream["step03_features"]
+    X_test, y_test = step03_features.load_vectorized(features["test"])
+    feature_names = step03_features.read_vectorized_meta(features["test"])["feature_names"]
+    model = joblib.load(upstream["step04_modeling"]["model"])
+
+    shap_values, expected_value = compute_shap_values(model, X_test, n_jobs=n_jobs, log=log)
+    top_feature = int(np.argmax(np.mean(np.abs(shap_values[:, :, 1]), axis=0)))
+    first_churned = int(np.flatnonzero(np.asarray(y_test) == 1)[0])
+
+    spec = step00_utils.figure_spec
+    return step00_utils.render_figures({
+        "global_shap_importance": spec(plot_global_importance, shap_values, feature_names),
+        "shap_beeswarm": spec(plot_beeswarm, shap_values, X_test, feature_names),
+        "local_shap_waterfall": spec(
+            plot_waterfall, shap_values, expected_value, X_test, feature_names, first_churned
+        ),
+        "pdp_num_avg_song_length": spec(
+            plot_partial_dependence, model, X_test, top_feature, feature_names
+        ),
+    }, pl.Path(paths["figures"]) / "step05_interpret", jobs=n_jobs)
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+
+###
+# Imports
+###
+import src.step00_utils as step00_utils
+
+import contextlib
+import hashlib
+import json
+import math
+import pathlib as pl
+import sqlite3
+import time
+import typing as typ
+
+import pandas as pd
+
+###
+# Filepaths
+###
+FILE_TRIALS = step00_utils.DIR_DATA_03_MODELS / "trials.sqlite"
+
+###
+# Trial Store
+###
+
+# sqlite stores NaN as NULL, so ``score`` is nullable: a fold whose score
+# is undefined (e.g. f1 without positive predictions) still records.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trials (
+    data_hash     TEXT    NOT NULL,
+    study         TEXT    NOT NULL,
+    params        TEXT    NOT NULL,
+    fold          INTEGER NOT NULL,
+    score         REAL,
+    fit_seconds   REAL    NOT NULL,
+    score_seconds REAL    NOT NULL,
+    created       TEXT    NOT NULL,
+    PRIMARY KEY (data_hash, study, params, fold)
+)
+"""
+
+
+def params_key(params: dict) -> str:
+    '''
+    Return the canonical text of a parameter combination.
+    '''
+    return json.dumps(params, sort_keys=True, default=repr)
+
+
+def study_key(**config) -> str:
+    '''
+    Return the key of every setting, other than the data and the searched
+    parameters, that changes a trial's score (estimator, cv, scoring, ...).
+
+    Returns
+    -------
+    str
+    '''
+    text = json.dumps(config, sort_keys=True, default=repr)
+    return hashlib.sha256(text.encode()).hexdigest()[:16]
+
+
+@contextlib.contextmanager
+def connect(path: pl.Path = FILE_TRIALS):
+    '''
+    Open the store at ``path``, creating it if needed; commits on exit.
+    '''
+    path = pl.Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=60)
+    try:
+        conn.execute(SCHEMA)
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def load_trials(data_hash: str, study: str, path: pl.Path = FILE_TRIALS) -> dict:
+    '''
+    Return the stored trials of a study on a dataset.
+
+    Returns
+    -------
+    dict
+        ``(params_key, fold) -> (score, fit_seconds, score_seconds)``; a
+        NULL score comes back as NaN.
+    '''
+    if not pl.Path(path).exists():
+        return {}
+
+    with connect(path) as conn:
+        rows = conn.execute(
+            "SELECT params, fold, score, fit_seconds, score_seconds FROM trials "
+            "WHERE data_hash = ? AND study = ?",
+            (data_hash, study),
+        ).fetchall()
+
+    return {
+        (params, fold): (math.nan if score is None else score, *seconds)
+        for params, fold, score, *seconds in rows
+    }
+
+
+def record_trials(
+    data_hash: str,
+    study: str,
+    trials: typ.Iterable[typ.Tuple[str, int, typ.Tuple[float, float, float]]],
+    path: pl.Path = FILE_TRIALS,
+) -> int:
+    '''
+    Store ``(params_key, fold, (score, fit_seconds, score_seconds))``
+    trials, replacing earlier results for the same key.
+
+    Returns
+    -------
+    int
+        Number of trials written.
+    '''
+    created = time.strftime("%Y-%m-%dT%H:%M:%S")
+    rows = [
+        (data_hash, study, params, int(fold), *map(float, result), created)
+        for params, fold, result in trials
+    ]
+    with connect(path) as conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO trials VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+        )
+
+    return len(rows)
+
+
+def trials_frame(path: pl.Path = FILE_TRIALS, data_hash: typ.Optional[str] = None) -> pd.DataFrame:
+    '''
+    Return the stored trials as a DataFrame, optionally for one dataset.
+    '''
+    query = "SELECT * FROM trials"
+    args = ()
+    if data_hash is not None:
+        query += " WHERE data_hash = ?"
+        args = (data_hash,)
+
+    with connect(path) as conn:
+        return pd.read_sql_query(query, conn, params=args)
@@ -3,8 +3,170 @@
 ###
 # Imports
 ###
-import src.step00_utils as step00_utils
+import src.main as main
+
+import importlib
+import inspect
+import json
+import sys
+
+import pytest
+
+###
+# Fixtures
+###
+
+STAGE_SOURCE = '''
+import json
+import pathlib as pl
+import time
+
+def run_stage(paths, upstream, log=print, n_jobs=-1):
+    time.sleep(paths.get("sleep", 0))
+    log("{name} says hi")
+    out = pl.Path(paths["work"]) / "{name}.json"
+    with open(pl.Path(paths["work"]) / "calls.txt", "a") as calls:
+        calls.write("{name}\\n")
+    payload = {{"raw": pl.Path(paths["raw"]).read_text(), "upstream": sorted(upstream),
+                "n_jobs": n_jobs}}
+    out.write_text(json.dumps(payload))
+    return {{"out": out}}
+'''
+
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    for name in ["fake_load", "fake_eda", "fake_model"]:
+        (tmp_path / f"{name}.py").write_text(STAGE_SOURCE.format(name=name))
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    work = tmp_path / "work"
+    work.mkdir()
+    (work / "raw.csv").write_text("a,b\n1,2\n")
+    paths = {"raw": work / "raw.csv", "work": work, "manifests": tmp_path / "manifests"}
+    stages = {
+        "load": {"module": "fake_load", "deps": [], "inputs": ["raw"], "code": ["fake_load"]},
+        "eda": {"module": "fake_eda", "deps": ["load"], "inputs": [], "code": ["fake_eda"]},
+        "model": {"module": "fake_model", "deps": ["load"], "inputs": [], "code": ["fake_model"]},
+    }
+    yield paths, stages
+    for name in ["fake_load", "fake_eda", "fake_model"]:
+        sys.modules.pop(name, None)
+
+
+def _calls(paths):
+    return (paths["work"] / "calls.txt").read_text().split()
 
 ###
 # ...
 ###
+
+def test_resolve_stages_adds_dependencies_in_order():
+    assert main.resolve_stages(["step05_interpret"]) == [
+        "step01_data", "step03_features", "step04_modeling", "step05_interpret",
+    ]
+    with pytest.raises(ValueError):
+        main.resolve_stages(["step99"])
+
+
+def test_stage_code_covers_imported_project_modules():
+    for stage in main.STAGES.values():
+        module = importlib.import_module(stage["module"])
+        imported = {
+            value.__name__ for value in vars(module).values()
+            if inspect.ismodule(value) and value.__name__.startswith("src.")
+        }
+        assert imported <= set(stage["code"]), stage["module"]
+
+
+def test_run_pipeline_skips_unchanged_stages(pipeline):
+    paths, stages = pipeline
+    log = []
+
+    first = main.run_pipeline(paths, stages=stages, log=log.append)
+    second = main.run_pipeline(paths, stages=stages, log=log.append)
+
+    assert [r["action"] for r in first] == ["run", "run", "run"]
+    assert [r["action"] for r in second] == ["skip", "skip", "skip"]
+    assert _calls(paths) == ["fake_load", "fake_eda", "fake_model"]
+
+
+def test_run_pipeline_reruns_downstream_of_changed_input(pipeline):
+    paths, stages = pipeline
+    main.run_pipeline(paths, stages=stages, log=lambda _: None)
+
+    paths["raw"].write_text("a,b\n1,3\n")
+    plan = main.plan_pipeline(paths, stages=stages)
+    results = main.run_pipeline(paths, ["eda"], stages=stages, log=lambda _: None)
+
+    assert [(p["stage"], p["action"]) for p in plan] == [
+        ("load", "run"), ("eda", "run"), ("model", "run"),
+    ]
+    assert [r["stage"] for r in results] == ["load", "eda"]
+    assert _calls(paths)[3:] == ["fake_load", "fake_eda"]
+    assert json.loads((paths["work"] / "fake_eda.json").read_text())["upstream"] == ["load"]
+
+
+def test_plan_pipeline_does_not_execute(pipeline):
+    paths, stages = pipeline
+
+    plan = main.plan_pipeline(paths, stages=stages)
+
+    assert plan[0] == {"stage": "load", "action": "run", "reason": "never run"}
+    assert [p["reason"] for p in plan[1:]] == ["upstream runs first"] * 2
+    assert not (paths["work"] / "calls.txt").exists()
+
+
+def test_force_applies_only_to_named_targets(pipeline):
+    paths, stages = pipeline
+    main.run_pipeline(paths, stages=stages, log=lambda _: None)
+
+    targeted = main.plan_pipeline(paths, ["eda"], force=True, stages=stages)
+    everything = main.plan_pipeline(paths, force=True, stages=stages)
+    results = main.run_pipeline(paths, ["eda"], force=True, stages=stages, log=lambda _: None)
+
+    assert [(p["stage"], p["action"]) for p in targeted] == [("load", "skip"), ("eda", "run")]
+    assert targeted[1]["reason"] == "forced"
+    assert [p["action"] for p in everything] == ["run"] * 3
+    assert [r["action"] for r in results] == ["skip", "run"]
+    assert _calls(paths)[3:] == ["fake_eda"]
+
+
+def test_run_pipeline_overlaps_independent_stages(pipeline):
+    paths, stages = pipeline
+    paths["sleep"] = 0.5
+
+    results = main.run_pipeline(paths, stages=stages, log=lambda _: None, jobs=2)
+    by_stage = {r["stage"]: r for r in results}
+
+    assert [r["stage"] for r in results][0] == "load"
+    assert by_stage["eda"]["start"] >= by_stage["load"]["end"]
+    assert by_stage["model"]["start"] < by_stage["eda"]["end"]
+    assert by_stage["eda"]["start"] < by_stage["model"]["end"]
+    assert sorted(_calls(paths)[1:]) == ["fake_eda", "fake_model"]
+    assert "3 run, 0 skipped" in main.format_summary(results)
+
+
+@pytest.mark.parametrize("jobs, budgets", [(1, [8, 8, 8]), (2, [8, 4, 4])])
+def test_run_pipeline_shares_cores_between_running_stages(pipeline, monkeypatch, jobs, budgets):
+    paths, stages = pipeline
+    monkeypatch.setattr(main.step00_utils, "available_cores", lambda: 8)
+
+    main.run_pipeline(paths, stages=stages, log=lambda _: None, jobs=jobs)
+
+    assert [
+        json.loads((paths["work"] / f"fake_{name}.json").read_text())["n_jobs"]
+        for name in ["load", "eda", "model"]
+    ] == budgets
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_run_pipeline_routes_stage_lines_to_log(pipeline, capsys, jobs):
+    paths, stages = pipeline
+    log = []
+
+    main.run_pipeline(paths, ["eda"], stages=stages, log=log.append, jobs=jobs)
+
+    assert "fake_load says hi" in log and "fake_eda says hi" in log
+    assert log.index("fake_eda says hi") > log.index("[run]  eda: never run")
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+
+###
+# Imports
+###
+import src.model_registry as model_registry
+
+import pytest
+
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+
+###
+# ...
+###
+
+GRID = {"n_estimators": [10, 20], "max_depth": [3, None]}
+
+
+def test_model_key_depends_on_every_input():
+    rf = RandomForestClassifier(random_state=0)
+    key = model_registry.model_key("abc", rf, GRID, cv=5)
+
+    assert key == model_registry.model_key("abc", RandomForestClassifier(random_state=0), GRID, cv=5)
+    assert key != model_registry.model_key("abd", rf, GRID, cv=5)
+    assert key != model_registry.model_key("abc", RandomForestClassifier(random_state=1), GRID, cv=5)
+    assert key != model_registry.model_key("abc", LogisticRegression(), GRID, cv=5)
+    assert key != model_registry.model_key("abc", rf, {"n_estimators": [10]}, cv=5)
+    assert key != model_registry.model_key("abc", rf, GRID, cv=3)
+
+
+def test_get_or_fit_only_fits_on_miss(tmp_path):
+    calls = []
+
+    def fit():
+        calls.append(1)
+        return LogisticRegression(C=0.5), {"best_score": 0.9}
+
+    model, hit = model_registry.get_or_fit("k1", fit, registry_dir=tmp_path)
+    again, hit_again = model_registry.get_or_fit("k1", fit, registry_dir=tmp_path)
+
+    assert (hit, hit_again) == (False, True)
+    assert len(calls) == 1
+    assert again.C == 0.5
+    assert model_registry.load_metadata("k1", registry_dir=tmp_path)["best_score"] == 0.9
+    assert model_registry.load_model("missing", registry_dir=tmp_path) is None
@@ -3,10 +3,33 @@
 ###
 # Imports
 ###
+import os
+import sys
+
+import joblib
 import pytest
 
 from pathlib import Path
-from src.step00_utils import get_project_root, is_csv_file
+from src.step00_utils import (
+    available_cores, figure_key, figure_spec, get_project_root, hash_file, hash_path, is_csv_file,
+    plan_parallelism, render_figures, resolve_cores, thread_limits,
+)
+
+###
+# Fixtures
+###
+
+def plot_line(values, title="line"):
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots()
+    ax.plot(values)
+    ax.set_title(title)
+    return fig
+
+
+def worker_env(name):
+    return os.environ.get(name)
 
 ###
 # ...
@@ -21,3 +44,129 @@ def test_get_project_root_returns_path(tmp_path):
 def test_is_csv_file():
     assert is_csv_file("data.csv") is True
     assert is_csv_file("data.txt") is False
+
+def test_hash_file_tracks_content(tmp_path):
+    path = tmp_path / "data.csv"
+    path.write_text("a,b\n1,2\n")
+    first = hash_file(path, blocksize=3)
+
+    assert first == hash_file(path)
+
+    path.write_text("a,b\n1,3\n")
+    assert hash_file(path) != first
+
+
+def test_hash_path_covers_directory_contents(tmp_path):
+    (tmp_path / "X.npy").write_bytes(b"abc")
+    (tmp_path / "y.npy").write_bytes(b"def")
+    first = hash_path(tmp_path)
+
+    (tmp_path / "y.npy").write_bytes(b"deg")
+    assert hash_path(tmp_path) != first
+    assert hash_path(tmp_path / "X.npy") == hash_file(tmp_path / "X.npy")
+
+
+def test_render_figures_skips_unchanged_figures(tmp_path):
+    import matplotlib
+    matplotlib.use("Agg")
+    specs = {"a": figure_spec(plot_line, [1, 2, 3]), "b": figure_spec(plot_line, [3, 2, 1])}
+    log = []
+
+    paths = render_figures(specs, tmp_path, dpi=50, jobs=1, log=log.append)
+    first = {name: path.stat().st_mtime_ns for name, path in paths.items()}
+
+    specs["b"] = figure_spec(plot_line, [3, 2, 1], title="changed")
+    log.clear()
+    paths = render_figures(specs, tmp_path, dpi=50, jobs=1, log=log.append)
+
+    assert paths["a"].stat().st_mtime_ns == first["a"]
+    assert [line.split()[0] for line in log] == ["[skip]", "[draw]"]
+    assert log[1].startswith("[draw] b.png")
+
+
+def test_figure_key_covers_helpers_of_the_plotting_module(tmp_path, monkeypatch):
+    import importlib
+
+    source = "SIZE = {size}\n\ndef _helper():\n    return SIZE\n\ndef plot():\n    return _helper()\n"
+    (tmp_path / "fake_plots.py").write_text(source.format(size=1))
+    monkeypatch.syspath_prepend(str(tmp_path))
+    import fake_plots
+
+    first = figure_key(figure_spec(fake_plots.plot))
+    (tmp_path / "fake_plots.py").write_text(source.format(size=1000))
+    importlib.reload(fake_plots)
+    sys.modules.pop("fake_plots")
+
+    assert figure_key(figure_spec(fake_plots.plot)) != first
+
+
+def test_figure_key_ignores_code_the_plot_does_not_use(tmp_path, monkeypatch):
+    import importlib
+
+    source = (
+        "SIZE = 1\nOTHER = {other}\n\ndef _helper():\n    return [SIZE for _ in range(2)]\n\n"
+        "def _unused():\n    return OTHER\n\ndef plot():\n    return _helper()\n"
+    )
+    (tmp_path / "fake_unused.py").write_text(source.format(other=1))
+    monkeypatch.syspath_prepend(str(tmp_path))
+    import fake_unused
+
+    first = figure_key(figure_spec(fake_unused.plot))
+    (tmp_path / "fake_unused.py").write_text(source.format(other=1000))
+    importlib.reload(fake_unused)
+    sys.modules.pop("fake_unused")
+
+    assert figure_key(figure_spec(fake_unused.plot)) == first
+
+
+def test_render_figures_in_process_uses_agg(tmp_path, monkeypatch):
+    import src.step00_utils as step00_utils
+
+    calls = []
+    monkeypatch.setattr(step00_utils, "_use_agg", lambda: calls.append(True))
+
+    render_figures({"fig": figure_spec(plot_line, [1, 2])}, tmp_path, dpi=50, jobs=1)
+
+    assert calls == [True]
+
+
+def test_render_figures_in_process_pool(tmp_path):
+    specs = {f"fig{i}": figure_spec(plot_line, list(range(i + 2))) for i in range(3)}
+
+    paths = render_figures(specs, tmp_path, dpi=50, jobs=2)
+
+    assert sorted(p.name for p in tmp_path.glob("*.png")) == ["fig0.png", "fig1.png", "fig2.png"]
+    assert all(Path(f"{path}.key").exists() for path in paths.values())
+
+
+@pytest.mark.parametrize("n_tasks, cores, max_inner, layout", [
+    (40, 64, None, (8, 8)),
+    (40, 8, None, (8, 1)),
+    (1, 8, None, (1, 8)),
+    (6, 8, None, (2, 4)),
+    (3, 8, 1, (3, 1)),
+    (0, 4, None, (1, 4)),
+])
+def test_plan_parallelism_never_oversubscribes(n_tasks, cores, max_inner, layout):
+    plan = plan_parallelism(n_tasks, cores, max_inner=max_inner)
+
+    assert (plan["outer"], plan["inner"]) == layout
+    assert plan["outer"] * plan["inner"] <= cores
+
+
+def test_resolve_cores_follows_joblib_convention():
+    cores = available_cores()
+
+    assert resolve_cores(-1) == cores
+    assert resolve_cores(-2) == max(1, cores - 1)
+    assert resolve_cores(None) == 1
+    assert resolve_cores(3) == 3
+
+
+def test_thread_limits_reach_loky_workers():
+    with thread_limits(2):
+        limits = joblib.Parallel(n_jobs=2)(
+            joblib.delayed(worker_env)("OMP_NUM_THREADS") for _ in range(2)
+        )
+
+    assert limits == ["2", "2"]
@@ -6,8 +6,261 @@
 import src.step00_utils as step00_utils
 import src.step01_data as step01_data
 
+import gzip
+import json
+import zipfile
+
+import pandas as pd
+import pandera as pdr
+import pyarrow.parquet as pq
 import pytest
 
+###
+# Fixtures
+###
+
+RAW_CSV_TEXT = """user_id,gender,age,country,subscription_type,listening_time,songs_played_per_day,skip_rate,device_type,ads_listened_per_week,offline_listening,is_churned
+1,Female,54,CA,Free,26,23,0.2,Desktop,31,0,1
+2,Other,33,DE,Family,141,62,0.34,Web,0,1,0
+3,Male,38,AU,Premium,199,38,0.04,Mobile,0,1,1
+4,Female,22,CA,Student,36,2,0.31,Mobile,0,1,0
+5,Other,29,US,Family,250,57,0.36,Mobile,0,1,1
+"""
+
+
+@pytest.fixture
+def raw_csv(tmp_path):
+    path = tmp_path / "spotify_churn_dataset.csv"
+    path.write_text(RAW_CSV_TEXT)
+    return path
+
 ###
 # ...
 ###
+
+def test_iter_raw_csv_chunks_yields_fixed_size_chunks(raw_csv):
+    chunks = list(step01_data.iter_raw_csv_chunks(raw_csv, chunksize=2))
+
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    for chunk in chunks:
+        assert list(chunk.columns) == list(step01_data.RAW_DTYPES)
+        assert chunk["age"].dtype == "int64"
+        assert chunk["skip_rate"].dtype == "float64"
+
+
+def test_load_raw_csv_data_matches_read_csv(raw_csv):
+    df = step01_data.load_raw_csv_data(raw_csv, chunksize=2)
+
+    pd.testing.assert_frame_equal(df, pd.read_csv(raw_csv))
+
+
+def test_iter_raw_csv_chunks_rejects_invalid_rows(tmp_path):
+    path = tmp_path / "bad.csv"
+    path.write_text(RAW_CSV_TEXT.replace("0.34", "1.34"))
+
+    with pytest.raises(pdr.errors.SchemaError):
+        list(step01_data.iter_raw_csv_chunks(path, chunksize=2))
+
+
+def test_iter_raw_csv_chunks_projects_columns(raw_csv):
+    df = step01_data.load_raw_csv_data(raw_csv, usecols=["user_id", "is_churned"])
+
+    assert list(df.columns) == ["user_id", "is_churned"]
+    assert len(df) == 5
+
+
+def test_iter_raw_csv_chunks_validates_projections(tmp_path):
+    path = tmp_path / "bad.csv"
+    path.write_text(RAW_CSV_TEXT.replace(",23,0.2,", ",70000,0.2,"))
+
+    with pytest.raises(pdr.errors.SchemaError):
+        step01_data.load_raw_csv_data(
+            path, usecols=["songs_played_per_day", "user_id"], compact=True
+        )
+
+
+def test_compact_frame_rejects_out_of_range_values():
+    frame = pd.DataFrame({"songs_played_per_day": [10, 70000]})
+
+    with pytest.raises(ValueError, match="songs_played_per_day"):
+        step01_data.compact_frame(frame)
+
+
+def test_load_cached_data_writes_and_reuses_cache(raw_csv, tmp_path):
+    cache_dir = tmp_path / "01_processed"
+    df = step01_data.load_cached_data(raw_csv, cache_dir=cache_dir)
+    cache_files = list(cache_dir.glob("*.parquet"))
+
+    assert len(cache_files) == 1
+    pd.testing.assert_frame_equal(df, pd.read_csv(raw_csv))
+
+    projected = step01_data.load_cached_data(
+        raw_csv, columns=["age", "is_churned"], cache_dir=cache_dir
+    )
+    assert list(projected.columns) == ["age", "is_churned"]
+    assert list(cache_dir.glob("*.parquet")) == cache_files
+
+
+def test_load_cached_data_invalidates_on_raw_change(raw_csv, tmp_path):
+    cache_dir = tmp_path / "01_processed"
+    step01_data.load_cached_data(raw_csv, cache_dir=cache_dir)
+    old_cache = list(cache_dir.glob("*.parquet"))
+
+    raw_csv.write_text(RAW_CSV_TEXT.replace("54,CA", "55,CA"))
+    df = step01_data.load_cached_data(raw_csv, cache_dir=cache_dir)
+    new_cache = list(cache_dir.glob("*.parquet"))
+
+    assert df.loc[0, "age"] == 55
+    assert len(new_cache) == 1
+    assert new_cache != old_cache
+
+
+def test_iter_raw_csv_chunks_streams_zip_member(raw_csv, tmp_path):
+    archive = tmp_path / "archive.zip"
+    with zipfile.ZipFile(archive, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.write(raw_csv, arcname=step00_utils.FILE_SPOTIFY_CHURN_DATASET_CSV)
+        zf.writestr("README.txt", "not a csv")
+
+    chunks = list(step01_data.iter_raw_csv_chunks(archive, chunksize=2))
+
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    pd.testing.assert_frame_equal(
+        pd.concat(chunks, ignore_index=True), pd.read_csv(raw_csv)
+    )
+
+
+def test_load_raw_csv_data_reads_gzip(raw_csv, tmp_path):
+    archive = tmp_path / "spotify_churn_dataset.csv.gz"
+    with gzip.open(archive, "wt") as handle:
+        handle.write(RAW_CSV_TEXT)
+
+    df = step01_data.load_raw_csv_data(archive, chunksize=2)
+
+    pd.testing.assert_frame_equal(df, pd.read_csv(raw_csv))
+
+
+def test_load_raw_csv_data_reads_zstd(raw_csv, tmp_path):
+    zstandard = pytest.importorskip("zstandard")
+    archive = tmp_path / "spotify_churn_dataset.csv.zst"
+    archive.write_bytes(zstandard.ZstdCompressor().compress(RAW_CSV_TEXT.encode()))
+
+    df = step01_data.load_raw_csv_data(archive, chunksize=2)
+
+    pd.testing.assert_frame_equal(df, pd.read_csv(raw_csv))
+
+
+def test_load_cached_data_from_archive(raw_csv, tmp_path):
+    archive = tmp_path / "archive.zip"
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.write(raw_csv, arcname="spotify_churn_dataset.csv")
+    cache_dir = tmp_path / "01_processed"
+
+    df = step01_data.load_cached_data(archive, cache_dir=cache_dir)
+
+    pd.testing.assert_frame_equal(df, pd.read_csv(raw_csv))
+    assert [p.name.split(".")[0] for p in cache_dir.glob("*.parquet")] == ["archive"]
+
+
+def test_load_raw_csv_data_compact_dtypes(raw_csv):
+    df = step01_data.load_raw_csv_data(raw_csv, chunksize=2, compact=True)
+    reference = pd.read_csv(raw_csv)
+
+    for name in ["gender", "country", "subscription_type", "device_type"]:
+        assert isinstance(df[name].dtype, pd.CategoricalDtype)
+        assert df[name].astype(str).tolist() == reference[name].tolist()
+    assert df["is_churned"].dtype == "int8"
+    assert df["age"].dtype == "int16"
+    assert df["skip_rate"].dtype == "float32"
+    assert (df["age"] == reference["age"]).all()
+
+
+def test_memory_report_compares_against_reference(raw_csv):
+    compact = step01_data.load_raw_csv_data(raw_csv, compact=True)
+    report = step01_data.memory_report(compact, step01_data.load_raw_csv_data(raw_csv))
+
+    assert list(report.index) == list(step01_data.RAW_DTYPES)
+    assert report.loc["is_churned", "ratio"] == 8
+    assert report.loc["age", "bytes"] < report.loc["age", "reference_bytes"]
+
+
+def test_profile_raw_data_passes_clean_file(raw_csv):
+    report = step01_data.profile_raw_data(raw_csv, chunksize=2)
+
+    assert report["passed"] and report["failures"] == []
+    assert report["rows"] == 5
+    assert report["columns"]["age"]["min"] == 22 and report["columns"]["age"]["max"] == 54
+    assert report["columns"]["country"]["distinct"] == 4
+    assert report["user_id"] == {"distinct": 5, "duplicates": 0, "duplicate_sample": []}
+
+
+def test_profile_raw_data_reports_every_problem(tmp_path):
+    path = tmp_path / "dirty.csv"
+    text = (RAW_CSV_TEXT
+            .replace("1,Female,54,CA", "1,Female,,CA")
+            .replace("2,Other,33,DE", "2,Other,abc,DEU")
+            .replace("3,Male,38,AU,Premium,199", "1,Male,38,AU,Gold,1999")
+            + "4,Female,22,CA,Student,36,2,1.5,Mobile,0,1,0\n")
+    path.write_text(text)
+
+    report = step01_data.profile_raw_data(path, chunksize=2)
+
+    assert not report["passed"]
+    assert report["columns"]["age"]["nulls"] == 1
+    assert report["columns"]["age"]["unparsable"] == 1
+    assert report["columns"]["listening_time"]["out_of_range"] == 1
+    assert report["columns"]["skip_rate"]["out_of_range"] == 1
+    assert report["columns"]["subscription_type"]["invalid"] == 1
+    assert report["columns"]["country"]["invalid"] == 1
+    assert report["user_id"]["duplicates"] == 2
+    assert report["user_id"]["duplicate_sample"] == [1, 4]
+    assert len(report["failures"]) == 7
+
+
+def test_profile_and_cache_reads_the_file_once(raw_csv, tmp_path, monkeypatch):
+    reference = step01_data.build_columnar_cache(raw_csv, tmp_path / "reference", chunksize=2)
+    opened = []
+    open_raw_source = step01_data.open_raw_source
+
+    def counting(*args, **kwargs):
+        opened.append(1)
+        return open_raw_source(*args, **kwargs)
+
+    monkeypatch.setattr(step01_data, "open_raw_source", counting)
+    report, cache_path = step01_data.profile_and_cache(raw_csv, tmp_path / "cache", chunksize=2)
+
+    assert opened == [1]
+    assert report == step01_data.profile_raw_data(raw_csv, chunksize=2)
+    assert cache_path.name == reference.name
+    assert pq.read_table(cache_path).equals(pq.read_table(reference))
+
+
+def test_profile_and_cache_keeps_nothing_when_the_gate_fails(raw_csv, tmp_path):
+    raw_csv.write_text(RAW_CSV_TEXT.replace("5,Other", "4,Other"))
+
+    report, cache_path = step01_data.profile_and_cache(raw_csv, tmp_path / "cache", chunksize=2)
+
+    assert not report["passed"] and cache_path is None
+    assert list((tmp_path / "cache").iterdir()) == []
+
+
+def test_quality_report_counts_distinct_ids():
+    state = step01_data.init_quality_state()
+    step01_data.update_quality_state(state, pd.DataFrame({"user_id": [1, 9, 9, 255, 256, 7]}))
+
+    report = step01_data.quality_report(state)
+
+    assert report["user_id"]["distinct"] == 5
+    assert report["user_id"]["duplicates"] == 1
+
+
+def test_run_stage_writes_report_and_gates(raw_csv, tmp_path):
+    paths = {"raw": raw_csv, "processed": tmp_path / "01_processed"}
+
+    outputs = step01_data.run_stage(paths, {})
+
+    assert outputs["dataset"].exists()
+    assert json.loads(outputs["quality"].read_text())["passed"]
+
+    raw_csv.write_text(RAW_CSV_TEXT.replace("5,Other", "4,Other"))
+    with pytest.raises(ValueError, match="duplicates"):
+        step01_data.run_stage(paths, {})
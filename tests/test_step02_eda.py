@@ -4,7 +4,384 @@
 # Imports
 ###
 import src.step00_utils as step00_utils
+import src.step02_eda as step02_eda
+from tests.test_step01_data import RAW_CSV_TEXT
+
+import matplotlib
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+matplotlib.use("Agg")
+
+###
+# Fixtures
+###
+
+@pytest.fixture
+def eda_df():
+    rng = np.random.default_rng(0)
+    n = 500
+    return pd.DataFrame({
+        "gender": rng.choice(["Female", "Male", "Other"], n),
+        "country": rng.choice(["AU", "CA", "DE", "US"], n),
+        "subscription_type": rng.choice(["Free", "Premium", "Family", "Student"], n),
+        "offline_listening": rng.integers(0, 2, n),
+        "device_type": rng.choice(["Desktop", "Mobile", "Web"], n),
+        "age": rng.integers(16, 60, n),
+        "listening_time": rng.integers(10, 300, n),
+        "is_churned": rng.integers(0, 2, n),
+    })
 
 ###
 # ...
 ###
+
+def test_aggregate_churn_matches_groupby(eda_df):
+    summary = step02_eda.aggregate_churn(eda_df)
+
+    for column in step02_eda.EDA_DIMENSIONS:
+        table = step02_eda.category_table(summary, column)
+        expected = eda_df.groupby(column)["is_churned"].agg(["size", "sum", "mean"])
+        assert list(table.index) == list(expected.index)
+        assert table["count"].tolist() == expected["size"].tolist()
+        assert table["churned"].tolist() == expected["sum"].tolist()
+        np.testing.assert_allclose(table["churn_rate"], expected["mean"])
+
+    total = step02_eda.category_table(summary, step02_eda.OVERALL).loc[step02_eda.OVERALL]
+    assert total["count"] == len(eda_df)
+    assert total["churned"] == eda_df["is_churned"].sum()
+
+
+def test_aggregate_churn_histograms_match_numpy(eda_df):
+    summary = step02_eda.aggregate_churn(eda_df, bins=7)
+
+    for column in step02_eda.EDA_NUMERIC:
+        for label in (0, 1):
+            table = step02_eda.histogram_table(summary, column, label)
+            expected, edges = np.histogram(eda_df.loc[eda_df["is_churned"] == label, column], bins=7)
+            assert table["count"].tolist() == expected.tolist()
+            np.testing.assert_allclose(table["bin_left"], edges[:-1])
+            np.testing.assert_allclose(table["bin_right"], edges[1:])
+
+
+def test_aggregate_churn_bins_each_class_over_its_own_range(eda_df):
+    # Churned users only span part of the age range, so shared edges would
+    # put them in different bins than the notebook's per-class ``ax.hist``.
+    df = eda_df.copy()
+    df.loc[df["is_churned"] == 1, "age"] = df["age"].clip(upper=40)
+    reference = step02_eda._aggregate_churn_reference(df, numeric=["age"], bins=20)
+    summary = step02_eda.aggregate_churn(df, numeric=["age"], bins=20)
+
+    for label in (0, 1):
+        table = step02_eda.histogram_table(summary, "age", label)
+        expected, edges = reference[("age", label)]
+        assert table["count"].tolist() == expected.tolist()
+        np.testing.assert_allclose(table["bin_left"], edges[:-1])
+
+
+def test_aggregate_churn_accepts_categorical_codes(eda_df):
+    compact = eda_df.astype({"gender": "category", "device_type": "category"})
+
+    plain = step02_eda.aggregate_churn(eda_df)["categories"]
+    coded = step02_eda.aggregate_churn(compact)["categories"]
+
+    pd.testing.assert_frame_equal(plain, coded)
+
+
+def test_bin_index_matches_numpy_on_floats():
+    values = np.random.default_rng(1).normal(size=10_000) * 1e3 / 7
+    edges = step02_eda.histogram_edges(values, bins=13)
+
+    idx = step02_eda.bin_index(values, edges)
+
+    expected, _ = np.histogram(values, bins=edges)
+    assert np.bincount(idx, minlength=13).tolist() == expected.tolist()
+
+
+def test_bin_index_drops_missing_and_out_of_range():
+    edges = np.array([0.0, 1.0, 2.0])
+
+    idx = step02_eda.bin_index([0.0, 0.5, 1.0, 2.0, -1.0, 3.0, np.nan], edges)
+
+    assert idx.tolist() == [0, 0, 1, 1, -1, -1, -1]
+
+
+def test_render_eda_figures_writes_pngs(eda_df, tmp_path):
+    paths = step02_eda.render_eda_figures(step02_eda.aggregate_churn(eda_df), tmp_path)
+
+    assert len(paths) == 8
+    assert all(path.exists() for path in paths.values())
+
+
+def test_merged_chunk_states_match_in_memory_summary(eda_df):
+    chunks = [eda_df.iloc[:120], eda_df.iloc[120:121], eda_df.iloc[121:]]
+    states = [step02_eda.update_eda_state(step02_eda.init_eda_state(), chunk) for chunk in chunks]
+
+    merged = step02_eda.summarize_eda_state(step02_eda.merge_eda_states(*states[::-1]))
+    expected = step02_eda.aggregate_churn(eda_df)
+
+    pd.testing.assert_frame_equal(merged["categories"], expected["categories"])
+    pd.testing.assert_frame_equal(merged["histograms"], expected["histograms"])
+    pd.testing.assert_frame_equal(merged["moments"], expected["moments"])
+
+    stats = eda_df.groupby("is_churned")["age"].agg(["mean", "var"])
+    age = merged["moments"][merged["moments"]["column"] == "age"]
+    np.testing.assert_allclose(age["mean"], stats["mean"])
+    np.testing.assert_allclose(age["var"], stats["var"])
+
+
+def test_stream_eda_state_over_row_groups(eda_df, tmp_path):
+    path = tmp_path / "cache.parquet"
+    pq.write_table(pa.Table.from_pandas(eda_df, preserve_index=False), path, row_group_size=64)
+
+    expected = step02_eda.aggregate_churn(eda_df)
+    for jobs in [1, 3]:
+        summary = step02_eda.summarize_eda_state(step02_eda.stream_eda_state(path, jobs=jobs))
+        pd.testing.assert_frame_equal(summary["categories"], expected["categories"])
+        pd.testing.assert_frame_equal(summary["histograms"], expected["histograms"])
+
+
+def test_sync_eda_state_ingests_only_new_row_groups(eda_df, tmp_path, monkeypatch):
+    path = tmp_path / "cache.parquet"
+    state_dir = tmp_path / "state"
+    table = pa.Table.from_pandas(eda_df, preserve_index=False)
+    pq.write_table(table.slice(0, 300), path, row_group_size=128)
+    step02_eda.sync_eda_state(path, state_dir)
+
+    # rows appended: the partial last row group changes, the first two stay
+    pq.write_table(table, path, row_group_size=128)
+    ingested = []
+    ingest_batch = step02_eda.ingest_batch
+
+    def counting(chunk, *args, **kwargs):
+        ingested.append(len(chunk))
+        return ingest_batch(chunk, *args, **kwargs)
+
+    monkeypatch.setattr(step02_eda, "ingest_batch", counting)
+    state = step02_eda.sync_eda_state(path, state_dir)
+
+    expected = step02_eda.aggregate_churn(eda_df)
+    summary = step02_eda.summarize_eda_state(state)
+    assert ingested == [128, 116]
+    assert step02_eda.list_eda_batches(state_dir) == step02_eda.row_group_ids(path)
+    pd.testing.assert_frame_equal(summary["categories"], expected["categories"])
+    pd.testing.assert_frame_equal(summary["histograms"], expected["histograms"])
+
+
+def test_update_eda_state_rejects_values_outside_range(eda_df):
+    state = step02_eda.init_eda_state()
+    eda_df.loc[0, "age"] = 500
+
+    with pytest.raises(ValueError):
+        step02_eda.update_eda_state(state, eda_df)
+
+
+def test_ingest_batches_matches_full_history(eda_df, tmp_path):
+    first = step02_eda.ingest_batch(eda_df.iloc[:300], tmp_path)
+    second = step02_eda.ingest_batch(eda_df.iloc[300:], tmp_path)
+
+    summary = step02_eda.summarize_eda_state(step02_eda.load_eda_state(tmp_path))
+    expected = step02_eda.aggregate_churn(eda_df)
+
+    assert step02_eda.list_eda_batches(tmp_path) == [first, second]
+    pd.testing.assert_frame_equal(summary["categories"], expected["categories"])
+    pd.testing.assert_frame_equal(summary["histograms"], expected["histograms"])
+    pd.testing.assert_frame_equal(summary["moments"], expected["moments"])
+    with pytest.raises(ValueError):
+        step02_eda.ingest_batch(eda_df.iloc[300:], tmp_path)
+
+
+def test_retract_batch_restores_previous_state(eda_df, tmp_path):
+    step02_eda.ingest_batch(eda_df.iloc[:300], tmp_path)
+    mistake = eda_df.iloc[300:].assign(gender="Unknown")
+    batch_id = step02_eda.ingest_batch(mistake, tmp_path, batch_id="2025-12-01")
+
+    assert batch_id == "2025-12-01"
+    step02_eda.retract_batch(batch_id, tmp_path)
+
+    summary = step02_eda.summarize_eda_state(step02_eda.load_eda_state(tmp_path))
+    expected = step02_eda.aggregate_churn(eda_df.iloc[:300])
+    pd.testing.assert_frame_equal(summary["categories"], expected["categories"])
+    pd.testing.assert_frame_equal(summary["histograms"], expected["histograms"])
+    pd.testing.assert_frame_equal(summary["moments"], expected["moments"])
+    assert len(step02_eda.list_eda_batches(tmp_path)) == 1
+    with pytest.raises(KeyError):
+        step02_eda.retract_batch(batch_id, tmp_path)
+
+
+def test_batch_id_is_the_same_for_a_frame_and_a_file(tmp_path):
+    path = tmp_path / "batch.csv"
+    path.write_text(RAW_CSV_TEXT)
+    state_dir = tmp_path / "state"
+
+    batch_id = step02_eda.ingest_batch(pd.read_csv(path), state_dir)
+
+    assert step02_eda.batch_state(path)[1] == batch_id
+    with pytest.raises(ValueError):
+        step02_eda.ingest_batch(path, state_dir)
+    assert step02_eda.retract_batch(batch_id, state_dir)["n"] == 0
+
+
+def test_subtract_eda_state_rejects_unknown_levels(eda_df):
+    state = step02_eda.update_eda_state(step02_eda.init_eda_state(), eda_df.iloc[:300])
+    other = step02_eda.update_eda_state(
+        step02_eda.init_eda_state(), eda_df.iloc[:10].assign(gender="Unknown")
+    )
+
+    with pytest.raises(ValueError):
+        step02_eda.subtract_eda_state(state, other)
+
+
+def test_ingest_batch_recovers_from_interrupted_write(eda_df, tmp_path, monkeypatch):
+    def crash(*args):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(step02_eda, "_save_eda_state", crash)
+    with pytest.raises(KeyboardInterrupt):
+        step02_eda.ingest_batch(eda_df, tmp_path)
+    monkeypatch.undo()
+
+    batch_id = step02_eda.ingest_batch(eda_df, tmp_path)
+
+    assert step02_eda.list_eda_batches(tmp_path) == [batch_id]
+    assert step02_eda.load_eda_state(tmp_path)["n"] == len(eda_df)
+
+
+def test_eda_state_json_round_trip(eda_df):
+    state = step02_eda.update_eda_state(step02_eda.init_eda_state(), eda_df)
+
+    restored = step02_eda.eda_state_from_json(step02_eda.eda_state_to_json(state))
+
+    assert set(restored["dimensions"]["offline_listening"]) == {0, 1}
+    pd.testing.assert_frame_equal(
+        step02_eda.summarize_eda_state(restored)["categories"],
+        step02_eda.summarize_eda_state(state)["categories"],
+    )
+
+
+def test_rebuild_eda_state_from_batches(eda_df, tmp_path):
+    step02_eda.ingest_batch(eda_df.iloc[:100], tmp_path)
+    step02_eda.ingest_batch(eda_df.iloc[100:], tmp_path)
+    (tmp_path / step02_eda.EDA_STATE_FILE).write_text(
+        (tmp_path / step02_eda.EDA_STATE_FILE).read_text().replace('"n": 500', '"n": 0')
+    )
+
+    state = step02_eda.rebuild_eda_state(tmp_path)
+
+    assert state["n"] == 500
+    assert step02_eda.load_eda_state(tmp_path)["n"] == 500
+
+
+def test_cube_table_matches_groupby(eda_df):
+    cube = step02_eda.build_churn_cube(eda_df)
+
+    assert cube["cells"].shape == (3, 4, 4, 3, 2, 2)
+    for by in [["gender"], ["device_type", "country"], step02_eda.CUBE_DIMENSIONS]:
+        table = step02_eda.cube_table(cube, by)
+        expected = eda_df.groupby(by)["is_churned"].agg(["size", "sum", "mean"])
+        assert table["count"].tolist() == expected["size"].tolist()
+        assert table["churned"].tolist() == expected["sum"].tolist()
+        np.testing.assert_allclose(table["churn_rate"], expected["mean"])
+        assert list(table.index) == list(expected.index)
+
+
+def test_cube_rollup_slices(eda_df):
+    cube = step02_eda.build_churn_cube(eda_df)
+
+    cells = step02_eda.cube_rollup(
+        cube, ["offline_listening"], {"country": "US", "gender": ["Female", "Male"]}
+    )
+
+    subset = eda_df[(eda_df["country"] == "US") & eda_df["gender"].isin(["Female", "Male"])]
+    expected = subset.groupby("offline_listening")["is_churned"].agg(["size", "sum"])
+    assert cells.tolist() == expected.to_numpy().tolist()
+    assert step02_eda.cube_rollup(cube).tolist() == [len(eda_df), eda_df["is_churned"].sum()]
+
+
+def test_merged_cubes_and_npz_round_trip(eda_df, tmp_path):
+    parts = [eda_df.iloc[:50], eda_df.iloc[50:]]
+    parts[0] = parts[0][parts[0]["country"] != "DE"]
+    cube = step02_eda.merge_churn_cubes(*(step02_eda.build_churn_cube(p) for p in parts))
+
+    path = step02_eda.save_churn_cube(cube, tmp_path / "cube.npz")
+    loaded = step02_eda.load_churn_cube(path)
+
+    expected = step02_eda.build_churn_cube(pd.concat(parts))
+    assert loaded["levels"] == expected["levels"]
+    np.testing.assert_array_equal(loaded["cells"], expected["cells"])
+    with np.load(path) as data:
+        assert data["cells"].dtype == np.uint8
+
+
+def test_stream_churn_cube_over_row_groups(eda_df, tmp_path):
+    path = tmp_path / "cache.parquet"
+    pq.write_table(pa.Table.from_pandas(eda_df, preserve_index=False), path, row_group_size=64)
+
+    cube = step02_eda.stream_churn_cube(path)
+
+    np.testing.assert_array_equal(cube["cells"], step02_eda.build_churn_cube(eda_df)["cells"])
+
+
+def test_kll_quantiles_within_rank_error_bound():
+    values = np.random.default_rng(2).lognormal(3, 1, 200_000)
+    parts = [step02_eda.kll_update(step02_eda.init_kll(seed=i), chunk)
+             for i, chunk in enumerate(np.array_split(values, 7))]
+
+    sketch = step02_eda.kll_merge(*parts)
+
+    qs = np.array([0.01, 0.25, 0.5, 0.75, 0.99])
+    ranks = np.searchsorted(np.sort(values), step02_eda.kll_quantile(sketch, qs)) / len(values)
+    bounds = step02_eda.kll_rank_error(sketch)
+    assert sketch["n"] == len(values)
+    assert sum(len(level) for level in sketch["levels"]) < 3 * step02_eda.KLL_K
+    assert np.abs(ranks - qs).max() <= bounds["probabilistic"] <= bounds["deterministic"]
+
+
+def test_kll_is_exact_below_capacity():
+    sketch = step02_eda.kll_update(step02_eda.init_kll(), [5.0, 1.0, np.nan, 3.0])
+
+    assert sketch["n"] == 3
+    assert step02_eda.kll_quantile(sketch, 0.5) == 3.0
+    assert step02_eda.kll_rank_error(sketch) == {"deterministic": 0.0, "probabilistic": 0.0}
+
+
+def test_hll_count_and_merge():
+    ids = np.random.default_rng(3).integers(0, 50_000, 120_000)
+    a = step02_eda.hll_update(step02_eda.init_hll(), ids[:60_000])
+    b = step02_eda.hll_update(step02_eda.init_hll(), pd.Series(ids[60_000:]).astype("int32"))
+
+    merged = step02_eda.hll_merge(a, b)
+    whole = step02_eda.hll_update(step02_eda.init_hll(), ids)
+
+    np.testing.assert_array_equal(merged["registers"], whole["registers"])
+    true = len(np.unique(ids))
+    assert abs(step02_eda.hll_count(merged) - true) < 3 * step02_eda.hll_relative_error(merged) * true
+    small = step02_eda.hll_update(step02_eda.init_hll(), ["US", "CA", "DE"] * 10)
+    assert round(step02_eda.hll_count(small)) == 3
+
+
+def test_sketches_stream_persist_and_merge(eda_df, tmp_path):
+    eda_df = eda_df.assign(
+        user_id=np.arange(len(eda_df)) + 1,
+        songs_played_per_day=np.arange(len(eda_df)) % 40,
+        skip_rate=np.linspace(0, 1, len(eda_df)),
+        ads_listened_per_week=np.arange(len(eda_df)) % 7,
+    )
+    path = tmp_path / "cache.parquet"
+    pq.write_table(pa.Table.from_pandas(eda_df, preserve_index=False), path, row_group_size=64)
+
+    sketches = step02_eda.stream_sketches(path)
+    saved = step02_eda.save_sketches(sketches, tmp_path / "sketches.json")
+    merged = step02_eda.merge_sketches(step02_eda.load_sketches(saved), sketches)
+
+    report = step02_eda.sketch_report(sketches)["distinct"].set_index("column")
+    assert round(report.loc["country", "distinct"]) == 4
+    assert abs(report.loc["user_id", "distinct"] - len(eda_df)) < 10
+    median = step02_eda.sketch_report(merged)["quantiles"].query("column == 'age' and q == 0.5")
+    error = median["rank_error"].item()
+    low, high = np.quantile(eda_df["age"], [0.5 - error, 0.5 + error])
+    assert low <= median["value"].item() <= high
+    assert merged["quantiles"]["age"]["n"] == 2 * len(eda_df)
@@ -4,7 +4,269 @@
 # Imports
 ###
 import src.step00_utils as step00_utils
+import src.step03_features as step03_features
+
+import numpy as np
+import pandas as pd
+import pytest
+import scipy.sparse as sp
+
+###
+# Fixtures
+###
+
+@pytest.fixture
+def raw_df():
+    rng = np.random.default_rng(0)
+    n = 200
+    return pd.DataFrame({
+        "user_id": np.arange(1, n + 1),
+        "gender": rng.choice(["Female", "Male", "Other"], n),
+        "age": rng.integers(16, 60, n),
+        "country": rng.choice(["CA", "DE", "US", "UK"], n),
+        "subscription_type": rng.choice(["Family", "Free", "Premium", "Student"], n),
+        "listening_time": rng.integers(10, 300, n),
+        "songs_played_per_day": rng.integers(1, 100, n),
+        "skip_rate": rng.uniform(0, 0.6, n).round(2),
+        "device_type": rng.choice(["Desktop", "Mobile", "Web"], n),
+        "ads_listened_per_week": rng.integers(0, 50, n),
+        "offline_listening": rng.integers(0, 2, n),
+        "is_churned": rng.integers(0, 2, n),
+    })
 
 ###
 # ...
 ###
+
+def test_engineer_features_matches_reference(raw_df):
+    expected = step03_features._engineer_features_reference(raw_df)
+
+    pd.testing.assert_frame_equal(step03_features.engineer_features(raw_df), expected)
+    assert "ads_per_song" not in raw_df.columns
+
+
+def test_engineer_features_inplace(raw_df):
+    expected = step03_features._engineer_features_reference(raw_df)
+    result = step03_features.engineer_features(raw_df, inplace=True)
+
+    assert result is raw_df
+    pd.testing.assert_frame_equal(raw_df, expected)
+
+
+def test_engineer_features_writes_into_out_buffers(raw_df):
+    expected = step03_features._engineer_features_reference(raw_df)
+    out = (np.empty(len(raw_df)), np.empty(len(raw_df)))
+
+    result = step03_features.engineer_features(raw_df, out=out)
+
+    pd.testing.assert_frame_equal(result, expected)
+    assert np.shares_memory(result["ads_per_song"].to_numpy(), out[0])
+    assert np.shares_memory(result["avg_song_length"].to_numpy(), out[1])
+
+
+def test_compute_interaction_features_out_buffers():
+    songs = np.array([0, 1, 9, 99])
+    ads = np.array([7, 0, 31, 10])
+    listening = np.array([10, 20, 30, 40])
+    out = (np.full(4, np.nan), np.full(4, np.nan))
+
+    ads_per_song, avg_song_length = step03_features.compute_interaction_features(
+        songs, ads, listening, out=out, block_size=3
+    )
+
+    assert ads_per_song is out[0] and avg_song_length is out[1]
+    np.testing.assert_array_equal(ads_per_song, ads / (songs * 7 + 1))
+    np.testing.assert_array_equal(avg_song_length, listening / (songs + 1))
+
+
+def test_incremental_preprocessor_matches_in_memory_fit(raw_df):
+    X, _ = step03_features.make_X_y(step03_features.engineer_features(raw_df))
+    expected = step03_features.build_preprocessor().fit(X)
+
+    shards = []
+    for shard in np.array_split(np.arange(len(X)), 3):
+        state = step03_features.init_preprocessor_state()
+        for rows in np.array_split(shard, 4):
+            step03_features.update_preprocessor_state(state, X.iloc[rows])
+        shards.append(state)
+    merged = step03_features.merge_preprocessor_states(*shards)
+    result = step03_features.finalize_preprocessor_state(merged)
+
+    expected_scaler = expected.named_transformers_["num"]
+    result_scaler = result.named_transformers_["num"]
+    assert result_scaler.n_samples_seen_ == expected_scaler.n_samples_seen_
+    np.testing.assert_allclose(result_scaler.mean_, expected_scaler.mean_, rtol=1e-12)
+    np.testing.assert_allclose(result_scaler.var_, expected_scaler.var_, rtol=1e-12)
+    for got, want in zip(result.named_transformers_["cat"].categories_,
+                         expected.named_transformers_["cat"].categories_):
+        np.testing.assert_array_equal(got, want)
+    assert list(result.get_feature_names_out()) == list(expected.get_feature_names_out())
+    np.testing.assert_allclose(result.transform(X), expected.transform(X), atol=1e-12)
+
+
+def test_incremental_preprocessor_merges_per_shard_categories(raw_df):
+    X, _ = step03_features.make_X_y(step03_features.engineer_features(raw_df))
+    X = X.sort_values("country", kind="stable")
+    expected = step03_features.build_preprocessor().fit(X)
+
+    # every shard is compacted on its own, so each has its own categories
+    state = step03_features.init_preprocessor_state()
+    for _, shard in X.groupby("country", sort=False):
+        shard = shard.astype({col: "category" for col in step03_features.CATEGORICAL_FEATURES})
+        step03_features.update_preprocessor_state(state, shard)
+    result = step03_features.finalize_preprocessor_state(state)
+
+    for got, want in zip(result.named_transformers_["cat"].categories_,
+                         expected.named_transformers_["cat"].categories_):
+        np.testing.assert_array_equal(got, want)
+    np.testing.assert_allclose(result.transform(X), expected.transform(X), atol=1e-12)
+
+
+def test_incremental_preprocessor_keeps_missing_categories(raw_df):
+    X, _ = step03_features.make_X_y(step03_features.engineer_features(raw_df))
+    X = X.astype({"country": object})
+    X.loc[X.index[::7], "country"] = np.nan
+    expected = step03_features.build_preprocessor().fit(X)
+
+    state = step03_features.init_preprocessor_state()
+    for rows in np.array_split(np.arange(len(X)), 3):
+        step03_features.update_preprocessor_state(state, X.iloc[rows])
+    result = step03_features.finalize_preprocessor_state(state)
+
+    for got, want in zip(result.named_transformers_["cat"].categories_,
+                         expected.named_transformers_["cat"].categories_):
+        pd.testing.assert_index_equal(pd.Index(got), pd.Index(want))
+    np.testing.assert_allclose(result.transform(X), expected.transform(X))
+
+
+def test_update_preprocessor_state_rejects_changed_column_kind(raw_df):
+    X, _ = step03_features.make_X_y(step03_features.engineer_features(raw_df))
+    state = step03_features.update_preprocessor_state(
+        step03_features.init_preprocessor_state(), X.iloc[:10]
+    )
+
+    with pytest.raises(ValueError, match="age"):
+        step03_features.update_preprocessor_state(state, X.iloc[10:].astype({"age": str}))
+
+
+def test_finalize_preprocessor_state_requires_data():
+    with pytest.raises(ValueError):
+        step03_features.finalize_preprocessor_state(step03_features.init_preprocessor_state())
+
+
+def test_build_preprocessor_sparse_output(raw_df):
+    X, _ = step03_features.make_X_y(step03_features.engineer_features(raw_df))
+    dense = step03_features.build_preprocessor().fit_transform(X)
+    sparse = step03_features.build_preprocessor(sparse=True).fit_transform(X)
+
+    assert sp.issparse(sparse) and sparse.format == "csr"
+    np.testing.assert_allclose(sparse.toarray(), dense)
+
+    report = step03_features.compare_output_memory(X)
+    assert list(report["mode"]) == ["dense", "sparse"]
+    assert report.loc[0, "bytes"] == dense.nbytes
+
+
+@pytest.mark.parametrize("sparse", [False, True])
+def test_transform_features_float32(raw_df, sparse):
+    X, _ = step03_features.make_X_y(step03_features.engineer_features(raw_df))
+    preprocessor = step03_features.build_preprocessor(sparse=sparse).fit(X)
+
+    result = step03_features.transform_features(preprocessor, X, block_size=64)
+    expected = preprocessor.transform(X)
+
+    assert result.dtype == np.float32
+    assert sp.issparse(result) == sparse
+    if sparse:
+        result, expected = result.toarray(), expected.toarray()
+    np.testing.assert_array_equal(result, expected.astype(np.float32))
+
+
+@pytest.mark.parametrize("sparse", [False, True])
+def test_save_and_load_vectorized_round_trip(tmp_path, sparse):
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(30, 5)).astype(np.float32)
+    X[X < 0.5] = 0
+    X = sp.csr_matrix(X) if sparse else X
+    y = pd.Series(rng.integers(0, 2, 30), name="is_churned")
+
+    step03_features.save_vectorized(tmp_path / "train", X, y, feature_names=list("abcde"))
+    X_loaded, y_loaded = step03_features.load_vectorized(tmp_path / "train")
+    meta = step03_features.read_vectorized_meta(tmp_path / "train")
+
+    assert meta["layout"] == ("csr" if sparse else "dense")
+    assert meta["feature_names"] == list("abcde")
+    assert isinstance(y_loaded, np.memmap)
+    np.testing.assert_array_equal(y_loaded, y.to_numpy())
+    if sparse:
+        assert not X_loaded.data.flags.writeable
+        X_loaded, X = X_loaded.toarray(), X.toarray()
+    else:
+        assert isinstance(X_loaded, np.memmap) and not X_loaded.flags.writeable
+    np.testing.assert_array_equal(X_loaded, X)
+
+
+def test_load_train_test_falls_back_to_joblib(tmp_path):
+    X = np.ones((4, 2))
+    y = np.array([0, 1, 0, 1])
+    step03_features.joblib.dump({"X": X, "y": y}, tmp_path / "train.joblib")
+    step03_features.save_vectorized(tmp_path / "test", X[:2], y[:2])
+
+    X_train, y_train, X_test, y_test = step03_features.load_train_test(tmp_path)
+
+    assert X_train.shape == (4, 2) and X_test.shape == (2, 2)
+    np.testing.assert_array_equal(y_test, y[:2])
+
+
+def test_make_split_matches_train_test_split(raw_df):
+    X, y = step03_features.make_X_y(raw_df)
+    split = step03_features.make_split(y, test_size=0.25, random_state=7)
+    expected = step03_features.train_test_split(
+        X, y, test_size=0.25, random_state=7, stratify=y
+    )
+
+    assert split["train"].dtype == np.int32 and split["test"].dtype == np.int32
+    for got, want in zip(step03_features.split_views(X, y, split), expected):
+        pd.testing.assert_index_equal(got.index, want.index)
+
+    cv = step03_features.StratifiedKFold(n_splits=5).split(split["train"], y.iloc[split["train"]])
+    for (got_train, got_val), (want_train, want_val) in zip(
+        step03_features.fold_indices(split), cv
+    ):
+        np.testing.assert_array_equal(got_train, want_train)
+        np.testing.assert_array_equal(got_val, want_val)
+
+
+def test_get_split_persists_indices(raw_df, tmp_path):
+    y = raw_df["is_churned"]
+    split = step03_features.get_split(y, "data-v1", cache_dir=tmp_path, random_state=1)
+    files = list(tmp_path.glob("*.npz"))
+
+    again = step03_features.get_split(y.iloc[::-1], "data-v1", cache_dir=tmp_path, random_state=1)
+    other = step03_features.get_split(y, "data-v1", cache_dir=tmp_path, random_state=2)
+
+    assert files == [step03_features.split_path("data-v1", tmp_path, random_state=1)]
+    np.testing.assert_array_equal(again["train"], split["train"])
+    assert again["params"] == split["params"]
+    assert not np.array_equal(other["test"], split["test"])
+    assert len(list(tmp_path.glob("*.npz"))) == 2
+
+
+def test_get_split_rejects_cached_split_of_other_data(raw_df, tmp_path):
+    y = raw_df["is_churned"]
+    step03_features.get_split(y, "data-v1", cache_dir=tmp_path)
+
+    with pytest.raises(ValueError):
+        step03_features.get_split(y.iloc[:-4], "data-v1", cache_dir=tmp_path)
+    with pytest.raises(ValueError):
+        step03_features.get_split(1 - y, "data-v1", cache_dir=tmp_path)
+
+
+def test_make_split_fold_numbers_do_not_wrap():
+    y = np.arange(1000) % 2
+
+    split = step03_features.make_split(y, n_splits=200)
+
+    assert split["fold"].max() == 199
+    assert len(step03_features.fold_indices(split)) == 200
+    assert step03_features.make_split(y)["fold"].dtype == np.int8
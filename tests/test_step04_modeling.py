@@ -4,7 +4,375 @@
 # Imports
 ###
 import src.step00_utils as step00_utils
+import src.step03_features as step03_features
+import src.step04_modeling as step04_modeling
+
+import numpy as np
+import pandas as pd
+import pytest
+import scipy.sparse as sp
+
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import GridSearchCV
+from sklearn.pipeline import Pipeline
+
+###
+# Fixtures
+###
+
+@pytest.fixture
+def vectorized():
+    rng = np.random.default_rng(0)
+    n = 120
+    X = np.hstack([rng.normal(size=(n, 3)), np.eye(4)[rng.integers(0, 4, n)]])
+    y = (X[:, 0] + 0.5 * rng.normal(size=n) > 0).astype(int)
+    return X, y
+
+
+@pytest.fixture
+def raw_features():
+    rng = np.random.default_rng(1)
+    n = 150
+    df = pd.DataFrame({
+        "user_id": np.arange(1, n + 1),
+        "gender": rng.choice(["Female", "Male", "Other"], n),
+        "age": rng.integers(16, 60, n),
+        "country": rng.choice(["CA", "DE", "US"], n),
+        "subscription_type": rng.choice(["Family", "Free", "Premium", "Student"], n),
+        "listening_time": rng.integers(10, 300, n),
+        "songs_played_per_day": rng.integers(1, 100, n),
+        "skip_rate": rng.uniform(0, 0.6, n).round(2),
+        "device_type": rng.choice(["Desktop", "Mobile", "Web"], n),
+        "ads_listened_per_week": rng.integers(0, 50, n),
+        "offline_listening": rng.integers(0, 2, n),
+    })
+    df["is_churned"] = (df["skip_rate"] + 0.2 * rng.normal(size=n) > 0.3).astype(int)
+    return step03_features.make_X_y(step03_features.engineer_features(df))
 
 ###
 # ...
 ###
+
+def test_run_grid_search_accepts_sparse(vectorized):
+    X, y = vectorized
+    grid = {"n_estimators": [5], "max_depth": [3, None]}
+
+    search = step04_modeling.run_grid_search(sp.csr_matrix(X), y, param_grid=grid, cv=2, n_jobs=1)
+
+    assert set(search.best_params_) == {"n_estimators", "max_depth"}
+    assert search.best_estimator_.predict(sp.csr_matrix(X)).shape == (len(y),)
+
+
+def test_fit_baseline_accepts_sparse(vectorized):
+    X, y = vectorized
+    dense = step04_modeling.fit_baseline(X, y)
+    sparse = step04_modeling.fit_baseline(sp.csr_matrix(X), y)
+
+    np.testing.assert_allclose(sparse.coef_, dense.coef_, atol=1e-4)
+
+
+def test_fit_final_model_reuses_registry(vectorized, tmp_path):
+    X, y = vectorized
+    grid = {"n_estimators": [5], "max_depth": [3]}
+
+    model, hit = step04_modeling.fit_final_model(
+        X, y, "data-v1", param_grid=grid, cv=2, n_jobs=1, registry_dir=tmp_path
+    )
+    again, hit_again = step04_modeling.fit_final_model(
+        X, y, "data-v1", param_grid=grid, cv=2, n_jobs=1, registry_dir=tmp_path
+    )
+    _, hit_changed = step04_modeling.fit_final_model(
+        X, y, "data-v2", param_grid=grid, cv=2, n_jobs=1, registry_dir=tmp_path
+    )
+
+    assert (hit, hit_again, hit_changed) == (False, True, False)
+    np.testing.assert_array_equal(again.predict(X), model.predict(X))
+
+
+def test_halving_schedule_shrinks_candidates_and_grows_resource():
+    rounds = step04_modeling.halving_schedule(8, 900, factor=3)
+
+    assert [r["n_candidates"] for r in rounds] == [8, 3, 1]
+    assert [r["resource"] for r in rounds] == [100, 300, 900]
+
+
+def test_halving_schedule_respects_budget():
+    rounds = step04_modeling.halving_schedule(8, 1000, factor=2, budget=2000)
+
+    assert [r["n_candidates"] for r in rounds] == [8, 4, 2, 1]
+    assert sum(r["n_candidates"] * r["resource"] for r in rounds) <= 2000
+    with pytest.raises(ValueError, match="budget"):
+        step04_modeling.halving_schedule(8, 1000, budget=10, min_resource=5)
+
+
+@pytest.mark.parametrize("resource", ["n_samples", "n_estimators"])
+def test_successive_halving_search_eliminates_candidates(vectorized, resource):
+    X, y = vectorized
+    grid = {"n_estimators": [4, 8], "max_depth": [1, 3, None], "min_samples_split": [2, 10]}
+
+    result = step04_modeling.successive_halving_search(
+        sp.csr_matrix(X), y, param_grid=grid, resource=resource, cv=3, n_jobs=1
+    )
+    trials = result["trials"]
+
+    assert trials.groupby("round").size().is_monotonic_decreasing
+    assert trials["resource"].is_monotonic_increasing
+    assert result["fits"] == len(trials) * 3
+    assert result["resource_spent"] < result["exhaustive_resource"]
+    assert result["best_estimator"].get_params()["max_depth"] == result["best_params"]["max_depth"]
+    if resource == "n_estimators":
+        assert result["best_params"]["n_estimators"] == 8
+        assert trials["params"].map(lambda p: "n_estimators" not in p).all()
+
+
+def test_fit_final_model_halving_uses_its_own_key(vectorized, tmp_path):
+    X, y = vectorized
+    grid = {"n_estimators": [5], "max_depth": [2, 3]}
+
+    _, hit_grid = step04_modeling.fit_final_model(
+        X, y, "data-v1", param_grid=grid, cv=2, n_jobs=1, registry_dir=tmp_path
+    )
+    model, hit_halving = step04_modeling.fit_final_model(
+        X, y, "data-v1", param_grid=grid, cv=2, n_jobs=1, registry_dir=tmp_path,
+        search="halving", search_options={"factor": 2},
+    )
+
+    assert (hit_grid, hit_halving) == (False, False)
+    assert model.predict(X).shape == (len(y),)
+
+
+def test_warm_start_search_matches_grid_search(vectorized):
+    X, y = vectorized
+    grid = {"n_estimators": [3, 6, 12], "max_depth": [2, None]}
+
+    reference = step04_modeling.run_grid_search(X, y, param_grid=grid, cv=3, n_jobs=1)
+    result = step04_modeling.warm_start_search(X, y, param_grid=grid, cv=3, n_jobs=1)
+
+    assert result["fits"] == 2 * 3
+    assert list(result["trials"]["params"]) == reference.cv_results_["params"]
+    np.testing.assert_allclose(
+        result["trials"]["mean_score"], reference.cv_results_["mean_test_score"]
+    )
+    assert result["best_params"] == reference.best_params_
+    np.testing.assert_array_equal(
+        result["best_estimator"].predict(X), reference.best_estimator_.predict(X)
+    )
+
+
+def test_fold_data_fits_preprocessor_once_per_fold(raw_features):
+    X, y = raw_features
+    calls = []
+
+    def preprocess():
+        calls.append(1)
+        return step03_features.build_preprocessor()
+
+    splits = step04_modeling.cv_splits(y, 3)
+    folds = step04_modeling.fold_data(X, y, splits, preprocess)
+    _, test = splits[0]
+
+    assert len(calls) == 3
+    assert folds[0]["X_test"].shape == (len(test), folds[0]["X_train"].shape[1])
+    assert abs(folds[0]["X_train"][:, 0].mean()) < 1e-5
+    assert abs(folds[0]["X_test"][:, 0].mean()) > 1e-5
+
+
+def test_fold_data_keeps_row_indices_without_preprocess(vectorized):
+    X, y = vectorized
+    splits = step04_modeling.cv_splits(y, 3)
+
+    folds = step04_modeling.fold_data(X, y, splits)
+    train, test = splits[0]
+
+    assert folds[0]["X"] is X
+    assert "X_train" not in folds[0]
+    np.testing.assert_array_equal(step04_modeling.fold_rows(folds[0], "train"), X[train])
+    np.testing.assert_array_equal(step04_modeling.fold_rows(folds[0], "test", [0, 2]), X[test[[0, 2]]])
+
+
+def test_fit_final_model_searches_with_per_fold_preprocessing(raw_features, tmp_path):
+    X, y = raw_features
+    X_vec = step03_features.build_preprocessor().fit_transform(X)
+    grid = {"n_estimators": [5], "max_depth": [2, None]}
+    preprocess = step03_features.build_preprocessor
+
+    model, hit = step04_modeling.fit_final_model(
+        X_vec, y, "data-v1", param_grid=grid, cv=3, n_jobs=1, registry_dir=tmp_path,
+        X_search=X, preprocess=preprocess,
+    )
+    naive = GridSearchCV(
+        Pipeline([("preprocessor", preprocess()), ("model", step04_modeling.build_forest())]),
+        {f"model__{name}": values for name, values in grid.items()},
+        cv=3,
+        scoring="f1",
+    ).fit(X, y)
+
+    assert not hit
+    assert isinstance(model, RandomForestClassifier)
+    assert model.max_depth == naive.best_params_["model__max_depth"]
+    assert model.predict(X_vec).shape == (len(y),)
+    assert step04_modeling.final_model_key("data-v1", grid, cv=3, preprocess=preprocess) != (
+        step04_modeling.final_model_key("data-v1", grid, cv=3)
+    )
+    with pytest.raises(ValueError):
+        step04_modeling.fit_final_model(X_vec, y, "data-v1", preprocess=preprocess)
+
+
+def test_exhaustive_search_matches_grid_search(vectorized):
+    X, y = vectorized
+    grid = {"n_estimators": [5, 8], "max_depth": [2, None]}
+
+    result = step04_modeling.exhaustive_search(X, y, param_grid=grid, cv=3, n_jobs=1)
+    reference = step04_modeling.run_grid_search(X, y, param_grid=grid, cv=3, n_jobs=1)
+
+    np.testing.assert_allclose(result["trials"]["mean_score"], reference.cv_results_["mean_test_score"])
+    assert result["best_params"] == reference.best_params_
+    assert result["fits"] == 12
+
+
+def test_fit_final_model_grid_records_and_reuses_trials(vectorized, tmp_path):
+    X, y = vectorized
+    store = tmp_path / "trials.sqlite"
+    grid = {"n_estimators": [4], "max_depth": [2, None]}
+
+    step04_modeling.fit_final_model(
+        X, y, "data-v1", param_grid=grid, cv=3, n_jobs=1, registry_dir=tmp_path, store=store
+    )
+    again = step04_modeling.exhaustive_search(
+        X, y, param_grid=grid, cv=3, n_jobs=1, store=store, data_hash="data-v1", refit=False
+    )
+
+    assert len(step04_modeling.trial_store.trials_frame(store)) == 6
+    assert (again["fits"], again["cached"]) == (0, 6)
+
+
+def test_exhaustive_search_preprocesses_each_fold_once(raw_features):
+    X, y = raw_features
+    grid = {"n_estimators": [3, 6], "max_depth": [2, None]}
+    calls = []
+
+    def preprocess():
+        calls.append(1)
+        return step03_features.build_preprocessor()
+
+    result = step04_modeling.exhaustive_search(
+        X, y, param_grid=grid, cv=3, n_jobs=1, preprocess=preprocess, refit=False
+    )
+    naive = GridSearchCV(
+        Pipeline([
+            ("preprocessor", step03_features.build_preprocessor()),
+            ("model", step04_modeling.build_forest()),
+        ]),
+        {f"model__{name}": values for name, values in grid.items()},
+        cv=3,
+        scoring="f1",
+    ).fit(X, y)
+
+    assert len(calls) == 3
+    np.testing.assert_allclose(result["trials"]["mean_score"], naive.cv_results_["mean_test_score"])
+
+
+def test_warm_start_search_preprocesses_per_fold_without_leakage(raw_features):
+    X, y = raw_features
+    grid = {"n_estimators": [3, 6], "max_depth": [2, None]}
+    calls = []
+
+    def preprocess():
+        calls.append(1)
+        return step03_features.build_preprocessor()
+
+    result = step04_modeling.warm_start_search(
+        X, y, param_grid=grid, cv=3, n_jobs=1, preprocess=preprocess
+    )
+    naive = GridSearchCV(
+        Pipeline([
+            ("preprocessor", step03_features.build_preprocessor()),
+            ("model", step04_modeling.build_forest()),
+        ]),
+        {f"model__{name}": values for name, values in grid.items()},
+        cv=3,
+        scoring="f1",
+    ).fit(X, y)
+
+    assert len(calls) == 3 + 1
+    np.testing.assert_allclose(
+        result["trials"]["mean_score"], naive.cv_results_["mean_test_score"]
+    )
+    assert isinstance(result["best_estimator"], Pipeline)
+    assert result["best_estimator"].predict(X).shape == (len(y),)
+
+
+def test_warm_start_search_resumes_and_extends_from_store(vectorized, tmp_path, monkeypatch):
+    X, y = vectorized
+    store = tmp_path / "trials.sqlite"
+    grid = {"n_estimators": [3, 6], "max_depth": [2, None]}
+    reference = step04_modeling.warm_start_search(
+        X, y, param_grid={**grid, "max_depth": [2, 4, None]}, cv=3, n_jobs=1
+    )
+
+    # interrupt after four of the six forests
+    path = step04_modeling._fit_and_score_path
+    calls = []
+
+    def interrupted(*args, **kwargs):
+        calls.append(1)
+        if len(calls) > 4:
+            raise KeyboardInterrupt
+        return path(*args, **kwargs)
+
+    monkeypatch.setattr(step04_modeling, "_fit_and_score_path", interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        step04_modeling.warm_start_search(X, y, param_grid=grid, cv=3, n_jobs=1, store=store)
+    monkeypatch.undo()
+
+    resumed = step04_modeling.warm_start_search(X, y, param_grid=grid, cv=3, n_jobs=1, store=store)
+    extended = step04_modeling.warm_start_search(
+        X, y, param_grid={"n_estimators": [3, 6, 12], "max_depth": [2, 4, None]},
+        cv=3, n_jobs=1, store=store,
+    )
+
+    assert (resumed["fits"], resumed["cached"]) == (2, 4)
+    assert (extended["fits"], extended["cached"]) == (9, 0)
+    trials = extended["trials"]
+    trials = trials[trials["params"].map(lambda p: p["n_estimators"] < 12)]
+    np.testing.assert_allclose(trials["mean_score"], reference["trials"]["mean_score"])
+
+
+def test_successive_halving_search_reuses_store(vectorized, tmp_path):
+    X, y = vectorized
+    store = tmp_path / "trials.sqlite"
+    grid = {"n_estimators": [4], "max_depth": [1, 3, None], "min_samples_split": [2, 10]}
+
+    first = step04_modeling.successive_halving_search(
+        X, y, param_grid=grid, cv=3, n_jobs=1, store=store, refit=False
+    )
+    again = step04_modeling.successive_halving_search(
+        X, y, param_grid=grid, cv=3, n_jobs=1, store=store, refit=False
+    )
+
+    assert first["fits"] > 0 and first["cached"] == 0
+    assert again["fits"] == 0 and again["cached"] == first["fits"]
+    assert again["best_params"] == first["best_params"]
+
+
+def test_run_grid_search_logs_layout_and_stores_no_threads(vectorized):
+    X, y = vectorized
+    layouts = []
+
+    search = step04_modeling.run_grid_search(
+        X, y, param_grid={"n_estimators": [5]}, cv=2, n_jobs=4, log=layouts.append
+    )
+
+    assert layouts == ["[parallel] 2 fits on 4 cores: 2 workers x 2 threads"]
+    assert search.best_estimator_.n_jobs is None
+
+
+def test_benchmark_layouts_reports_planned_layout(vectorized):
+    X, y = vectorized
+    grid = {"n_estimators": [5], "max_depth": [3]}
+
+    report = step04_modeling.benchmark_layouts(X, y, [(1, 2)], param_grid=grid, cv=2, n_jobs=1)
+
+    assert list(report["layout"]) == ["1x2", "planned"]
+    assert report.loc[0, "load"] == 2
+    assert (report.loc[1, "outer"], report.loc[1, "inner"]) == (1, 1)
@@ -4,7 +4,66 @@
 # Imports
 ###
 import src.step00_utils as step00_utils
+import src.step05_interpret as step05_interpret
+
+import numpy as np
+import pytest
+import scipy.sparse as sp
+import shap
+
+from sklearn.ensemble import RandomForestClassifier
 
 ###
 # ...
 ###
+
+def test_compute_shap_values_sparse_matches_dense():
+    rng = np.random.default_rng(0)
+    X = np.hstack([rng.normal(size=(60, 2)), np.eye(3)[rng.integers(0, 3, 60)]])
+    y = (X[:, 0] > 0).astype(int)
+    model = RandomForestClassifier(n_estimators=5, random_state=0).fit(X, y)
+
+    values, expected_value = step05_interpret.compute_shap_values(
+        model, sp.csr_matrix(X), block_size=16
+    )
+    explainer = shap.TreeExplainer(model)
+
+    np.testing.assert_allclose(values, explainer.shap_values(X))
+    np.testing.assert_allclose(expected_value, explainer.expected_value)
+
+
+def test_iter_dense_blocks_bounds_block_size():
+    X = sp.random(10, 4, density=0.3, format="csr", random_state=0)
+    blocks = list(step05_interpret.iter_dense_blocks(X, block_size=4))
+
+    assert [block.shape[0] for block in blocks] == [4, 4, 2]
+    np.testing.assert_array_equal(np.vstack(blocks), X.toarray())
+
+
+def test_compute_shap_values_parallel_matches_sequential():
+    rng = np.random.default_rng(1)
+    X = rng.normal(size=(50, 3))
+    y = (X[:, 0] > 0).astype(int)
+    model = RandomForestClassifier(n_estimators=5, random_state=0).fit(X, y)
+    layouts = []
+
+    sequential, _ = step05_interpret.compute_shap_values(model, X, block_size=8)
+    parallel, _ = step05_interpret.compute_shap_values(
+        model, X, block_size=8, n_jobs=2, task_rows=8, log=layouts.append
+    )
+
+    np.testing.assert_allclose(parallel, sequential)
+    assert layouts == ["[parallel] 7 SHAP tasks on 2 cores: 2 workers x 1 threads"]
+
+
+def test_plot_partial_dependence_accepts_sparse():
+    rng = np.random.default_rng(2)
+    X = np.hstack([rng.normal(size=(40, 2)), np.eye(3)[rng.integers(0, 3, 40)]])
+    y = (X[:, 0] > 0).astype(int)
+    model = RandomForestClassifier(n_estimators=5, random_state=0).fit(X, y)
+
+    fig = step05_interpret.plot_partial_dependence(
+        model, sp.csr_matrix(X), 0, [f"f{i}" for i in range(X.shape[1])]
+    )
+
+    assert fig.axes
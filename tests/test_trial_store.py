@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+###
+# Imports
+###
+import src.trial_store as trial_store
+
+import math
+
+###
+# ...
+###
+
+def test_record_and_load_trials(tmp_path):
+    path = tmp_path / "trials.sqlite"
+    study = trial_store.study_key(cv=5, scoring="f1")
+    params = trial_store.params_key({"max_depth": None, "n_estimators": 10})
+
+    assert trial_store.load_trials("data-v1", study, path) == {}
+
+    written = trial_store.record_trials(
+        "data-v1", study, [(params, 0, (0.5, 1.0, 0.1)), (params, 1, (0.6, 1.1, 0.1))], path
+    )
+    trial_store.record_trials("data-v1", study, [(params, 1, (0.7, 1.2, 0.2))], path)
+
+    assert written == 2
+    assert trial_store.load_trials("data-v1", study, path) == {
+        (params, 0): (0.5, 1.0, 0.1),
+        (params, 1): (0.7, 1.2, 0.2),
+    }
+    assert trial_store.load_trials("data-v2", study, path) == {}
+    assert trial_store.load_trials("data-v1", trial_store.study_key(cv=3, scoring="f1"), path) == {}
+    assert len(trial_store.trials_frame(path, data_hash="data-v1")) == 2
+
+
+def test_params_key_is_order_independent():
+    assert trial_store.params_key({"a": 1, "b": None}) == trial_store.params_key({"b": None, "a": 1})
+
+
+def test_nan_scores_round_trip(tmp_path):
+    path = tmp_path / "trials.sqlite"
+    params = trial_store.params_key({"max_depth": 1})
+
+    trial_store.record_trials("data-v1", "study", [(params, 0, (math.nan, 1.0, 0.1))], path)
+    score, *seconds = trial_store.load_trials("data-v1", "study", path)[(params, 0)]
+
+    assert math.isnan(score) and seconds == [1.0, 0.1]